@@ -0,0 +1,65 @@
+"""
+Benchmark do índice de prefixos do autocompletar com 1 milhão de títulos.
+
+    python benchmarks/bench_autocompletar.py [quantidade]
+
+Mede construção, consultas (p50/p99/máx) e atualização incremental.
+Não usa banco: alimenta o IndicePrefixos direto com títulos sintéticos.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from livros.autocompletar import IndicePrefixos  # noqa: E402
+
+PALAVRAS = (
+    "amor tempo noite casa mar sol lua terra vida morte guerra paz rio cidade "
+    "sertão memórias história viagem coração sombra luz caminho segredo jardim "
+    "estrela ilha montanha fogo água vento pedra livro sonho"
+).split()
+AUTORES = [f"{n} {s}" for n in ("Ana", "João", "José", "Maria", "Clarice", "Jorge", "Cecília", "Érico")
+           for s in ("Silva", "Souza", "Amado", "Lispector", "Veríssimo", "Meireles", "Assis", "Rosa")]
+
+
+def gerar(qtd, rnd):
+    for i in range(qtd):
+        titulo = " ".join(rnd.choice(PALAVRAS) for _ in range(rnd.randint(2, 5))) + f" {i}"
+        yield i, titulo.capitalize(), rnd.choice(AUTORES)
+
+
+def main(qtd=1_000_000):
+    rnd = random.Random(42)
+    indice = IndicePrefixos()
+
+    registros = list(gerar(qtd, rnd))
+    t0 = time.perf_counter()
+    indice.construir(registros)
+    print(f"construção: {qtd} livros, {len(indice)} entradas em {time.perf_counter() - t0:.1f}s")
+
+    prefixos = [rnd.choice(PALAVRAS)[: rnd.randint(1, 6)] for _ in range(5000)]
+    prefixos += [rnd.choice(AUTORES)[: rnd.randint(1, 8)] for _ in range(5000)]
+    tempos = []
+    for p in prefixos:
+        t = time.perf_counter()
+        indice.buscar(p, limite=10)
+        tempos.append((time.perf_counter() - t) * 1000)
+    tempos.sort()
+    print(
+        f"consulta (limite=10, {len(tempos)}x): p50={statistics.median(tempos):.4f}ms "
+        f"p99={tempos[int(len(tempos) * 0.99)]:.4f}ms máx={tempos[-1]:.4f}ms"
+    )
+
+    tempos = []
+    for i in range(1000):
+        t = time.perf_counter()
+        indice.atualizar(qtd + i, f"Novo título {i}", rnd.choice(AUTORES))
+        tempos.append((time.perf_counter() - t) * 1000)
+    print(f"atualização incremental (1000x): média={statistics.mean(tempos):.4f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,102 @@
+"""
+Benchmark: busca aproximada por trigramas x icontains (caminho antigo).
+
+    python benchmarks/bench_busca_aproximada.py [quantidade]
+
+Cria um banco de teste temporário (settings do projeto), carrega livros
+sintéticos, monta o índice de trigramas e mede as duas buscas.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "biblox.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+SILABAS = "ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo ga go gu la le li lo lu " \
+          "ma me mi mo mu na ne ni no nu pa pe pi po pu ra re ri ro ru sa se si so su ta te ti to tu " \
+          "vi vo ção lhe nha que gui tra tro pra bre cri".split()
+
+
+def vocabulario(rnd, qtd):
+    palavras = set()
+    while len(palavras) < qtd:
+        palavras.add("".join(rnd.choice(SILABAS) for _ in range(rnd.randint(2, 4))))
+    return sorted(palavras)
+
+
+def medir(funcao, consultas):
+    tempos = []
+    for q in consultas:
+        t = time.perf_counter()
+        funcao(q)
+        tempos.append((time.perf_counter() - t) * 1000)
+    tempos.sort()
+    return statistics.median(tempos), tempos[int(len(tempos) * 0.95)]
+
+
+def main(qtd):
+    from livros import trigramas
+    from livros.models import CadastroLivroModel
+    from livros.texto import normalizar
+
+    rnd = random.Random(42)
+    palavras = vocabulario(rnd, 20_000)
+    nomes = vocabulario(rnd, 800)
+    autores = [f"{rnd.choice(nomes)} {rnd.choice(nomes)}".title() for _ in range(max(100, qtd // 10))]
+
+    livros = []
+    for i in range(qtd):
+        nome = " ".join(rnd.choice(palavras) for _ in range(rnd.randint(1, 4))).capitalize()
+        autor = rnd.choice(autores)
+        livros.append(CadastroLivroModel(
+            nome=nome[:50], autor=autor,
+            nome_normalizado=normalizar(nome[:50]), autor_normalizado=normalizar(autor),
+        ))
+
+    t = time.perf_counter()
+    CadastroLivroModel.objects.bulk_create(livros, batch_size=2000)
+    trigramas.reconstruir_indice(CadastroLivroModel.objects.all())
+    print(f"carga + índice de trigramas: {qtd} livros em {time.perf_counter() - t:.1f}s")
+
+    # metade títulos, metade autores, cada um com um erro de digitação (uma letra a menos)
+    consultas = []
+    for i in range(100):
+        alvo = rnd.choice(livros)
+        texto = list(alvo.nome if i % 2 else alvo.autor)
+        del texto[rnd.randrange(1, len(texto))]
+        consultas.append("".join(texto))
+
+    def icontains(q):
+        list(CadastroLivroModel.objects.filter(Q(nome__icontains=q) | Q(autor__icontains=q))[:20])
+
+    def aproximada(q):
+        list(trigramas.filtrar(CadastroLivroModel.objects.all(), q).order_by("-relevancia")[:20])
+
+    acertos = sum(
+        1 for q in consultas
+        if trigramas.filtrar(CadastroLivroModel.objects.all(), q).exists()
+    )
+    p50, p95 = medir(icontains, consultas)
+    print(f"icontains:  p50={p50:.1f}ms p95={p95:.1f}ms (não encontra nada com erro de digitação)")
+    p50, p95 = medir(aproximada, consultas)
+    print(f"trigramas:  p50={p50:.1f}ms p95={p95:.1f}ms, {acertos}/{len(consultas)} consultas com resultado")
+
+
+if __name__ == "__main__":
+    setup_test_environment()
+    nome_db = connection.creation.create_test_db(verbosity=0)
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
+    finally:
+        connection.creation.destroy_test_db(nome_db, verbosity=0)
@@ -65,6 +65,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "livros.context_processors.circulacao",
             ],
         },
     },
@@ -84,6 +85,28 @@ DATABASES = {
 }
 
 
+# Cache
+# Os números do painel e a versão do índice de sugestões só valem para todos
+# os workers do gunicorn com um cache compartilhado: com REDIS_URL definido
+# usa o Redis (requer o pacote ``redis``). Sem ele, cada processo tem o seu
+# LocMemCache e os TTLs de livros/painel.py limitam quanto tempo um worker
+# fica com números velhos.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
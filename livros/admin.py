@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CadastroLivroModel, Emprestimo, Reserva
+from .models import CadastroLivroModel, Emprestimo, Notificacao, PerfilCirculacao, Reserva
 
 @admin.register(CadastroLivroModel)
 class CadastroLivroAdmin(admin.ModelAdmin):
@@ -7,12 +7,33 @@ class CadastroLivroAdmin(admin.ModelAdmin):
     list_filter = ("status",)
     search_fields = ("nome", "autor", "isbn")
 
+class EmAtrasoFilter(admin.SimpleListFilter):
+    title = "atraso"
+    parameter_name = "em_atraso"
+
+    def lookups(self, request, model_admin):
+        return (("1", "Com atraso"), ("0", "Sem atraso"))
+
+    def queryset(self, request, queryset):
+        if self.value() in ("0", "1"):
+            return queryset.filter(em_atraso=self.value() == "1")
+        return queryset
+
+
 @admin.register(Emprestimo)
 class EmprestimoAdmin(admin.ModelAdmin):
     list_display = ("id", "livro", "usuario", "data_saida",
-                    "data_prevista_devolucao", "data_devolucao", "dias_atraso")
+                    "data_prevista_devolucao", "data_devolucao", "atraso")
     search_fields = ("livro__nome", "usuario__username")
-    list_filter = ("data_devolucao",)
+    list_filter = ("data_devolucao", EmAtrasoFilter)
+    list_select_related = ("livro", "usuario")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_atraso()
+
+    @admin.display(description="Dias de atraso", ordering="atraso_db")
+    def atraso(self, obj):
+        return obj.dias_atraso
 
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
@@ -20,3 +41,18 @@ class ReservaAdmin(admin.ModelAdmin):
     list_filter = ("status", "livro")
     search_fields = ("livro__nome", "usuario__username")
     readonly_fields = ("criada_em", "pronta_em", "expira_em", "cancelada_em", "concluida_em", "expirada_em")
+
+@admin.register(PerfilCirculacao)
+class PerfilCirculacaoAdmin(admin.ModelAdmin):
+    list_display = ("usuario", "emprestimos_ativos", "multas_pendentes", "multa_aberta_total")
+    search_fields = ("usuario__username",)
+    readonly_fields = ("usuario", "emprestimos_ativos", "multas_pendentes", "multa_aberta_total")
+
+@admin.register(Notificacao)
+class NotificacaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "usuario", "criada_em", "enviada_em", "tentativas")
+    list_filter = ("tipo", ("enviada_em", admin.EmptyFieldListFilter))
+    search_fields = ("usuario__username", "chave")
+    list_select_related = ("usuario",)
+    readonly_fields = ("tipo", "usuario", "reserva", "emprestimo", "dados", "chave",
+                       "criada_em", "enviada_em", "tentativas", "ultimo_erro")
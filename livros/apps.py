@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LivrosConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "livros"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra os receivers)
@@ -0,0 +1,200 @@
+"""
+Índice de prefixos em memória para o autocompletar de título/autor.
+
+É um array ordenado de entradas (chave normalizada, tipo, texto) consultado
+com bisect: a busca custa O(log n + limite). Entradas repetidas (o mesmo
+autor em vários livros) aparecem uma vez só, com contagem de referências.
+
+O índice é construído na primeira consulta e depois mantido pelos signals
+de CadastroLivroModel. Cada processo tem o seu, então toda escrita também
+avança uma versão no cache: com cache compartilhado (``REDIS_URL``) os
+outros workers veem a versão nova e reconstroem. Sem ele, a cada
+``INTERVALO_VERIFICACAO`` segundos o total e o maior id do banco são
+comparados com os do índice, o que pega cadastros e remoções feitos por
+outro processo.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .texto import normalizar
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 20
+CHAVE_VERSAO = "livros:autocompletar:versao"
+INTERVALO_VERIFICACAO = 30  # segundos
+
+
+class IndicePrefixos:
+    def __init__(self):
+        self._entradas = []       # [(chave, tipo, texto)] ordenado
+        self._referencias = {}    # entrada -> qtd de livros que a usam
+        self._por_livro = {}      # livro_id -> entradas do livro
+        self._lock = threading.Lock()
+        self.versao = 0           # versão do cache que o índice reflete
+        self.verificado_em = time.monotonic()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @staticmethod
+    def _entradas_do_livro(nome, autor):
+        entradas = []
+        for tipo, texto in (("titulo", nome), ("autor", autor)):
+            chave = normalizar(texto)
+            if chave:
+                entradas.append((chave, tipo, texto.strip()))
+        return entradas
+
+    def construir(self, registros):
+        """Carga inicial a partir de (livro_id, nome, autor); ordena uma vez só."""
+        referencias = {}
+        por_livro = {}
+        for livro_id, nome, autor in registros:
+            entradas = self._entradas_do_livro(nome, autor)
+            por_livro[livro_id] = entradas
+            for e in entradas:
+                referencias[e] = referencias.get(e, 0) + 1
+        with self._lock:
+            self._referencias = referencias
+            self._por_livro = por_livro
+            self._entradas = sorted(referencias)
+
+    def _incluir(self, entrada):
+        n = self._referencias.get(entrada, 0)
+        if n == 0:
+            insort(self._entradas, entrada)
+        self._referencias[entrada] = n + 1
+
+    def _excluir(self, entrada):
+        n = self._referencias.get(entrada, 0)
+        if n <= 1:
+            self._referencias.pop(entrada, None)
+            i = bisect_left(self._entradas, entrada)
+            if i < len(self._entradas) and self._entradas[i] == entrada:
+                del self._entradas[i]
+        else:
+            self._referencias[entrada] = n - 1
+
+    def atualizar(self, livro_id, nome, autor):
+        novas = self._entradas_do_livro(nome, autor)
+        with self._lock:
+            for e in self._por_livro.get(livro_id, []):
+                self._excluir(e)
+            for e in novas:
+                self._incluir(e)
+            self._por_livro[livro_id] = novas
+
+    def remover(self, livro_id):
+        with self._lock:
+            for e in self._por_livro.pop(livro_id, []):
+                self._excluir(e)
+
+    def assinatura(self):
+        """(total de livros, maior id), para comparar com o banco."""
+        with self._lock:
+            return len(self._por_livro), max(self._por_livro, default=None)
+
+    def buscar(self, prefixo, limite=LIMITE_PADRAO):
+        prefixo = normalizar(prefixo)
+        if not prefixo:
+            return []
+        resultado = []
+        # atualizar/remover mexem na lista no lugar: sem o lock, um índice
+        # deslocado no meio da varredura pula ou repete entradas
+        with self._lock:
+            entradas = self._entradas
+            i = bisect_left(entradas, (prefixo,))
+            while i < len(entradas) and len(resultado) < limite:
+                chave, tipo, texto = entradas[i]
+                if not chave.startswith(prefixo):
+                    break
+                resultado.append({"texto": texto, "tipo": tipo})
+                i += 1
+        return resultado
+
+
+_indice = None
+_lock_construcao = threading.Lock()
+
+
+def _construir():
+    from .models import CadastroLivroModel
+
+    indice = IndicePrefixos()
+    # versão lida antes da carga: uma escrita durante a carga força outra
+    indice.versao = cache.get(CHAVE_VERSAO, 0)
+    indice.construir(
+        CadastroLivroModel.objects.values_list("id", "nome", "autor").iterator(chunk_size=5000)
+    )
+    return indice
+
+
+def _desatualizado(indice):
+    if cache.get(CHAVE_VERSAO, 0) != indice.versao:
+        return True
+    if time.monotonic() - indice.verificado_em < INTERVALO_VERIFICACAO:
+        return False
+    from .models import CadastroLivroModel
+
+    indice.verificado_em = time.monotonic()
+    banco = CadastroLivroModel.objects.aggregate(total=Count("id"), maior=Max("id"))
+    return (banco["total"], banco["maior"]) != indice.assinatura()
+
+
+def obter_indice():
+    """Índice do processo, construído na primeira chamada e refeito quando fica velho."""
+    global _indice
+    indice = _indice
+    if indice is not None and not _desatualizado(indice):
+        return indice
+    with _lock_construcao:
+        # outra thread pode ter reconstruído enquanto esta esperava
+        if _indice is indice:
+            _indice = _construir()
+    return _indice
+
+
+def indice_construido():
+    return _indice is not None
+
+
+def descartar():
+    """Joga fora o índice; a próxima consulta reconstrói do banco."""
+    global _indice
+    _indice = None
+
+
+def _avancar_versao():
+    cache.add(CHAVE_VERSAO, 0, timeout=None)
+    try:
+        return cache.incr(CHAVE_VERSAO)
+    except ValueError:  # chave expulsa do cache entre o add e o incr
+        return None
+
+
+def _aplicar(mudanca):
+    versao = _avancar_versao()
+    indice = _indice
+    if indice is None:
+        return
+    mudanca(indice)
+    # só adota a versão nova se nenhuma escrita de outro processo ficou no meio
+    if versao is not None and indice.versao == versao - 1:
+        indice.versao = versao
+
+
+def livro_alterado(livro_id, nome, autor):
+    """Depois do commit: avança a versão e atualiza o índice deste processo, se houver."""
+    _aplicar(lambda indice: indice.atualizar(livro_id, nome, autor))
+
+
+def livro_removido(livro_id):
+    _aplicar(lambda indice: indice.remover(livro_id))
+
+
+def sugerir(prefixo, limite=LIMITE_PADRAO):
+    return obter_indice().buscar(prefixo, min(limite, LIMITE_MAXIMO))
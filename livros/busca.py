@@ -0,0 +1,158 @@
+"""
+Índice de busca textual do catálogo (título, autor e ISBN).
+
+- SQLite: tabela virtual FTS5 ``livros_busca_fts`` (rowid = id do livro),
+  mantida em sincronia pelos signals de CadastroLivroModel.
+- PostgreSQL: índice GIN sobre ``to_tsvector`` das mesmas colunas; o próprio
+  banco mantém o índice, então não há sincronização manual.
+- Outros bancos: ``contains`` nas colunas normalizadas.
+
+Tudo é indexado a partir de ``nome_normalizado``/``autor_normalizado``, então
+a busca ignora acentos e caixa do mesmo jeito em todos os bancos.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .texto import normalizar
+
+TABELA_FTS = "livros_busca_fts"
+TABELA_LIVROS = "livros_cadastrolivromodel"
+INDICE_GIN = "livros_busca_gin_idx"
+
+# Mesma expressão no índice GIN (migration) e nas consultas, senão o
+# PostgreSQL não usa o índice.
+VETOR_PG = (
+    "to_tsvector('simple', nome_normalizado || ' ' || autor_normalizado "
+    "|| ' ' || coalesce(isbn, ''))"
+)
+
+
+def _vendor(conn=None):
+    return (conn or connection).vendor
+
+
+def termos_da_busca(q):
+    """Quebra o texto digitado em termos normalizados (palavras/números)."""
+    return re.findall(r"\w+", normalizar(q))
+
+
+def _consulta_fts5(termos):
+    # "termo"* -> busca por prefixo; aspas evitam que o usuário
+    # injete operadores do FTS5 (AND, NEAR, etc.)
+    return " ".join(f'"{t}"*' for t in termos)
+
+
+def _consulta_tsquery(termos):
+    return " & ".join(f"{t}:*" for t in termos)
+
+
+def filtrar(qs, q):
+    """
+    Filtra o queryset de livros pelo texto ``q`` e anota ``relevancia``
+    (maior = mais relevante).
+    """
+    termos = termos_da_busca(q)
+    if not termos:
+        return qs
+
+    vendor = _vendor()
+    if vendor == "sqlite":
+        consulta = _consulta_fts5(termos)
+        # JOIN com a tabela FTS: o MATCH roda uma vez só e o bm25() sai da
+        # mesma varredura (uma subconsulta correlacionada refaria o MATCH
+        # para cada livro). bm25() é negativo (quanto menor, melhor) ->
+        # invertemos o sinal
+        return qs.extra(
+            tables=[TABELA_FTS],
+            where=[f"{TABELA_FTS} MATCH %s", f"{TABELA_FTS}.rowid = {TABELA_LIVROS}.id"],
+            params=[consulta],
+        ).annotate(
+            relevancia=RawSQL(f"-bm25({TABELA_FTS})", (), output_field=FloatField())
+        )
+
+    if vendor == "postgresql":
+        consulta = _consulta_tsquery(termos)
+        return qs.filter(
+            RawSQL(
+                f"{VETOR_PG} @@ to_tsquery('simple', %s)",
+                (consulta,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f"ts_rank({VETOR_PG}, to_tsquery('simple', %s))", (consulta,)
+            )
+        )
+
+    # Demais bancos: cada termo precisa aparecer no nome ou no autor normalizado
+    for termo in termos:
+        qs = qs.filter(Q(nome_normalizado__contains=termo) | Q(autor_normalizado__contains=termo))
+    return qs
+
+
+def filtrar_prefixo(qs, campo, prefixo):
+    """
+    ``campo`` começando com ``prefixo`` como intervalo (``>= p`` e ``< p'``),
+    que usa o índice B-tree da coluna em qualquer banco; ``LIKE 'p%'`` não
+    usa no SQLite e depende de collation no PostgreSQL.
+    """
+    if not prefixo:
+        return qs
+    limite = prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+    return qs.filter(**{f"{campo}__gte": prefixo, f"{campo}__lt": limite})
+
+
+# ----------------------------
+# Manutenção do índice
+# ----------------------------
+def criar_indice(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if _vendor(conn) == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5("
+                "nome, autor, isbn, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif _vendor(conn) == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {INDICE_GIN} "
+                f"ON {TABELA_LIVROS} USING GIN ({VETOR_PG})"
+            )
+
+
+def indexar_livro(livro):
+    if _vendor() != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE rowid = %s", [livro.pk])
+        cursor.execute(
+            f"INSERT INTO {TABELA_FTS} (rowid, nome, autor, isbn) VALUES (%s, %s, %s, %s)",
+            [livro.pk, livro.nome_normalizado, livro.autor_normalizado, livro.isbn or ""],
+        )
+
+
+def desindexar_livro(livro_id):
+    if _vendor() != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE rowid = %s", [livro_id])
+
+
+def reconstruir_indice(conn=None):
+    """Recria o índice do zero a partir da tabela de livros. Retorna o total indexado."""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if _vendor(conn) == "sqlite":
+            cursor.execute(f"DELETE FROM {TABELA_FTS}")
+            cursor.execute(
+                f"INSERT INTO {TABELA_FTS} (rowid, nome, autor, isbn) "
+                f"SELECT id, nome_normalizado, autor_normalizado, coalesce(isbn, '') "
+                f"FROM {TABELA_LIVROS}"
+            )
+        elif _vendor(conn) == "postgresql":
+            cursor.execute(f"REINDEX INDEX {INDICE_GIN}")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABELA_LIVROS}")
+        return cursor.fetchone()[0]
@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import PerfilCirculacao
+
+
+def circulacao(request):
+    """
+    Perfil de circulação do usuário logado (empréstimos ativos e multas em
+    aberto) para o topo de todas as páginas. A consulta, uma leitura pela
+    chave primária, só acontece se o template usar o valor.
+    """
+    usuario = getattr(request, "user", None)
+    if usuario is None or not usuario.is_authenticated:
+        return {}
+    return {
+        "perfil_circulacao": SimpleLazyObject(
+            lambda: PerfilCirculacao.objects.filter(pk=usuario.pk).first()
+        )
+    }
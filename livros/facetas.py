@@ -0,0 +1,72 @@
+"""
+Facetas do catálogo (disponíveis x emprestados, autores mais frequentes e
+livros com fila de reserva) calculadas em uma única consulta agrupada.
+
+O agrupamento é por autor; os totais gerais saem de ``SUM(...) OVER ()``
+sobre os próprios agregados, então a mesma consulta traz o top de autores
+e os contadores globais. O resultado fica em cache por alguns segundos,
+com a chave formada pelos filtros normalizados.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, Func, IntegerField, Min, OuterRef, Q
+
+from .models import Reserva
+from .texto import normalizar
+
+TTL_FACETAS = 30  # segundos
+QTD_AUTORES = 5
+
+
+class TotalGeral(Func):
+    """``SUM(<agregado>) OVER ()``: soma de um agregado sobre todos os grupos."""
+    template = "SUM(%(expressions)s) OVER ()"
+    contains_over_clause = True
+    output_field = IntegerField()
+
+
+def chave_cache(q, apenas_disponiveis, aproximado):
+    bruto = f"{normalizar(q)}|{int(bool(apenas_disponiveis))}|{int(bool(aproximado))}"
+    return "livros:facetas:" + hashlib.md5(bruto.encode()).hexdigest()
+
+
+def calcular(qs, chave=None, qtd_autores=QTD_AUTORES):
+    """
+    Facetas do queryset de livros ``qs`` (já filtrado). Retorna
+    ``{"total", "disponiveis", "emprestados", "com_fila", "autores": [{"autor", "total"}]}``.
+    """
+    if chave:
+        facetas = cache.get(chave)
+        if facetas is not None:
+            return facetas
+
+    disponivel = Q(status="disponivel")
+    emprestado = Q(status="emprestado")
+    com_fila = Q(Exists(Reserva.objects.filter(livro=OuterRef("pk"), status="ativa")))
+
+    linhas = list(
+        qs.order_by()
+        .values("autor_normalizado")
+        .annotate(
+            autor=Min("autor"),
+            qtd=Count("id"),
+            total=TotalGeral(Count("id")),
+            disponiveis=TotalGeral(Count("id", filter=disponivel)),
+            emprestados=TotalGeral(Count("id", filter=emprestado)),
+            com_fila=TotalGeral(Count("id", filter=com_fila)),
+        )
+        .order_by("-qtd", "autor_normalizado")[:qtd_autores]
+    )
+
+    primeira = linhas[0] if linhas else {}
+    facetas = {
+        "total": primeira.get("total") or 0,
+        "disponiveis": primeira.get("disponiveis") or 0,
+        "emprestados": primeira.get("emprestados") or 0,
+        "com_fila": primeira.get("com_fila") or 0,
+        "autores": [{"autor": l["autor"], "total": l["qtd"]} for l in linhas],
+    }
+    if chave:
+        cache.set(chave, facetas, TTL_FACETAS)
+    return facetas
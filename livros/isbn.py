@@ -0,0 +1,36 @@
+"""Normalização de ISBN-10/ISBN-13 (e do EAN-13 lido pelo leitor de código de barras)."""
+import re
+
+
+def _digito_isbn10(nove):
+    soma = sum((10 - i) * int(d) for i, d in enumerate(nove))
+    resto = (11 - soma % 11) % 11
+    return "X" if resto == 10 else str(resto)
+
+
+def _digito_isbn13(doze):
+    soma = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(doze))
+    return str((10 - soma % 10) % 10)
+
+
+def normalizar_isbn(valor):
+    """
+    Retorna o ISBN-13 (só dígitos) equivalente a ``valor`` ou None se não
+    for um ISBN válido. Aceita hífens/espaços e ISBN-10 (convertido para 978...).
+    """
+    if not valor:
+        return None
+    codigo = re.sub(r"[^0-9Xx]", "", str(valor)).upper()
+
+    if len(codigo) == 10 and codigo[:9].isdigit():
+        if _digito_isbn10(codigo[:9]) != codigo[9]:
+            return None
+        doze = "978" + codigo[:9]
+        return doze + _digito_isbn13(doze)
+
+    if len(codigo) == 13 and codigo.isdigit():
+        if _digito_isbn13(codigo[:12]) != codigo[12]:
+            return None
+        return codigo
+
+    return None
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from livros.models import Emprestimo
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula as multas de todos os empréstimos vencidos ou devolvidos com atraso "
+        "direto no banco (UPDATEs por faixa de id). Pode ser agendado diariamente; "
+        "rodar de novo no mesmo dia não altera nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--valor-por-dia", type=float, default=2.00, help="Valor da multa por dia de atraso.")
+        parser.add_argument("--carencia", type=int, default=0, help="Dias de atraso sem cobrança.")
+        parser.add_argument("--lote", type=int, default=5000, help="Tamanho da faixa de ids por UPDATE.")
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        lote = options["lote"]
+        limites = Emprestimo.objects.aggregate(menor=Min("id"), maior=Max("id"))
+
+        atualizados = 0
+        if limites["menor"] is not None:
+            for de in range(limites["menor"], limites["maior"] + 1, lote):
+                atualizados += Emprestimo.objects.filter(id__gte=de, id__lt=de + lote).acumular_multas(
+                    valor_por_dia=options["valor_por_dia"], carencia=options["carencia"],
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{atualizados} empréstimo(s) com multa atualizada em {time.monotonic() - inicio:.2f}s."
+        ))
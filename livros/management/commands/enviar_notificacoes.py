@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from livros import notificacoes
+from livros.models import Notificacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Enfileira o aviso dos empréstimos perto do vencimento e envia por e-mail, "
+        "em lotes, as notificações pendentes da caixa de saída. Pode ser agendado "
+        "a cada poucos minutos; uma notificação só é marcada como enviada depois "
+        "do envio (entrega pelo menos uma vez)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=100, help="Notificações por lote/conexão de e-mail.")
+        parser.add_argument("--max-tentativas", type=int, default=notificacoes.MAX_TENTATIVAS,
+                            help="Falhas seguidas antes de desistir de uma notificação.")
+        parser.add_argument("--dias-aviso", type=int, default=2,
+                            help="Avisar empréstimos que vencem nos próximos N dias (0 desliga).")
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options["dias_aviso"] > 0:
+            Notificacao.avisar_vencimentos(dias=options["dias_aviso"])
+
+        enviadas, falhas = notificacoes.enviar_pendentes(
+            lote=options["lote"], max_tentativas=options["max_tentativas"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{enviadas} notificação(ões) enviada(s), {falhas} falha(s) em {time.monotonic() - inicio:.2f}s."
+        ))
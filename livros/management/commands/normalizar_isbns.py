@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from livros import busca
+from livros.isbn import normalizar_isbn
+from livros.models import CadastroLivroModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula isbn_normalizado de todos os livros e resolve duplicados: "
+        "o livro mais antigo fica com o ISBN, os demais são listados para revisão."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reescrever", action="store_true",
+            help="Também grava o ISBN-13 canônico no campo isbn dos livros válidos.",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        donos = {}
+        duplicados = []
+        invalidos = 0
+        alterados = []
+
+        qs = CadastroLivroModel.objects.only("id", "nome", "isbn", "isbn_normalizado").order_by("id")
+        for livro in qs.iterator(chunk_size=2000):
+            codigo = normalizar_isbn(livro.isbn)
+            if livro.isbn and not codigo:
+                invalidos += 1
+            if codigo in donos:
+                duplicados.append((livro, donos[codigo]))
+                codigo = None
+            elif codigo:
+                donos[codigo] = livro
+
+            mudou = livro.isbn_normalizado != codigo
+            livro.isbn_normalizado = codigo
+            if options["reescrever"] and codigo and livro.isbn != codigo:
+                livro.isbn = codigo
+                mudou = True
+            if mudou:
+                alterados.append(livro)
+
+        # primeiro libera os valores que vão mudar de dono, para não violar o índice único
+        CadastroLivroModel.objects.filter(pk__in=[l.pk for l in alterados]).update(isbn_normalizado=None)
+        CadastroLivroModel.objects.bulk_update(alterados, ["isbn", "isbn_normalizado"], batch_size=2000)
+        if options["reescrever"] and alterados:
+            busca.reconstruir_indice()
+
+        for livro, dono in duplicados:
+            self.stdout.write(
+                f"ISBN duplicado: livro {livro.pk} ({livro.nome}) repete o do livro {dono.pk} ({dono.nome})"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(alterados)} livro(s) atualizado(s), {len(duplicados)} duplicado(s), "
+            f"{invalidos} ISBN(s) inválido(s)."
+        ))
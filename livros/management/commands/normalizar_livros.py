@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from livros import busca, trigramas
+from livros.models import CadastroLivroModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche nome_normalizado/autor_normalizado de todos os livros "
+        "(necessário após cargas com bulk_create/update) e atualiza os índices de busca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=2000, help="Livros por bulk_update.")
+
+    def handle(self, *args, **options):
+        tamanho = options["lote"]
+        alterados = 0
+        lote = []
+        qs = CadastroLivroModel.objects.only("id", "nome", "autor", "nome_normalizado", "autor_normalizado")
+        for livro in qs.iterator(chunk_size=tamanho):
+            antes = (livro.nome_normalizado, livro.autor_normalizado)
+            livro.normalizar()
+            if (livro.nome_normalizado, livro.autor_normalizado) != antes:
+                lote.append(livro)
+            if len(lote) >= tamanho:
+                alterados += self._gravar(lote)
+                lote = []
+        if lote:
+            alterados += self._gravar(lote)
+
+        if alterados:
+            busca.reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"{alterados} livro(s) normalizado(s)."))
+
+    def _gravar(self, lote):
+        alterados = CadastroLivroModel.objects.bulk_update(lote, ["nome_normalizado", "autor_normalizado"])
+        # os trigramas saem das mesmas colunas: só os livros alterados
+        trigramas.reindexar_livros(lote)
+        return alterados
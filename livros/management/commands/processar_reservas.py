@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from livros.models import Reserva
+
+
+class Command(BaseCommand):
+    help = (
+        "Expira as reservas prontas cujo prazo de retirada acabou e promove a próxima "
+        "da fila de cada livro. Fica em laço rodando a cada --intervalo segundos "
+        "(ou uma vez só com --uma-vez, para agendar pelo cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, default=60, help="Segundos entre uma passada e a próxima.")
+        parser.add_argument("--uma-vez", action="store_true", help="Faz uma passada e termina.")
+
+    def passada(self):
+        inicio = time.monotonic()
+        expiradas = Reserva.expirar_vencidas()
+        if expiradas:
+            self.stdout.write(self.style.SUCCESS(
+                f"{expiradas} reserva(s) expirada(s) em {time.monotonic() - inicio:.2f}s."
+            ))
+        return expiradas
+
+    def handle(self, *args, **options):
+        if options["uma_vez"]:
+            self.passada()
+            return
+
+        self.stdout.write(f"Processando reservas a cada {options['intervalo']:g}s (Ctrl+C para sair).")
+        try:
+            while True:
+                # conexão parada há muito tempo pode ter caído; o Django só
+                # recicla sozinho dentro do ciclo de requisição
+                close_old_connections()
+                try:
+                    self.passada()
+                except DatabaseError as exc:
+                    self.stderr.write(f"Falha ao processar reservas: {exc}")
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrado.")
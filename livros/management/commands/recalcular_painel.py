@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from livros import painel
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero os contadores do dashboard (total, disponíveis, emprestados)."
+
+    def handle(self, *args, **options):
+        painel.invalidar()
+        numeros = painel.contadores()
+        self.stdout.write(self.style.SUCCESS(
+            "Contadores recalculados: {total} livro(s), {disponiveis} disponível(is), "
+            "{emprestados} emprestado(s).".format(**numeros)
+        ))
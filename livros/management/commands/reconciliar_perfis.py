@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from livros.models import PerfilCirculacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o perfil de circulação de todos os usuários (multas em aberto "
+        "e empréstimos ativos) a partir da tabela de empréstimos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Perfis gravados por upsert.")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        gravados = PerfilCirculacao.recalcular(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{gravados} perfil(is) reconciliado(s) em {time.monotonic() - inicio:.2f}s."
+        ))
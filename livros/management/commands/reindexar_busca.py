@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from livros import busca, trigramas
+from livros.models import CadastroLivroModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói os índices de busca do catálogo: textual (título, autor e ISBN) "
+        "e de trigramas (busca aproximada)."
+    )
+
+    def handle(self, *args, **options):
+        busca.criar_indice()
+        total = busca.reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"Índice de busca reconstruído: {total} livro(s)."))
+        total = trigramas.reconstruir_indice(CadastroLivroModel.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Índice de trigramas reconstruído: {total} livro(s)."))
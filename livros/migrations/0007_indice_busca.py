@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+TABELA_FTS = "livros_busca_fts"
+INDICE_GIN = "livros_busca_gin_idx"
+VETOR_PG = (
+    "to_tsvector('simple', coalesce(nome, '') || ' ' || "
+    "coalesce(autor, '') || ' ' || coalesce(isbn, ''))"
+)
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5("
+            "nome, autor, isbn, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {TABELA_FTS} (rowid, nome, autor, isbn) "
+            "SELECT id, coalesce(nome, ''), coalesce(autor, ''), coalesce(isbn, '') "
+            "FROM livros_cadastrolivromodel"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDICE_GIN} "
+            f"ON livros_cadastrolivromodel USING GIN ({VETOR_PG})"
+        )
+
+
+def remover_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE_GIN}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0006_emprestimo_multa_paga_emprestimo_multa_valor'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:43
+
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def normalizar_status(apps, schema_editor):
+    # Os filtros passaram a comparar status exato; dados antigos gravados
+    # como "Disponivel"/" emprestado" precisam ficar iguais aos STATUS_CHOICES.
+    Livro = apps.get_model('livros', 'CadastroLivroModel')
+    Livro.objects.update(status=Lower(Trim('status')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0007_indice_busca'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['status', 'nome'], name='livro_status_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['status', 'autor'], name='livro_status_autor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['nome'], name='livro_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['autor'], name='livro_autor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['data_criacao'], name='livro_data_criacao_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:48
+
+import unicodedata
+
+from django.db import migrations, models
+
+TABELA_FTS = "livros_busca_fts"
+INDICE_GIN = "livros_busca_gin_idx"
+
+
+def _normalizar(texto):
+    # cópia de livros.texto.normalizar: a migração não muda junto com o app
+    if not texto:
+        return ""
+    if not texto.isascii():
+        decomposto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+def preencher_normalizados(apps, schema_editor):
+    Livro = apps.get_model('livros', 'CadastroLivroModel')
+    lote = []
+    for livro in Livro.objects.only('id', 'nome', 'autor').iterator(chunk_size=2000):
+        livro.nome_normalizado = _normalizar(livro.nome)
+        livro.autor_normalizado = _normalizar(livro.autor)
+        lote.append(livro)
+        if len(lote) == 2000:
+            Livro.objects.bulk_update(lote, ['nome_normalizado', 'autor_normalizado'])
+            lote = []
+    if lote:
+        Livro.objects.bulk_update(lote, ['nome_normalizado', 'autor_normalizado'])
+
+
+def indexar_normalizados(apps, schema_editor):
+    # O índice de busca passa a usar as colunas normalizadas
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DELETE FROM {TABELA_FTS}")
+        schema_editor.execute(
+            f"INSERT INTO {TABELA_FTS} (rowid, nome, autor, isbn) "
+            "SELECT id, nome_normalizado, autor_normalizado, coalesce(isbn, '') "
+            "FROM livros_cadastrolivromodel"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE_GIN}")
+        schema_editor.execute(
+            f"CREATE INDEX {INDICE_GIN} ON livros_cadastrolivromodel USING GIN ("
+            "to_tsvector('simple', nome_normalizado || ' ' || autor_normalizado "
+            "|| ' ' || coalesce(isbn, '')))"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0008_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cadastrolivromodel',
+            name='livro_status_nome_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cadastrolivromodel',
+            name='livro_status_autor_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cadastrolivromodel',
+            name='livro_nome_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cadastrolivromodel',
+            name='livro_autor_idx',
+        ),
+        migrations.AddField(
+            model_name='cadastrolivromodel',
+            name='autor_normalizado',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='cadastrolivromodel',
+            name='nome_normalizado',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(preencher_normalizados, migrations.RunPython.noop),
+        migrations.RunPython(indexar_normalizados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['status', 'nome_normalizado'], name='livro_status_nomenorm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['status', 'autor_normalizado'], name='livro_status_autornorm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['nome_normalizado'], name='livro_nomenorm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cadastrolivromodel',
+            index=models.Index(fields=['autor_normalizado'], name='livro_autornorm_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:49
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _trigramas(texto):
+    resultado = set()
+    for palavra in re.findall(r"\w+", texto or ""):
+        p = f"  {palavra} "
+        resultado.update(p[i:i + 3] for i in range(len(p) - 2))
+    return resultado
+
+
+def indexar_livros(apps, schema_editor):
+    Livro = apps.get_model('livros', 'CadastroLivroModel')
+    Trigrama = apps.get_model('livros', 'TrigramaLivro')
+    lote = []
+    for livro in Livro.objects.only('id', 'nome_normalizado', 'autor_normalizado').iterator(chunk_size=1000):
+        tris = _trigramas(livro.nome_normalizado) | _trigramas(livro.autor_normalizado)
+        lote.extend(Trigrama(trigrama=t, livro_id=livro.pk) for t in tris)
+        if len(lote) >= 20000:
+            Trigrama.objects.bulk_create(lote, batch_size=5000)
+            lote = []
+    if lote:
+        Trigrama.objects.bulk_create(lote, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0009_nome_autor_normalizados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaLivro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='livros.cadastrolivromodel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigrama', 'livro'), name='unique_trigrama_livro')],
+            },
+        ),
+        migrations.RunPython(indexar_livros, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:00
+
+import re
+
+from django.db import migrations, models
+
+
+# cópia de livros.isbn.normalizar_isbn: a migração não muda junto com o app
+def _digito_isbn10(nove):
+    soma = sum((10 - i) * int(d) for i, d in enumerate(nove))
+    resto = (11 - soma % 11) % 11
+    return "X" if resto == 10 else str(resto)
+
+
+def _digito_isbn13(doze):
+    soma = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(doze))
+    return str((10 - soma % 10) % 10)
+
+
+def _normalizar_isbn(valor):
+    if not valor:
+        return None
+    codigo = re.sub(r"[^0-9Xx]", "", str(valor)).upper()
+    if len(codigo) == 10 and codigo[:9].isdigit():
+        if _digito_isbn10(codigo[:9]) != codigo[9]:
+            return None
+        doze = "978" + codigo[:9]
+        return doze + _digito_isbn13(doze)
+    if len(codigo) == 13 and codigo.isdigit():
+        if _digito_isbn13(codigo[:12]) != codigo[12]:
+            return None
+        return codigo
+    return None
+
+
+def preencher_isbn_normalizado(apps, schema_editor):
+    # Duplicados ficam só no livro mais antigo (menor id); os demais ficam
+    # sem isbn_normalizado até alguém rodar `normalizar_isbns` e revisar.
+    Livro = apps.get_model('livros', 'CadastroLivroModel')
+    vistos = set()
+    lote = []
+    for livro in Livro.objects.exclude(isbn__isnull=True).exclude(isbn='').only('id', 'isbn').order_by('id').iterator():
+        codigo = _normalizar_isbn(livro.isbn)
+        if codigo in vistos:
+            codigo = None
+        elif codigo:
+            vistos.add(codigo)
+        livro.isbn_normalizado = codigo
+        lote.append(livro)
+    Livro.objects.bulk_update(lote, ['isbn_normalizado'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0010_trigramas_livro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadastrolivromodel',
+            name='isbn_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True),
+        ),
+        migrations.RunPython(preencher_isbn_normalizado, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cadastrolivromodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('isbn_normalizado__isnull', False)), fields=('isbn_normalizado',), name='unique_isbn_normalizado'),
+        ),
+    ]
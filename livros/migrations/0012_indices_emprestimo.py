@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0011_isbn_normalizado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['data_devolucao', 'data_prevista_devolucao'], name='emprestimo_devol_prev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('multa_paga', False), ('multa_valor__gt', 0)), fields=['usuario'], name='emprestimo_multa_aberta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['data_saida'], name='emprestimo_data_saida_idx'),
+        ),
+    ]
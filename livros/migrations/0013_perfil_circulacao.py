@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_perfis(apps, schema_editor):
+    # só usuários com algum empréstimo; os demais ganham perfil no primeiro empréstimo
+    Emprestimo = apps.get_model('livros', 'Emprestimo')
+    Perfil = apps.get_model('livros', 'PerfilCirculacao')
+    em_aberto = models.Q(multa_paga=False, multa_valor__gt=0)
+    linhas = (
+        Emprestimo.objects.order_by().values('usuario_id')
+        .annotate(
+            ativos=models.Count('id', filter=models.Q(data_devolucao__isnull=True)),
+            pendentes=models.Count('id', filter=em_aberto),
+            total=models.Sum('multa_valor', filter=em_aberto, default=0),
+        )
+    )
+    Perfil.objects.bulk_create(
+        [
+            Perfil(usuario_id=l['usuario_id'], emprestimos_ativos=l['ativos'],
+                   multas_pendentes=l['pendentes'], multa_aberta_total=l['total'])
+            for l in linhas.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('livros', '0012_indices_emprestimo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilCirculacao',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='perfil_circulacao', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('multa_aberta_total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('multas_pendentes', models.IntegerField(default=0)),
+                ('emprestimos_ativos', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(preencher_perfis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0013_perfil_circulacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['livro', 'status', 'criada_em'], name='reserva_fila_idx'),
+        ),
+    ]
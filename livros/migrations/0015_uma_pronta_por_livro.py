@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def devolver_prontas_excedentes(apps, schema_editor):
+    # livros com mais de uma pronta: fica a mais antiga, as outras voltam
+    # para a fila (a ordem é por criada_em, então não perdem a vez)
+    Reserva = apps.get_model('livros', 'Reserva')
+    repetidos = (
+        Reserva.objects.filter(status='pronta').order_by().values('livro_id')
+        .annotate(n=models.Count('id')).filter(n__gt=1).values_list('livro_id', flat=True)
+    )
+    for livro_id in list(repetidos):
+        prontas = list(
+            Reserva.objects.filter(livro_id=livro_id, status='pronta')
+            .order_by('pronta_em', 'criada_em', 'id').values_list('id', flat=True)
+        )
+        Reserva.objects.filter(pk__in=prontas[1:]).update(status='ativa', pronta_em=None, expira_em=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0014_indice_fila_reserva'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(devolver_prontas_excedentes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pronta')), fields=('livro',), name='unique_reserva_pronta_por_livro'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0015_uma_pronta_por_livro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('reserva_pronta', 'Reserva pronta para retirada'), ('reserva_expirada', 'Reserva expirada'), ('emprestimo_vencendo', 'Empréstimo perto do vencimento'), ('multa_aplicada', 'Multa aplicada')], max_length=30)),
+                ('dados', models.JSONField(blank=True, default=dict)),
+                ('chave', models.CharField(max_length=120, unique=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('enviada_em', models.DateTimeField(blank=True, null=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_erro', models.TextField(blank=True, default='')),
+                ('emprestimo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livros.emprestimo')),
+                ('reserva', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livros.reserva')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('enviada_em__isnull', True)), fields=['id'], name='notificacao_pendente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_quitadas(apps, schema_editor):
+    # multas marcadas como pagas foram quitadas por inteiro
+    Emprestimo = apps.get_model('livros', 'Emprestimo')
+    Emprestimo.objects.filter(multa_paga=True, multa_valor__gt=0).update(multa_quitada=F('multa_valor'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0016_notificacoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emprestimo',
+            name='multa_quitada',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=6),
+        ),
+        migrations.RunPython(preencher_quitadas, migrations.RunPython.noop),
+    ]
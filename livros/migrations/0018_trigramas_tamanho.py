@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+import re
+
+from django.db import migrations, models
+
+
+def _trigramas(texto):
+    resultado = set()
+    for palavra in re.findall(r"\w+", texto or ""):
+        p = f"  {palavra} "
+        resultado.update(p[i:i + 3] for i in range(len(p) - 2))
+    return resultado
+
+
+def reindexar_com_tamanho(apps, schema_editor):
+    Livro = apps.get_model('livros', 'CadastroLivroModel')
+    Trigrama = apps.get_model('livros', 'TrigramaLivro')
+    Trigrama.objects.all().delete()
+    lote = []
+    for livro in Livro.objects.only('id', 'nome_normalizado', 'autor_normalizado').iterator(chunk_size=1000):
+        campos = [t for t in (_trigramas(livro.nome_normalizado), _trigramas(livro.autor_normalizado)) if t]
+        if not campos:
+            continue
+        tamanho = min(len(t) for t in campos)
+        lote.extend(Trigrama(trigrama=t, livro_id=livro.pk, tamanho=tamanho) for t in set().union(*campos))
+        if len(lote) >= 20000:
+            Trigrama.objects.bulk_create(lote, batch_size=5000)
+            lote = []
+    if lote:
+        Trigrama.objects.bulk_create(lote, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0017_multa_quitada'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='trigramalivro',
+            name='unique_trigrama_livro',
+        ),
+        migrations.AddField(
+            model_name='trigramalivro',
+            name='tamanho',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        # recria as linhas com o tamanho antes de montar o índice novo
+        migrations.RunPython(reindexar_com_tamanho, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trigramalivro',
+            constraint=models.UniqueConstraint(fields=('trigrama', 'tamanho', 'livro'), name='unique_trigrama_tamanho_livro'),
+        ),
+    ]
@@ -1,11 +1,26 @@
+import random
+import time
+
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, models, transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
+
+from .isbn import normalizar_isbn
+from .texto import normalizar
 
 # ----------------------------
 # LIVRO
 # ----------------------------
+_ISBN_NAO_CARREGADO = object()
+
+
 class CadastroLivroModel(models.Model):
     STATUS_CHOICES = (('disponivel', 'Disponível'), ('emprestado', 'Emprestado'))
 
@@ -16,13 +31,224 @@ class CadastroLivroModel(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='disponivel')
 
+    # Cópias sem acento/casefold de nome e autor, usadas na busca e na ordenação
+    # (preenchidas no save; bulk_create/update precisam rodar `normalizar_livros`)
+    nome_normalizado = models.CharField(max_length=100, default='', editable=False)
+    autor_normalizado = models.CharField(max_length=100, default='', editable=False)
+    # ISBN-13 canônico (só dígitos) quando `isbn` é um ISBN válido; usado pelo leitor de código de barras
+    isbn_normalizado = models.CharField(max_length=13, null=True, blank=True, editable=False)
+
+    class Meta:
+        # Acessos do catálogo/dashboard: filtro por status + ordenação por nome/autor
+        # (o id entra implicitamente como desempate) e "últimos cadastrados".
+        indexes = [
+            models.Index(fields=['status', 'nome_normalizado'], name='livro_status_nomenorm_idx'),
+            models.Index(fields=['status', 'autor_normalizado'], name='livro_status_autornorm_idx'),
+            models.Index(fields=['nome_normalizado'], name='livro_nomenorm_idx'),
+            models.Index(fields=['autor_normalizado'], name='livro_autornorm_idx'),
+            models.Index(fields=['data_criacao'], name='livro_data_criacao_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['isbn_normalizado'],
+                name='unique_isbn_normalizado',
+                condition=models.Q(isbn_normalizado__isnull=False),
+            )
+        ]
+
     def __str__(self):
         return self.nome
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._isbn_do_banco = instance.__dict__.get("isbn", _ISBN_NAO_CARREGADO)
+        return instance
+
+    def _isbn_alterado(self):
+        return "isbn" in self.__dict__ and self.isbn != getattr(self, "_isbn_do_banco", _ISBN_NAO_CARREGADO)
+
+    def normalizar(self):
+        self.nome_normalizado = normalizar(self.nome)
+        self.autor_normalizado = normalizar(self.autor)
+        # só quando o isbn muda: o duplicado mais novo de um ISBN (migração 0011,
+        # normalizar_isbns) fica sem isbn_normalizado até alguém corrigir o isbn
+        if self._isbn_alterado():
+            self.isbn_normalizado = normalizar_isbn(self.isbn)
+
+    def clean(self):
+        super().clean()
+        codigo = normalizar_isbn(self.isbn) if self._isbn_alterado() else None
+        if codigo and CadastroLivroModel.objects.filter(isbn_normalizado=codigo).exclude(pk=self.pk).exists():
+            raise ValidationError({"isbn": "Já existe um livro cadastrado com este ISBN."})
+
+    def save(self, *args, **kwargs):
+        self.normalizar()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'nome', 'autor'} & update_fields:
+                update_fields |= {'nome_normalizado', 'autor_normalizado'}
+            if 'isbn' in update_fields:
+                update_fields.add('isbn_normalizado')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self._isbn_do_banco = self.__dict__.get("isbn", _ISBN_NAO_CARREGADO)
+
+
+# ----------------------------
+# ÍNDICE DE TRIGRAMAS (busca aproximada)
+# ----------------------------
+class TrigramaLivro(models.Model):
+    """Índice invertido trigrama -> livro, mantido a partir de nome/autor normalizados."""
+    trigrama = models.CharField(max_length=3)
+    livro = models.ForeignKey(CadastroLivroModel, on_delete=models.CASCADE, related_name='trigramas')
+    # trigramas do campo mais curto do livro (título ou autor), para o filtro de tamanho da busca
+    tamanho = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # também serve de índice (coberto) para a busca: trigrama -> faixa de tamanho -> livros;
+            # um livro é sempre gravado com um único tamanho
+            models.UniqueConstraint(fields=['trigrama', 'tamanho', 'livro'], name='unique_trigrama_tamanho_livro'),
+        ]
+
 
 # ----------------------------
 # EMPRÉSTIMO (História 2 + História 6)
 # ----------------------------
+TENTATIVAS_TRAVA_SQLITE = 10
+
+
+class EmprestimoRecusado(Exception):
+    """Empréstimo não pôde ser registrado; a mensagem explica o motivo."""
+
+
+class DiasEntre(models.Func):
+    """Dias corridos de ``inicio`` até ``fim`` (datas), na aritmética de datas de cada banco."""
+    output_field = models.IntegerField()
+    arity = 2
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL/Oracle: date - date já é um inteiro de dias
+        return super().as_sql(compiler, connection, template="(%(expressions)s)", arg_joiner=" - ", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)", arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="DATEDIFF", **extra_context)
+
+
+def _dias_atraso_sql(hoje):
+    """Expressão de ``Emprestimo.dias_atraso``: da data prevista até a devolução (ou ``hoje``), mínimo 0."""
+    fim = Coalesce("data_devolucao", models.Value(hoje, output_field=models.DateField()))
+    return Greatest(DiasEntre(fim, "data_prevista_devolucao"), models.Value(0))
+
+
+class EmprestimoQuerySet(models.QuerySet):
+
+    def com_atraso(self, hoje=None):
+        """
+        Anota ``atraso_db`` (mesma regra de ``dias_atraso``, calculada no
+        banco) e ``em_atraso`` (atraso_db > 0), para filtrar/ordenar sem
+        percorrer as linhas em Python. A property ``dias_atraso`` usa
+        ``atraso_db`` quando presente.
+        """
+        hoje = hoje or timezone.now().date()
+        return self.annotate(
+            atraso_db=_dias_atraso_sql(hoje),
+        ).annotate(
+            em_atraso=models.ExpressionWrapper(models.Q(atraso_db__gt=0), output_field=models.BooleanField()),
+        )
+
+    def atrasados(self, hoje=None):
+        """Empréstimos ativos já vencidos (filtro direto nas colunas de data, que usa índice)."""
+        hoje = hoje or timezone.now().date()
+        return self.filter(data_devolucao__isnull=True, data_prevista_devolucao__lt=hoje)
+
+    def renovaveis(self, max_renovacoes=1, hoje=None):
+        """
+        Empréstimos que ``pode_renovar`` aceitaria: ativos, ainda não vencidos
+        e abaixo do limite de renovações. É a mesma condição usada no WHERE
+        de ``renovar``.
+        """
+        hoje = hoje or timezone.now().date()
+        return self.filter(
+            data_devolucao__isnull=True,
+            data_prevista_devolucao__gte=hoje,
+            renovacao_count__lt=max_renovacoes,
+        )
+
+    def renovar(self, periodo_dias=7, max_renovacoes=1, hoje=None):
+        """
+        Renova, com um único UPDATE condicional, os empréstimos do queryset
+        que ainda são renováveis. As regras são conferidas de novo no WHERE,
+        então duas renovações concorrentes do mesmo empréstimo não passam do
+        limite: a segunda não encontra mais a linha.
+
+        Retorna o número de empréstimos renovados.
+        """
+        return self.renovaveis(max_renovacoes, hoje).update(
+            data_prevista_devolucao=F("data_prevista_devolucao") + timedelta(days=periodo_dias),
+            renovacao_count=F("renovacao_count") + 1,
+        )
+
+    def acumular_multas(self, valor_por_dia=2.00, carencia=0, hoje=None):
+        """
+        Calcula no banco, com um UPDATE, a multa dos empréstimos do queryset
+        pela regra de ``calcular_multa``: ativos vencidos acumulam multa até
+        ``hoje``, devolvidos ficam com a do dia da devolução. Quitar a multa
+        de um empréstimo ainda ativo não congela a cobrança: os dias seguintes
+        continuam somando e só a diferença para ``multa_quitada`` fica em
+        aberto. Multas quitadas de empréstimos já devolvidos não são tocadas
+        e linhas cujo valor não muda ficam de fora, então rodar de novo no
+        mesmo dia não altera nada. Os perfis de circulação dos usuários
+        afetados são recalculados na mesma transação.
+
+        Retorna o número de empréstimos atualizados.
+        """
+        hoje = hoje or timezone.now().date()
+        decimal = models.DecimalField(max_digits=6, decimal_places=2)
+        nova_multa = models.ExpressionWrapper(
+            Greatest(_dias_atraso_sql(hoje) - models.Value(carencia), models.Value(0))
+            * models.Value(Decimal(str(valor_por_dia)), output_field=decimal),
+            output_field=decimal,
+        )
+        pendentes = (
+            self.filter(
+                models.Q(data_devolucao__isnull=True, data_prevista_devolucao__lt=hoje)
+                | models.Q(data_devolucao__gt=F("data_prevista_devolucao"))
+                | models.Q(multa_paga=False)
+            )
+            .exclude(data_devolucao__isnull=False, multa_paga=True, multa_valor__gt=0)
+            .exclude(multa_valor=nova_multa)
+        )
+        with transaction.atomic():
+            usuarios = set(pendentes.order_by().values_list("usuario_id", flat=True).distinct())
+            if not usuarios:
+                return 0
+            # empréstimos que passam a ter multa agora: recebem o aviso
+            primeiras = list(
+                pendentes.filter(multa_valor=0).annotate(nova_multa=nova_multa)
+                .filter(nova_multa__gt=0).values_list("id", "usuario_id", "nova_multa")
+            )
+            atualizados = pendentes.update(
+                multa_valor=nova_multa,
+                multa_paga=models.Case(
+                    models.When(GreaterThan(nova_multa, F("multa_quitada")), then=models.Value(False)),
+                    default=models.Value(True),
+                ),
+            )
+            PerfilCirculacao.recalcular(usuarios)
+            Notificacao.enfileirar(Notificacao.multa_aplicada(*linha) for linha in primeiras)
+        return atualizados
+
+
 class Emprestimo(models.Model):
     livro = models.ForeignKey(CadastroLivroModel, on_delete=models.PROTECT, related_name='emprestimos')
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='emprestimos')
@@ -38,8 +264,20 @@ class Emprestimo(models.Model):
     # 🔥 Multas
     multa_valor = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     multa_paga = models.BooleanField(default=True)
+    # quanto da multa já foi pago; em aberto = multa_valor - multa_quitada
+    multa_quitada = models.DecimalField(max_digits=6, decimal_places=2, default=0)
 
     class Meta:
+        indexes = [
+            # lista de empréstimos: ativos/atrasados/devolvidos, multa pendente por usuário, período
+            models.Index(fields=['data_devolucao', 'data_prevista_devolucao'], name='emprestimo_devol_prev_idx'),
+            # parcial: só as multas em aberto (usuario_bloqueado e filtro "multa pendente")
+            models.Index(
+                fields=['usuario'], name='emprestimo_multa_aberta_idx',
+                condition=models.Q(multa_paga=False, multa_valor__gt=0),
+            ),
+            models.Index(fields=['data_saida'], name='emprestimo_data_saida_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['livro'],
@@ -51,8 +289,25 @@ class Emprestimo(models.Model):
     # ----------------------------
     # PROPRIEDADES
     # ----------------------------
+    objects = EmprestimoQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # datas como vieram do banco: atraso_db (com_atraso) só vale enquanto não mudarem
+        instance._datas_do_banco = (
+            instance.__dict__.get("data_prevista_devolucao"), instance.__dict__.get("data_devolucao"),
+        )
+        return instance
+
     @property
     def dias_atraso(self):
+        atraso_db = self.__dict__.get("atraso_db")
+        if atraso_db is not None and getattr(self, "_datas_do_banco", None) == (
+            self.data_prevista_devolucao, self.data_devolucao,
+        ):
+            return atraso_db
+
         hoje = timezone.now().date()
 
         if self.data_devolucao:
@@ -68,6 +323,27 @@ class Emprestimo(models.Model):
     def is_active(self):
         return self.data_devolucao is None
 
+    def _situacao_circulacao(self):
+        """
+        (usuario_id, ativo, multa em aberto) como está no objeto, para o
+        PerfilCirculacao; None se algum campo foi adiado com only()/defer().
+        """
+        campos = self.__dict__
+        if not {"usuario_id", "data_devolucao", "multa_valor", "multa_paga", "multa_quitada"} <= campos.keys():
+            return None
+        return campos["usuario_id"], campos["data_devolucao"] is None, self.multa_em_aberto
+
+    @property
+    def multa_em_aberto(self):
+        if self.multa_paga or self.multa_valor <= 0:
+            return Decimal("0")
+        return Decimal(str(self.multa_valor)) - Decimal(str(self.multa_quitada))
+
+    def _definir_multa(self, multa):
+        """Grava o valor total da multa no objeto; fica paga se o já quitado cobre o total."""
+        self.multa_valor = multa
+        self.multa_paga = Decimal(str(multa)) <= Decimal(str(self.multa_quitada))
+
     # ----------------------------
     # RENOVAÇÃO
     # ----------------------------
@@ -83,72 +359,430 @@ class Emprestimo(models.Model):
         
         return True, "Pode ser renovado."
 
-    def aplicar_renovacao(self, periodo_dias=7):
-        pode, motivo = self.pode_renovar()
+    def aplicar_renovacao(self, periodo_dias=7, max_renovacoes=1):
+        pode, motivo = self.pode_renovar(max_renovacoes)
         if not pode:
             raise Exception(f"Não foi possível renovar: {motivo}")
 
+        # UPDATE condicional: se outra requisição renovou/devolveu no meio
+        # tempo, a linha não passa mais no WHERE e nada é gravado
+        renovado = type(self).objects.filter(pk=self.pk).renovar(periodo_dias, max_renovacoes)
+        if not renovado:
+            raise Exception("Não foi possível renovar: o empréstimo foi alterado por outra operação.")
+
         self.data_prevista_devolucao += timedelta(days=periodo_dias)
         self.renovacao_count += 1
-        self.save(update_fields=['data_prevista_devolucao', 'renovacao_count'])
         return self.data_prevista_devolucao
 
+    @classmethod
+    def renovar_todos(cls, usuario, periodo_dias=7, max_renovacoes=1):
+        """
+        Renova todos os empréstimos ativos elegíveis de ``usuario``: uma
+        consulta traz os ativos (com o atraso calculado no banco) para
+        separar os que ``pode_renovar`` recusa, e um UPDATE condicional
+        renova o resto.
+
+        Retorna (quantidade renovada, lista de (emprestimo, motivo) recusados).
+        """
+        hoje = timezone.now().date()
+        ativos = cls.objects.com_atraso(hoje).filter(
+            usuario=usuario, data_devolucao__isnull=True,
+        ).select_related("livro").order_by("data_prevista_devolucao", "id")
+
+        elegiveis, recusados = [], []
+        for emprestimo in ativos:
+            pode, motivo = emprestimo.pode_renovar(max_renovacoes)
+            if pode:
+                elegiveis.append(emprestimo.pk)
+            else:
+                recusados.append((emprestimo, motivo))
+
+        if not elegiveis:
+            return 0, recusados
+        renovados = cls.objects.filter(pk__in=elegiveis).renovar(periodo_dias, max_renovacoes, hoje)
+        return renovados, recusados
+
     # ----------------------------
     # MULTAS (História 6)
     # ----------------------------
+    @staticmethod
+    def valor_multa(atraso, valor_por_dia=2.00, carencia=0):
+        """Multa para ``atraso`` dias (0 se estiver dentro da carência)."""
+        if atraso > carencia:
+            return (atraso - carencia) * valor_por_dia
+        return 0
+
+    @transaction.atomic
     def calcular_multa(self, valor_por_dia=2.00, carencia=0):
         """
         Qualquer atraso ≥ 1 dia gera multa.
         carencia=0 garante que seus testes funcionem com 3 dias.
         """
 
-        atraso = self.dias_atraso
-
-        if atraso > carencia:
-            dias_cobrados = atraso - carencia
-            multa = dias_cobrados * valor_por_dia
+        multa = self.valor_multa(self.dias_atraso, valor_por_dia, carencia)
 
-            self.multa_valor = multa
-            self.multa_paga = False
-            self.save(update_fields=['multa_valor', 'multa_paga'])
-            return multa
-
-        # sem multa
-        self.multa_valor = 0
-        self.multa_paga = True
+        self._definir_multa(multa)
         self.save(update_fields=['multa_valor', 'multa_paga'])
-        return 0
+        if multa:
+            Notificacao.enfileirar([Notificacao.multa_aplicada(self.pk, self.usuario_id, multa)])
+        return multa
 
+    @transaction.atomic
     def quitar_multa(self):
+        """Paga o que está em aberto; se o empréstimo seguir atrasado, os próximos dias voltam a ser cobrados."""
+        self.multa_quitada = self.multa_valor
         self.multa_paga = True
-        self.save(update_fields=['multa_paga'])
+        self.save(update_fields=['multa_quitada', 'multa_paga'])
+
+    # ----------------------------
+    # EMPRÉSTIMO
+    # ----------------------------
+    @classmethod
+    def registrar(cls, usuario, livro_id, data_saida, data_prevista_devolucao):
+        """
+        Empréstimo avulso em uma transação, seguro contra dois balcões
+        emprestando o mesmo livro ao mesmo tempo: no PostgreSQL a linha do
+        livro é travada com SELECT ... FOR UPDATE; em qualquer banco a troca
+        de status é um UPDATE condicional (``WHERE status='disponivel'``), e
+        só quem efetivamente mudou a linha segue adiante.
+
+        Levanta ``EmprestimoRecusado`` com o motivo quando não for possível.
+        """
+        for tentativa in range(TENTATIVAS_TRAVA_SQLITE):
+            try:
+                return cls._registrar(usuario, livro_id, data_saida, data_prevista_devolucao)
+            except OperationalError as exc:
+                # SQLite: outra transação segura a escrita ("database is locked");
+                # fora de um atomic externo dá para tentar de novo do zero
+                ultima = tentativa == TENTATIVAS_TRAVA_SQLITE - 1
+                if connection.vendor != "sqlite" or connection.in_atomic_block or "locked" not in str(exc) or ultima:
+                    raise
+                time.sleep(0.01 * (tentativa + 1) + random.random() * 0.01)
+
+    @classmethod
+    def _registrar(cls, usuario, livro_id, data_saida, data_prevista_devolucao):
+        from . import painel
+
+        with transaction.atomic():
+            livro = CadastroLivroModel.objects.select_for_update().filter(pk=livro_id).only("id", "status").first()
+            if livro is None:
+                raise EmprestimoRecusado("Livro inválido")
+
+            # reserva pronta vencida não segura mais o livro: a vez passa para a próxima da fila
+            Reserva.expirar_vencidas([livro.pk])
+            res_pronta = (
+                Reserva.objects.select_for_update()
+                .filter(livro_id=livro.pk, status="pronta")
+                .order_by("criada_em")
+                .first()
+            )
+            if res_pronta and res_pronta.usuario_id != usuario.pk:
+                raise EmprestimoRecusado("Livro reservado para retirada")
+
+            trocou = (
+                CadastroLivroModel.objects.filter(pk=livro.pk, status="disponivel")
+                .update(status="emprestado")
+            )
+            if not trocou:
+                raise EmprestimoRecusado("Livro indisponível para empréstimo")
+
+            try:
+                emprestimo = cls.objects.create(
+                    livro_id=livro.pk, usuario=usuario,
+                    data_saida=data_saida, data_prevista_devolucao=data_prevista_devolucao,
+                )
+            except IntegrityError:
+                # status dizia disponível, mas há empréstimo ativo: o UPDATE acima é desfeito
+                raise EmprestimoRecusado("Livro indisponível para empréstimo")
+
+            if res_pronta:
+                Reserva.objects.filter(pk=res_pronta.pk, status="pronta").update(
+                    status="concluida", concluida_em=timezone.now()
+                )
+
+        def aplicar():
+            painel.ajustar(disponivel=-1, emprestado=1)
+            painel.invalidar_recentes()
+
+        transaction.on_commit(aplicar)
+        return emprestimo
+
+    # ----------------------------
+    # EMPRÉSTIMO EM LOTE
+    # ----------------------------
+    @classmethod
+    def registrar_em_lote(cls, usuario, livro_ids, data_saida, data_prevista_devolucao):
+        """
+        Empresta vários livros ao mesmo usuário em uma transação, com número
+        fixo de consultas: livros + reservas prontas, INSERT em lote, um UPDATE
+        de status dos livros e um das reservas concluídas.
+
+        Retorna ``(emprestimos, falhas)``, onde ``falhas`` é uma lista de
+        ``{"livro_id": ..., "motivo": ...}`` com os itens recusados.
+        """
+        from . import painel
+
+        falhas = []
+        ids, vistos = [], set()
+        for bruto in livro_ids:
+            try:
+                livro_id = int(bruto)
+            except (TypeError, ValueError):
+                falhas.append({"livro_id": bruto, "motivo": "Livro inválido"})
+                continue
+            if livro_id in vistos:
+                falhas.append({"livro_id": livro_id, "motivo": "Livro repetido na lista"})
+                continue
+            vistos.add(livro_id)
+            ids.append(livro_id)
+
+        if not ids:
+            return [], falhas
+
+        aceitos = []
+        try:
+            with transaction.atomic():
+                ativo = cls.objects.filter(livro=OuterRef("pk"), data_devolucao__isnull=True)
+                livros = {
+                    livro.pk: livro
+                    for livro in CadastroLivroModel.objects.select_for_update()
+                    .filter(pk__in=ids)
+                    .annotate(com_emprestimo_ativo=Exists(ativo))
+                    .only("id", "status")
+                }
+                # primeira reserva pronta de cada livro (mesma regra do empréstimo avulso)
+                Reserva.expirar_vencidas(ids)
+                prontas = {}
+                for res in (
+                    Reserva.objects.filter(livro_id__in=ids, status="pronta")
+                    .order_by("criada_em")
+                    .values("id", "livro_id", "usuario_id")
+                ):
+                    prontas.setdefault(res["livro_id"], res)
+
+                concluir = []
+                for livro_id in ids:
+                    livro = livros.get(livro_id)
+                    res = prontas.get(livro_id)
+                    if livro is None:
+                        motivo = "Livro inválido"
+                    elif res and res["usuario_id"] != usuario.pk:
+                        motivo = "Livro reservado para retirada"
+                    elif livro.status != "disponivel" or livro.com_emprestimo_ativo:
+                        motivo = "Livro indisponível para empréstimo"
+                    else:
+                        aceitos.append(livro_id)
+                        if res:
+                            concluir.append(res["id"])
+                        continue
+                    falhas.append({"livro_id": livro_id, "motivo": motivo})
+
+                if not aceitos:
+                    return [], falhas
+
+                emprestimos = cls.objects.bulk_create([
+                    cls(
+                        livro_id=livro_id, usuario=usuario,
+                        data_saida=data_saida, data_prevista_devolucao=data_prevista_devolucao,
+                    )
+                    for livro_id in aceitos
+                ])
+                trocados = (
+                    CadastroLivroModel.objects.filter(pk__in=aceitos, status="disponivel")
+                    .update(status="emprestado")
+                )
+                if trocados != len(aceitos):
+                    raise IntegrityError("livro emprestado por outra transação")
+                PerfilCirculacao.aplicar_deltas({usuario.pk: (len(aceitos), 0, 0)})
+                if concluir:
+                    Reserva.objects.filter(pk__in=concluir).update(
+                        status="concluida", concluida_em=timezone.now()
+                    )
+        except IntegrityError:
+            # outro balcão levou algum dos livros entre a leitura e o INSERT
+            falhas.extend({"livro_id": i, "motivo": "Livro indisponível para empréstimo"} for i in aceitos)
+            return [], falhas
+
+        n = len(aceitos)
+
+        def aplicar():
+            painel.ajustar(disponivel=-n, emprestado=n)
+            painel.invalidar_recentes()
+
+        transaction.on_commit(aplicar)
+        return emprestimos, falhas
 
     # ----------------------------
     # DEVOLUÇÃO
     # ----------------------------
-    def registrar_devolucao(self, data_devolucao):
-        from .models import Reserva  
+    @transaction.atomic
+    def registrar_devolucao(self, data_devolucao, valor_por_dia=2.00, carencia=0):
+        """
+        Devolução avulsa em uma única transação, gravando cada linha no
+        máximo uma vez: o empréstimo (data + multa juntos, só se ainda estiver
+        ativo), o perfil do usuário, o livro (emprestado -> disponível) e a
+        reserva promovida, se houver fila.
+
+        Orçamento de consultas (coberto por assertNumQueries em
+        test_devolucao.py), sem contar SAVEPOINT/RELEASE:
+        3 UPDATEs (empréstimo, perfil, livro) + 2 SELECTs (reservas vencidas,
+        primeira da fila); com multa, + 1 INSERT do aviso; com fila, + 1 UPDATE
+        da reserva promovida e 1 INSERT do aviso.
+        """
+        from . import painel
 
+        atraso = max(0, (data_devolucao - self.data_prevista_devolucao).days)
+        multa = self.valor_multa(atraso, valor_por_dia, carencia)
+        devolvido = type(self).objects.filter(pk=self.pk, data_devolucao__isnull=True).update(
+            data_devolucao=data_devolucao, multa_valor=multa,
+            # o que já foi quitado durante o empréstimo abate do total
+            multa_paga=models.Case(
+                models.When(multa_quitada__gte=multa, then=models.Value(True)),
+                default=models.Value(False),
+            ),
+        )
+        if not devolvido:
+            raise ValueError("O empréstimo já foi devolvido.")
+
+        antes = getattr(self, "_circulacao_original", None)
         self.data_devolucao = data_devolucao
-        self.save(update_fields=['data_devolucao'])
+        self._definir_multa(multa)
+        depois = self._situacao_circulacao()
+        self._circulacao_original = depois
+        PerfilCirculacao.aplicar_deltas(
+            PerfilCirculacao.deltas_entre([(antes, depois)]) or {self.usuario_id: None}
+        )
+        if multa:
+            Notificacao.enfileirar([Notificacao.multa_aplicada(self.pk, self.usuario_id, multa)])
+
+        # livro volta a ficar disponível (sem carregar a linha)
+        liberado = (
+            CadastroLivroModel.objects.filter(pk=self.livro_id, status='emprestado')
+            .update(status='disponivel')
+        )
+        if liberado and 'livro' in self._state.fields_cache:
+            self.livro.status = self.livro._status_original = 'disponivel'
 
-        # Calcula multa automaticamente
-        self.calcular_multa()
+        # regras de reserva (só a fila deste livro; o resto fica com processar_reservas)
+        Reserva.expirar_vencidas([self.livro_id])
+        Reserva.promover_primeiras([self.livro_id])
 
-        # livro volta a ficar disponível
-        self.livro.status = 'disponivel'
-        self.livro.save(update_fields=['status'])
+        if liberado:
+            def aplicar():
+                painel.ajustar(disponivel=1, emprestado=-1)
+                painel.invalidar_recentes()
 
-        # regras de reserva
-        Reserva.expirar_vencidas()
-        Reserva.promover_primeira(self.livro)
+            transaction.on_commit(aplicar)
 
-        return self.dias_atraso
+        return atraso
+
+    @classmethod
+    def registrar_devolucoes_em_lote(cls, emprestimo_ids, data_devolucao, valor_por_dia=2.00, carencia=0):
+        """
+        Devolve vários empréstimos de uma vez (ex.: caixa de devolução):
+        um UPDATE em lote para datas e multas, um UPDATE para o status dos
+        livros, a expiração de reservas uma única vez e a promoção das filas
+        de todos os livros afetados em uma passada.
+
+        Retorna ``(devolvidos, falhas)``; ``falhas`` segue o formato de
+        ``registrar_em_lote``.
+        """
+        from . import painel
+
+        falhas = []
+        ids, vistos = [], set()
+        for bruto in emprestimo_ids:
+            try:
+                emprestimo_id = int(bruto)
+            except (TypeError, ValueError):
+                falhas.append({"emprestimo_id": bruto, "motivo": "Empréstimo inválido"})
+                continue
+            if emprestimo_id not in vistos:
+                vistos.add(emprestimo_id)
+                ids.append(emprestimo_id)
+
+        with transaction.atomic():
+            ativos = {
+                e.pk: e
+                for e in cls.objects.select_for_update()
+                .filter(pk__in=ids, data_devolucao__isnull=True)
+                .only("id", "livro_id", "usuario_id", "data_prevista_devolucao", "data_devolucao",
+                      "multa_valor", "multa_paga", "multa_quitada")
+            }
+            devolvidos = []
+            for emprestimo_id in ids:
+                emp = ativos.get(emprestimo_id)
+                if emp is None:
+                    falhas.append({"emprestimo_id": emprestimo_id, "motivo": "Empréstimo inexistente ou já devolvido"})
+                    continue
+                emp.data_devolucao = data_devolucao
+                emp._definir_multa(cls.valor_multa(emp.dias_atraso, valor_por_dia, carencia))
+                devolvidos.append(emp)
+
+            if not devolvidos:
+                return [], falhas
+
+            cls.objects.bulk_update(devolvidos, ["data_devolucao", "multa_valor", "multa_paga"])
+            PerfilCirculacao.aplicar_deltas(PerfilCirculacao.deltas_entre(
+                (emp._circulacao_original, emp._situacao_circulacao()) for emp in devolvidos
+            ))
+            for emp in devolvidos:
+                emp._circulacao_original = emp._situacao_circulacao()
+            Notificacao.enfileirar(
+                Notificacao.multa_aplicada(emp.pk, emp.usuario_id, emp.multa_valor)
+                for emp in devolvidos if emp.multa_valor
+            )
+            livro_ids = [emp.livro_id for emp in devolvidos]
+            liberados = (
+                CadastroLivroModel.objects.filter(pk__in=livro_ids, status="emprestado")
+                .update(status="disponivel")
+            )
+
+            Reserva.expirar_vencidas(livro_ids)
+            Reserva.promover_primeiras(livro_ids)
+
+        def aplicar():
+            painel.ajustar(disponivel=liberados, emprestado=-liberados)
+            painel.invalidar_recentes()
+
+        transaction.on_commit(aplicar)
+        return devolvidos, falhas
 
 
 # ----------------------------
 # RESERVA (História 3)
 # ----------------------------
+# fila do livro numerada por função de janela; correlacionada pelo livro da
+# reserva de fora, então a janela vê a fila inteira do livro e não só as
+# linhas que sobraram depois do filtro do usuário (o Django < 4.2 não
+# deixa filtrar sobre uma anotação Window)
+FILA_RESERVA_SQL = (
+    "SELECT f.{coluna} FROM ("
+    "SELECT r.id, "
+    "ROW_NUMBER() OVER (ORDER BY r.criada_em, r.id) AS posicao, "
+    "COUNT(*) OVER () AS tamanho "
+    "FROM livros_reserva r WHERE r.status = 'ativa' AND r.livro_id = livros_reserva.livro_id"
+    ") f WHERE f.id = livros_reserva.id"
+)
+
+
+class ReservaQuerySet(models.QuerySet):
+
+    def com_posicao_na_fila(self, usuario):
+        """
+        Reservas de ``usuario`` anotadas com ``posicao_fila`` (1 = próxima a
+        ser atendida) e ``tamanho_fila`` do livro, numa consulta só. Cada
+        valor vem de uma subconsulta com função de janela sobre a fila do
+        livro (índice reserva_fila_idx).
+
+        Só as reservas ``ativa`` recebem valores; nas demais ficam None.
+        """
+        return self.filter(usuario=usuario).annotate(
+            posicao_fila=RawSQL(FILA_RESERVA_SQL.format(coluna="posicao"), (), output_field=models.IntegerField()),
+            tamanho_fila=RawSQL(FILA_RESERVA_SQL.format(coluna="tamanho"), (), output_field=models.IntegerField()),
+        )
+
+
 class Reserva(models.Model):
     STATUS_CHOICES = (
         ('ativa', 'Ativa'),
@@ -169,14 +803,26 @@ class Reserva(models.Model):
     concluida_em = models.DateTimeField(null=True, blank=True)
     expirada_em = models.DateTimeField(null=True, blank=True)
 
+    objects = ReservaQuerySet.as_manager()
+
     class Meta:
         ordering = ['criada_em']
+        indexes = [
+            # fila de cada livro: primeira_na_fila, promoção e posição na fila
+            models.Index(fields=['livro', 'status', 'criada_em'], name='reserva_fila_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['livro', 'usuario'],
                 name='unique_reserva_ativa_por_usuario',
                 condition=models.Q(status__in=['ativa', 'pronta']),
-            )
+            ),
+            # no máximo uma reserva aguardando retirada por livro
+            models.UniqueConstraint(
+                fields=['livro'],
+                name='unique_reserva_pronta_por_livro',
+                condition=models.Q(status='pronta'),
+            ),
         ]
 
     def __str__(self):
@@ -186,40 +832,352 @@ class Reserva(models.Model):
     def _prazo_retirada_dias():
         return 2
 
+    @property
+    def vencida(self):
+        """Pronta com o prazo de retirada esgotado, mesmo antes de processar_reservas gravar 'expirada'."""
+        return self.status == 'pronta' and self.expira_em is not None and self.expira_em < timezone.now()
+
+    @property
+    def status_efetivo(self):
+        return 'expirada' if self.vencida else self.status
+
+    def get_status_efetivo_display(self):
+        return dict(self.STATUS_CHOICES)[self.status_efetivo]
+
     @classmethod
     def primeira_na_fila(cls, livro):
         return cls.objects.filter(livro=livro, status='ativa').order_by('criada_em').first()
 
     @classmethod
     def promover_primeira(cls, livro):
-        res = cls.primeira_na_fila(livro)
-        if not res:
-            return None
-        agora = timezone.now()
-        res.status = 'pronta'
-        res.pronta_em = agora
-        res.expira_em = agora + timezone.timedelta(days=cls._prazo_retirada_dias())
-        res.save(update_fields=['status', 'pronta_em', 'expira_em'])
-        return res
+        ids = cls.promover_primeiras([getattr(livro, 'pk', livro)])
+        return cls.objects.get(pk=ids[0]) if ids else None
 
     @classmethod
-    def expirar_vencidas(cls):
+    def promover_primeiras(cls, livro_ids):
+        """
+        Promove a primeira da fila de cada livro em ``livro_ids`` (que ainda
+        não tenha reserva pronta) com um SELECT e um UPDATE. Retorna os ids
+        promovidos.
+
+        Devoluções, cancelamentos e o processar_reservas podem promover ao
+        mesmo tempo. Onde o banco tem ``SKIP LOCKED`` a primeira da fila fica
+        travada até o fim da transação e quem chegar depois pula o livro; nos
+        demais o UPDATE só vale se a reserva ainda estiver ativa e o livro
+        ainda não tiver pronta (compare-and-set). Em último caso a
+        constraint unique_reserva_pronta_por_livro recusa a segunda pronta.
+        """
+        livro_ids = set(livro_ids)
+        if not livro_ids:
+            return []
+        primeira = (
+            cls.objects.filter(livro=OuterRef("livro"), status="ativa")
+            .order_by("criada_em", "id")
+            .values("pk")[:1]
+        )
+        pronta = cls.objects.filter(livro=OuterRef("livro"), status="pronta")
+        candidatas = (
+            cls.objects.filter(livro_id__in=livro_ids, status="ativa", pk=Subquery(primeira))
+            .exclude(Exists(pronta))
+        )
+
+        travar = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic(savepoint=False):
+            if travar:
+                candidatas = candidatas.select_for_update(skip_locked=True)
+            usuarios = dict(candidatas.values_list("pk", "usuario_id"))
+            ids = list(usuarios)
+            if not ids:
+                return []
+
+            agora = timezone.now()
+            expira_em = agora + timezone.timedelta(days=cls._prazo_retirada_dias())
+            promover = cls.objects.filter(pk__in=ids, status="ativa")
+            if not travar:
+                promover = promover.exclude(Exists(pronta))
+            promovidas = promover.update(status="pronta", pronta_em=agora, expira_em=expira_em)
+            if promovidas < len(ids):
+                # outra promoção chegou antes em algum livro
+                ids = list(cls.objects.filter(pk__in=ids, status="pronta", pronta_em=agora).values_list("pk", flat=True))
+            Notificacao.enfileirar(Notificacao.reserva_pronta(pk, usuarios[pk], expira_em) for pk in ids)
+        return ids
+
+    @classmethod
+    def expirar_vencidas(cls, livro_ids=None):
+        """
+        Expira as reservas prontas com prazo de retirada esgotado e passa a
+        vez para a próxima da fila. Sem ``livro_ids`` varre todas (é o que o
+        comando processar_reservas faz periodicamente); as operações de
+        balcão passam só os livros que estão mexendo.
+
+        Custa um SELECT das vencidas, um UPDATE, um INSERT dos avisos e o
+        que ``promover_primeiras`` gastar, qualquer que seja o número de
+        reservas vencidas.
+
+        Retorna o número de reservas expiradas.
+        """
         agora = timezone.now()
-        vencidas = list(cls.objects.filter(status='pronta', expira_em__lt=agora))
-        for r in vencidas:
-            r.status = 'expirada'
-            r.expirada_em = agora
-            r.save(update_fields=['status', 'expirada_em'])
-            cls.promover_primeira(r.livro)
+        vencidas = cls.objects.filter(status='pronta', expira_em__lt=agora)
+        if livro_ids is not None:
+            vencidas = vencidas.filter(livro_id__in=set(livro_ids))
+
+        # sem savepoint: dentro da devolução/empréstimo vai na transação de quem chamou
+        with transaction.atomic(savepoint=False):
+            linhas = list(vencidas.order_by().values_list('pk', 'livro_id', 'usuario_id'))
+            if not linhas:
+                return 0
+            ids = {pk for pk, _, _ in linhas}
+            expiradas = cls.objects.filter(pk__in=ids, status='pronta').update(status='expirada', expirada_em=agora)
+            if expiradas < len(ids):
+                # outro worker expirou parte delas antes; o aviso fica com ele
+                ids = set(cls.objects.filter(pk__in=ids, expirada_em=agora).values_list('pk', flat=True))
+            Notificacao.enfileirar(
+                Notificacao.reserva_expirada(pk, usuario_id) for pk, _, usuario_id in linhas if pk in ids
+            )
+            cls.promover_primeiras({livro_id for _, livro_id, _ in linhas})
+        return expiradas
 
     def cancelar(self):
-        self.status = 'cancelada'
-        self.cancelada_em = timezone.now()
-        self.save(update_fields=['status', 'cancelada_em'])
-        if self.status == 'pronta':
-            type(self).promover_primeira(self.livro)
+        """
+        Cancela a reserva se ela ainda estiver ativa ou pronta; sendo pronta,
+        a vez passa para a próxima da fila. Retorna False se outra operação
+        já tinha mudado o status.
+        """
+        agora = timezone.now()
+        reservas = type(self).objects.filter(pk=self.pk)
+        with transaction.atomic():
+            # um UPDATE por status possível: o que casar diz o que a reserva era
+            era_pronta = reservas.filter(status='pronta').update(status='cancelada', cancelada_em=agora)
+            if not era_pronta and not reservas.filter(status='ativa').update(status='cancelada', cancelada_em=agora):
+                return False
+            self.status, self.cancelada_em = 'cancelada', agora
+            if era_pronta:
+                type(self).promover_primeiras([self.livro_id])
+        return True
 
     def concluir(self):
         self.status = 'concluida'
         self.concluida_em = timezone.now()
         self.save(update_fields=['status', 'concluida_em'])
+
+
+# ----------------------------
+# PERFIL DE CIRCULAÇÃO (por usuário)
+# ----------------------------
+class PerfilCirculacao(models.Model):
+    """
+    Resumo desnormalizado da situação de cada usuário: total e quantidade de
+    multas em aberto e empréstimos ativos. Atualizado na mesma transação de
+    cada save de Emprestimo (signals) e pelas operações em lote; bloqueio e
+    saldo exibido viram uma leitura pela chave primária.
+    ``recalcular`` (comando reconciliar_perfis) reconstrói a partir de Emprestimo.
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='perfil_circulacao'
+    )
+    multa_aberta_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    multas_pendentes = models.IntegerField(default=0)
+    emprestimos_ativos = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'Perfil de {self.usuario_id}: {self.emprestimos_ativos} ativo(s), R$ {self.multa_aberta_total}'
+
+    @property
+    def bloqueado(self):
+        return self.multas_pendentes > 0
+
+    @staticmethod
+    def deltas_entre(pares):
+        """
+        Soma, por usuário, a diferença entre situações ``(antes, depois)`` de
+        empréstimos (ver ``Emprestimo._situacao_circulacao``). Se um dos
+        lados for desconhecido (None), o usuário fica com ``None``: recalcular.
+        """
+        deltas, desconhecidos = {}, set()
+        for antes, depois in pares:
+            if antes is None or depois is None:
+                desconhecidos.update(situacao[0] for situacao in (antes, depois) if situacao)
+                continue
+            for (usuario_id, ativo, aberta), sinal in ((antes, -1), (depois, 1)):
+                ativos, pendentes, total = deltas.get(usuario_id, (0, 0, Decimal(0)))
+                deltas[usuario_id] = (
+                    ativos + sinal * int(ativo),
+                    pendentes + sinal * int(aberta > 0),
+                    total + sinal * aberta,
+                )
+        deltas.update(dict.fromkeys(desconhecidos))
+        return deltas
+
+    @classmethod
+    def aplicar_deltas(cls, deltas):
+        """
+        ``deltas``: ``{usuario_id: (ativos, pendentes, total)}`` somados aos
+        perfis com um único UPDATE; ``None`` ou perfil inexistente => recalcula
+        aquele usuário a partir de Emprestimo.
+        """
+        recalcular = {u for u, d in deltas.items() if d is None}
+        deltas = {u: d for u, d in deltas.items() if d is not None and any(d)}
+        if deltas:
+            def caso(i):
+                return models.Case(
+                    *(models.When(usuario_id=u, then=models.Value(d[i])) for u, d in deltas.items()),
+                    default=models.Value(0),
+                )
+            atualizados = cls.objects.filter(usuario_id__in=deltas).update(
+                emprestimos_ativos=F('emprestimos_ativos') + caso(0),
+                multas_pendentes=F('multas_pendentes') + caso(1),
+                multa_aberta_total=F('multa_aberta_total') + models.Case(
+                    *(models.When(usuario_id=u, then=models.Value(d[2], output_field=models.DecimalField()))
+                      for u, d in deltas.items()),
+                    default=models.Value(0, output_field=models.DecimalField()),
+                    output_field=models.DecimalField(),
+                ),
+            )
+            if atualizados < len(deltas):
+                existentes = set(cls.objects.filter(usuario_id__in=deltas).values_list('usuario_id', flat=True))
+                recalcular |= set(deltas) - existentes
+        if recalcular:
+            cls.recalcular(recalcular)
+
+    @classmethod
+    def recalcular(cls, usuario_ids=None, lote=1000):
+        """
+        Reconstrói os perfis (todos, ou só de ``usuario_ids``) com uma
+        consulta agregada e upsert em lotes. Retorna quantos perfis gravou.
+        """
+        from django.contrib.auth import get_user_model
+
+        usuarios = get_user_model().objects.all()
+        if usuario_ids is not None:
+            usuarios = usuarios.filter(pk__in=list(usuario_ids))
+        em_aberto = models.Q(emprestimos__multa_paga=False, emprestimos__multa_valor__gt=0)
+        linhas = (
+            usuarios.order_by()
+            .annotate(
+                ativos=models.Count('emprestimos', filter=models.Q(emprestimos__data_devolucao__isnull=True)),
+                pendentes=models.Count('emprestimos', filter=em_aberto),
+                total=models.Sum(
+                    F('emprestimos__multa_valor') - F('emprestimos__multa_quitada'), filter=em_aberto, default=0,
+                ),
+            )
+            .values_list('pk', 'ativos', 'pendentes', 'total')
+        )
+
+        gravados = 0
+        perfis = []
+        for pk, ativos, pendentes, total in linhas.iterator(chunk_size=lote):
+            perfis.append(cls(usuario_id=pk, emprestimos_ativos=ativos, multas_pendentes=pendentes,
+                              multa_aberta_total=total))
+            if len(perfis) >= lote:
+                gravados += cls._gravar(perfis)
+                perfis = []
+        if perfis:
+            gravados += cls._gravar(perfis)
+        return gravados
+
+    @classmethod
+    def _gravar(cls, perfis):
+        cls.objects.bulk_create(
+            perfis, update_conflicts=True, unique_fields=['usuario'],
+            update_fields=['emprestimos_ativos', 'multas_pendentes', 'multa_aberta_total'],
+        )
+        return len(perfis)
+
+
+# ----------------------------
+# NOTIFICAÇÕES (outbox)
+# ----------------------------
+class Notificacao(models.Model):
+    """
+    Caixa de saída dos avisos aos usuários. Cada mudança de estado que
+    merece aviso grava uma linha aqui na mesma transação da mudança (se ela
+    for desfeita, o aviso também é); o comando enviar_notificacoes lê as
+    pendentes em lotes e manda os e-mails fora do ciclo de requisição.
+
+    ``chave`` torna a gravação idempotente: o mesmo evento enfileirado duas
+    vezes (reprocessamento, corrida entre workers) vira uma linha só.
+    """
+    TIPOS = (
+        ('reserva_pronta', 'Reserva pronta para retirada'),
+        ('reserva_expirada', 'Reserva expirada'),
+        ('emprestimo_vencendo', 'Empréstimo perto do vencimento'),
+        ('multa_aplicada', 'Multa aplicada'),
+    )
+
+    tipo = models.CharField(max_length=30, choices=TIPOS)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notificacoes')
+    reserva = models.ForeignKey(Reserva, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    emprestimo = models.ForeignKey(Emprestimo, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    # retrato do evento (prazo, valor...) para a mensagem não depender de quando for enviada
+    dados = models.JSONField(default=dict, blank=True)
+    chave = models.CharField(max_length=120, unique=True)
+
+    criada_em = models.DateTimeField(auto_now_add=True)
+    enviada_em = models.DateTimeField(null=True, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    ultimo_erro = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # parcial: o despachante só lê as pendentes, em ordem de id
+            models.Index(fields=['id'], name='notificacao_pendente_idx', condition=models.Q(enviada_em__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.get_tipo_display()} - {self.usuario_id} ({self.chave})'
+
+    @classmethod
+    def enfileirar(cls, notificacoes):
+        """Grava as notificações com um INSERT, ignorando as que já existem (mesma chave)."""
+        notificacoes = list(notificacoes)
+        if notificacoes:
+            cls.objects.bulk_create(notificacoes, ignore_conflicts=True)
+
+    @classmethod
+    def reserva_pronta(cls, reserva_id, usuario_id, expira_em):
+        return cls(
+            tipo='reserva_pronta', usuario_id=usuario_id, reserva_id=reserva_id,
+            dados={'expira_em': expira_em.isoformat()}, chave=f'reserva_pronta:{reserva_id}',
+        )
+
+    @classmethod
+    def reserva_expirada(cls, reserva_id, usuario_id):
+        return cls(
+            tipo='reserva_expirada', usuario_id=usuario_id, reserva_id=reserva_id,
+            chave=f'reserva_expirada:{reserva_id}',
+        )
+
+    @classmethod
+    def emprestimo_vencendo(cls, emprestimo_id, usuario_id, data_prevista):
+        # a chave inclui a data: depois de uma renovação o aviso vale de novo
+        return cls(
+            tipo='emprestimo_vencendo', usuario_id=usuario_id, emprestimo_id=emprestimo_id,
+            dados={'data_prevista': data_prevista.isoformat()},
+            chave=f'emprestimo_vencendo:{emprestimo_id}:{data_prevista.isoformat()}',
+        )
+
+    @classmethod
+    def multa_aplicada(cls, emprestimo_id, usuario_id, valor):
+        # um aviso por empréstimo, quando a multa aparece; os aumentos diários não geram outro
+        return cls(
+            tipo='multa_aplicada', usuario_id=usuario_id, emprestimo_id=emprestimo_id,
+            dados={'valor': str(Decimal(str(valor)).quantize(Decimal('0.01')))},
+            chave=f'multa_aplicada:{emprestimo_id}',
+        )
+
+    @classmethod
+    def avisar_vencimentos(cls, dias=2, hoje=None):
+        """
+        Enfileira o aviso dos empréstimos ativos que vencem nos próximos
+        ``dias`` (um SELECT + um INSERT). Retorna quantos estavam no prazo.
+        """
+        hoje = hoje or timezone.now().date()
+        vencendo = list(
+            Emprestimo.objects.filter(
+                data_devolucao__isnull=True,
+                data_prevista_devolucao__gte=hoje,
+                data_prevista_devolucao__lte=hoje + timedelta(days=dias),
+            ).values_list('id', 'usuario_id', 'data_prevista_devolucao')
+        )
+        cls.enfileirar(cls.emprestimo_vencendo(*linha) for linha in vencendo)
+        return len(vencendo)
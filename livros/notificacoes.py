@@ -0,0 +1,112 @@
+"""
+Envio dos avisos gravados na caixa de saída (``Notificacao``).
+
+As linhas são gravadas junto com a mudança de estado (reserva pronta ou
+expirada, multa aplicada, empréstimo perto do vencimento) e enviadas aqui,
+em lotes, pelo backend de e-mail do Django. A entrega é "pelo menos uma
+vez": a linha só é marcada como enviada depois do envio, então se o
+processo cair no meio o lote é reenviado na próxima execução.
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import Notificacao
+
+MAX_TENTATIVAS = 5
+
+
+def _valor(dados):
+    return dados["valor"].replace(".", ",")
+
+
+def _expira_em(dados):
+    return timezone.localtime(datetime.fromisoformat(dados["expira_em"])).strftime("%d/%m/%Y %H:%M")
+
+
+def _data_prevista(dados):
+    return date.fromisoformat(dados["data_prevista"]).strftime("%d/%m/%Y")
+
+
+def montar(notificacao):
+    """(assunto, corpo) do e-mail de ``notificacao``."""
+    dados = notificacao.dados
+    alvo = notificacao.reserva or notificacao.emprestimo
+    livro = alvo.livro.nome if alvo else "—"
+
+    if notificacao.tipo == "reserva_pronta":
+        return (
+            "Sua reserva está disponível para retirada",
+            f'O livro "{livro}" está separado para você até {_expira_em(dados)}.',
+        )
+    if notificacao.tipo == "reserva_expirada":
+        return (
+            "Sua reserva expirou",
+            f'O prazo para retirar "{livro}" terminou e a reserva foi encerrada.',
+        )
+    if notificacao.tipo == "emprestimo_vencendo":
+        return (
+            "Empréstimo perto do vencimento",
+            f'A devolução de "{livro}" está prevista para {_data_prevista(dados)}.',
+        )
+    return (
+        "Multa aplicada",
+        f'Foi aplicada uma multa de R$ {_valor(dados)} ao empréstimo de "{livro}".',
+    )
+
+
+def pendentes(max_tentativas=MAX_TENTATIVAS):
+    return (
+        Notificacao.objects.filter(enviada_em__isnull=True, tentativas__lt=max_tentativas)
+        .select_related("usuario", "reserva__livro", "emprestimo__livro")
+        .order_by("id")
+    )
+
+
+def enviar_pendentes(lote=100, max_tentativas=MAX_TENTATIVAS):
+    """
+    Envia as notificações pendentes em lotes de ``lote``: uma consulta por
+    lote, uma conexão com o servidor de e-mail por lote e um UPDATE com o
+    resultado de todas. Falhas somam uma tentativa e guardam o erro; depois de
+    ``max_tentativas`` a notificação deixa de ser tentada.
+
+    Retorna (enviadas, falhas).
+    """
+    enviadas = falhas = 0
+    ultimo_id = 0
+    while True:
+        # ultimo_id: o que falhou neste lote não volta na mesma execução
+        itens = list(pendentes(max_tentativas).filter(id__gt=ultimo_id)[:lote])
+        if not itens:
+            return enviadas, falhas
+        ultimo_id = itens[-1].pk
+
+        ok, sem_email, com_erro = [], [], []
+        with get_connection() as conexao:
+            for notificacao in itens:
+                email = notificacao.usuario.email
+                if not email:
+                    # não há para onde mandar: sai da fila com o motivo registrado
+                    notificacao.ultimo_erro = "usuário sem e-mail"
+                    sem_email.append(notificacao)
+                    continue
+                assunto, corpo = montar(notificacao)
+                try:
+                    EmailMessage(
+                        assunto, corpo, settings.DEFAULT_FROM_EMAIL, [email], connection=conexao,
+                    ).send()
+                except Exception as exc:  # noqa: BLE001 - qualquer falha de envio conta como tentativa
+                    notificacao.tentativas += 1
+                    notificacao.ultimo_erro = str(exc)[:500]
+                    com_erro.append(notificacao)
+                else:
+                    ok.append(notificacao)
+
+        agora = timezone.now()
+        for notificacao in ok + sem_email:
+            notificacao.enviada_em = agora
+        Notificacao.objects.bulk_update(ok + sem_email + com_erro, ["enviada_em", "tentativas", "ultimo_erro"])
+        enviadas += len(ok)
+        falhas += len(com_erro)
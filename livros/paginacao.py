@@ -0,0 +1,160 @@
+"""
+Paginação por cursor (keyset) para listagens grandes.
+
+Em vez de ``OFFSET`` + ``COUNT(*)`` a cada página, cada link carrega a
+última chave vista (valor da coluna de ordenação + id) e a próxima página é
+buscada com ``WHERE (coluna, id) > (valor, id)``, que usa índice e custa o
+mesmo na página 1 ou na 4000.
+"""
+import base64
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+TTL_TOTAL_APROXIMADO = 300  # segundos
+INTEIRO_MAXIMO = 2 ** 63 - 1  # BigAutoField / INTEGER do SQLite
+
+
+def codificar_cursor(valor, pk, direcao):
+    bruto = json.dumps([valor, pk, direcao], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def _inteiro_valido(n):
+    return isinstance(n, int) and not isinstance(n, bool) and -INTEIRO_MAXIMO <= n <= INTEIRO_MAXIMO
+
+
+def _valor_valido(valor):
+    """Só escalares que a coluna de ordenação pode conter e o banco aceita comparar."""
+    if isinstance(valor, str):
+        return True
+    if isinstance(valor, float):
+        return math.isfinite(valor)
+    return _inteiro_valido(valor)
+
+
+def decodificar_cursor(cursor):
+    """Retorna (valor, pk, direcao) ou None se o cursor vier vazio/adulterado."""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, pk, direcao = json.loads(bruto)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if direcao not in ("prox", "ant") or not _inteiro_valido(pk) or not _valor_valido(valor):
+        return None
+    return valor, pk, direcao
+
+
+class PaginaCursor:
+    """Página de resultados com cursores para a próxima/anterior."""
+
+    def __init__(self, itens, cursor_proximo=None, cursor_anterior=None, total_aproximado=None):
+        self.object_list = itens
+        self.cursor_proximo = cursor_proximo
+        self.cursor_anterior = cursor_anterior
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, i):
+        return self.object_list[i]
+
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+
+def _depois_de(campo, desc, valor, pk):
+    """Condição "vem depois de (valor, pk)" na ordem (campo, id)."""
+    op = "lt" if desc else "gt"
+    # o limite redundante (campo >= valor) dá ao planner um intervalo no índice;
+    # só com o OR ele varreria desde o início
+    limite = Q(**{f"{campo}__{op}e": valor})
+    return limite & (Q(**{f"{campo}__{op}": valor}) | Q(**{campo: valor, f"id__{op}": pk}))
+
+
+def _antes_de(campo, desc, valor, pk):
+    return _depois_de(campo, not desc, valor, pk)
+
+
+def paginar_por_cursor(qs, ordenacao, cursor=None, por_pagina=20):
+    """
+    Pagina ``qs`` pela ordenação ``ordenacao`` ("nome", "-autor", ...) com
+    desempate por id. ``cursor`` vem do link anterior (ou None na primeira página).
+    """
+    desc = ordenacao.startswith("-")
+    campo = ordenacao.lstrip("-")
+    sinal = "-" if desc else ""
+    inverso = "" if desc else "-"
+
+    posicao = decodificar_cursor(cursor)
+    voltando = posicao is not None and posicao[2] == "ant"
+
+    if posicao is None:
+        qs = qs.order_by(f"{sinal}{campo}", f"{sinal}id")
+    elif voltando:
+        qs = qs.filter(_antes_de(campo, desc, posicao[0], posicao[1]))
+        qs = qs.order_by(f"{inverso}{campo}", f"{inverso}id")
+    else:
+        qs = qs.filter(_depois_de(campo, desc, posicao[0], posicao[1]))
+        qs = qs.order_by(f"{sinal}{campo}", f"{sinal}id")
+
+    # busca um item a mais só para saber se existe outra página
+    itens = list(qs[: por_pagina + 1])
+    tem_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+    if voltando:
+        itens.reverse()
+
+    if not itens:
+        return PaginaCursor([])
+
+    primeiro, ultimo = itens[0], itens[-1]
+    ha_proxima = tem_mais if not voltando else True
+    ha_anterior = tem_mais if voltando else posicao is not None
+
+    return PaginaCursor(
+        itens,
+        cursor_proximo=codificar_cursor(getattr(ultimo, campo), ultimo.pk, "prox") if ha_proxima else None,
+        cursor_anterior=codificar_cursor(getattr(primeiro, campo), primeiro.pk, "ant") if ha_anterior else None,
+    )
+
+
+def total_aproximado(qs, chave):
+    """
+    Total de resultados sem pagar ``COUNT(*)`` a cada requisição:
+    no PostgreSQL, sem filtros, usa a estimativa do planner (reltuples);
+    nos demais casos faz o COUNT uma vez e guarda no cache por alguns minutos.
+    """
+    chave_cache = "livros:total:" + hashlib.md5(chave.encode()).hexdigest()
+    total = cache.get(chave_cache)
+    if total is not None:
+        return total
+
+    total = None
+    if connection.vendor == "postgresql" and not qs.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [qs.model._meta.db_table],
+            )
+            linha = cursor.fetchone()
+            if linha and linha[0] >= 0:
+                total = linha[0]
+    if total is None:
+        total = qs.count()
+
+    cache.set(chave_cache, total, TTL_TOTAL_APROXIMADO)
+    return total
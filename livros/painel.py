@@ -0,0 +1,87 @@
+"""
+Números do dashboard (homepage) guardados em cache.
+
+Os contadores são calculados uma vez com um único aggregate condicional e,
+a partir daí, ajustados incrementalmente (signals de CadastroLivroModel e
+operações em lote de empréstimo/devolução chamam ``ajustar``). Entre
+mudanças, a homepage não faz nenhuma consulta.
+
+Em produção com vários workers o cache precisa ser compartilhado
+(``REDIS_URL``, ver settings); com o LocMemCache cada processo tem a sua
+cópia e só enxerga os próprios ajustes, então tudo expira em
+``TTL_PAINEL`` segundos e é recalculado do banco.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import CadastroLivroModel
+
+PREFIXO = "livros:painel:"
+CHAVE_TOTAL = PREFIXO + "total"
+CHAVE_RECENTES = PREFIXO + "recentes"
+CHAVES_STATUS = {status: PREFIXO + status for status, _ in CadastroLivroModel.STATUS_CHOICES}
+QTD_RECENTES = 5
+TTL_PAINEL = 60  # segundos; limita a divergência entre processos sem cache compartilhado
+
+
+def recalcular():
+    """Reconciliação: recalcula os contadores do zero e regrava o cache."""
+    agregados = CadastroLivroModel.objects.aggregate(
+        total=Count("id"),
+        **{status: Count("id", filter=Q(status=status)) for status in CHAVES_STATUS},
+    )
+    valores = {CHAVE_TOTAL: agregados["total"]}
+    valores.update({chave: agregados[status] for status, chave in CHAVES_STATUS.items()})
+    cache.set_many(valores, timeout=TTL_PAINEL)
+    return valores
+
+
+def contadores():
+    chaves = [CHAVE_TOTAL, *CHAVES_STATUS.values()]
+    valores = cache.get_many(chaves)
+    if len(valores) < len(chaves):
+        valores = recalcular()
+    return {
+        "total": valores[CHAVE_TOTAL],
+        "disponiveis": valores[CHAVES_STATUS["disponivel"]],
+        "emprestados": valores[CHAVES_STATUS["emprestado"]],
+    }
+
+
+def ajustar(total=0, **por_status):
+    """
+    Soma deltas aos contadores, ex.: ``ajustar(disponivel=-3, emprestado=3)``.
+    Se algum contador não estiver no cache, descarta todos para que a
+    próxima leitura recalcule (nunca fica meio atualizado).
+    """
+    deltas = {CHAVE_TOTAL: total}
+    for status, delta in por_status.items():
+        if status in CHAVES_STATUS:
+            deltas[CHAVES_STATUS[status]] = deltas.get(CHAVES_STATUS[status], 0) + delta
+    try:
+        for chave, delta in deltas.items():
+            if delta:
+                cache.incr(chave, delta)
+    except ValueError:
+        invalidar()
+
+
+def invalidar():
+    cache.delete_many([CHAVE_TOTAL, CHAVE_RECENTES, *CHAVES_STATUS.values()])
+
+
+def consulta_recentes():
+    """Últimos cadastrados pela data de criação (índice livro_data_criacao_idx)."""
+    return CadastroLivroModel.objects.order_by("-data_criacao", "-id")[:QTD_RECENTES]
+
+
+def recentes():
+    livros = cache.get(CHAVE_RECENTES)
+    if livros is None:
+        livros = list(consulta_recentes())
+        cache.set(CHAVE_RECENTES, livros, timeout=TTL_PAINEL)
+    return livros
+
+
+def invalidar_recentes():
+    cache.delete(CHAVE_RECENTES)
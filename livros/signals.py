@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import autocompletar, busca, painel, trigramas
+from .models import CadastroLivroModel, Emprestimo, PerfilCirculacao
+
+
+# ----------------------------
+# Índice de busca do catálogo
+# ----------------------------
+@receiver(post_save, sender=CadastroLivroModel)
+def indexar_livro_salvo(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    busca.indexar_livro(instance)
+    if update_fields is None or {"nome", "autor"} & set(update_fields):
+        trigramas.indexar_livro(instance)
+
+
+@receiver(post_delete, sender=CadastroLivroModel)
+def desindexar_livro_removido(sender, instance, **kwargs):
+    busca.desindexar_livro(instance.pk)
+
+
+# ----------------------------
+# Contadores do dashboard
+# ----------------------------
+@receiver(post_init, sender=CadastroLivroModel)
+def guardar_status_original(sender, instance, **kwargs):
+    # status como está no banco, para saber de qual contador tirar no save/delete
+    # (via __dict__ para não disparar consulta quando o campo foi adiado com only())
+    instance._status_original = instance.__dict__.get("status") if instance.pk else None
+
+
+@receiver(post_save, sender=CadastroLivroModel)
+def ajustar_painel_livro_salvo(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    anterior = instance._status_original
+    atual = instance.status
+    instance._status_original = atual
+
+    if created:
+        deltas = {"total": 1, atual: 1}
+    elif anterior is None:
+        deltas = None  # status original desconhecido: recalcula na próxima leitura
+    elif anterior != atual:
+        deltas = {anterior: -1, atual: 1}
+    else:
+        deltas = {}
+
+    def aplicar():
+        if deltas is None:
+            painel.invalidar()
+        elif deltas:
+            painel.ajustar(**deltas)
+        painel.invalidar_recentes()
+
+    transaction.on_commit(aplicar)
+
+
+@receiver(post_delete, sender=CadastroLivroModel)
+def ajustar_painel_livro_removido(sender, instance, **kwargs):
+    status = instance._status_original
+
+    def aplicar():
+        if status:
+            painel.ajustar(total=-1, **{status: -1})
+        else:
+            painel.invalidar()
+        painel.invalidar_recentes()
+
+    transaction.on_commit(aplicar)
+
+
+# ----------------------------
+# Autocompletar (índice em memória)
+# ----------------------------
+@receiver(post_save, sender=CadastroLivroModel)
+def atualizar_autocompletar(sender, instance, raw=False, update_fields=None, **kwargs):
+    # mesmo sem índice neste processo: a versão avisa os outros workers
+    if raw:
+        return
+    if update_fields is not None and not {"nome", "autor"} & set(update_fields):
+        return
+    livro_id, nome, autor = instance.pk, instance.nome, instance.autor
+    transaction.on_commit(lambda: autocompletar.livro_alterado(livro_id, nome, autor))
+
+
+@receiver(post_delete, sender=CadastroLivroModel)
+def remover_do_autocompletar(sender, instance, **kwargs):
+    livro_id = instance.pk
+    transaction.on_commit(lambda: autocompletar.livro_removido(livro_id))
+
+
+# ----------------------------
+# Perfil de circulação (multas em aberto / empréstimos ativos por usuário)
+# ----------------------------
+@receiver(post_init, sender=Emprestimo)
+def guardar_situacao_original(sender, instance, **kwargs):
+    instance._circulacao_original = instance._situacao_circulacao() if instance.pk else None
+
+
+@receiver(post_save, sender=Emprestimo)
+def atualizar_perfil_emprestimo_salvo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    antes = (instance.usuario_id, False, 0) if created else instance._circulacao_original
+    depois = instance._situacao_circulacao()
+    instance._circulacao_original = depois
+    if antes == depois:
+        return
+    deltas = PerfilCirculacao.deltas_entre([(antes, depois)])
+    PerfilCirculacao.aplicar_deltas(deltas or {instance.usuario_id: None})
+
+
+@receiver(post_delete, sender=Emprestimo)
+def atualizar_perfil_emprestimo_removido(sender, instance, **kwargs):
+    antes = instance._circulacao_original
+    if antes is None:
+        PerfilCirculacao.aplicar_deltas({instance.usuario_id: None})
+    else:
+        PerfilCirculacao.aplicar_deltas(PerfilCirculacao.deltas_entre([(antes, (antes[0], False, 0))]))
@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from livros.models import CadastroLivroModel, Emprestimo, PerfilCirculacao
+
+
+class AcumularMultasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leitor = get_user_model().objects.create_user(username="leitor", password="123")
+
+    def setUp(self):
+        hoje = self.hoje = date.today()
+
+        def emprestar(nome, prevista, devolucao=None, **kwargs):
+            return Emprestimo.objects.create(
+                livro=CadastroLivroModel.objects.create(nome=nome, autor="Autor"), usuario=self.leitor,
+                data_saida=hoje - timedelta(days=30), data_prevista_devolucao=prevista,
+                data_devolucao=devolucao, **kwargs,
+            )
+
+        self.atrasado = emprestar("atrasado", hoje - timedelta(days=5))
+        self.no_prazo = emprestar("no_prazo", hoje + timedelta(days=2))
+        self.devolvido_atrasado = emprestar("devolvido_atrasado", hoje - timedelta(days=10), hoje - timedelta(days=4))
+        self.devolvido_no_prazo = emprestar("devolvido_no_prazo", hoje - timedelta(days=1), hoje - timedelta(days=2))
+        self.quitado = emprestar(
+            "quitado", hoje - timedelta(days=20), hoje - timedelta(days=10), multa_valor=Decimal("3.00"), multa_paga=True,
+        )
+
+    def _multas(self):
+        return {
+            e.livro.nome: (e.multa_valor, e.multa_paga)
+            for e in Emprestimo.objects.select_related("livro")
+        }
+
+    def test_mesma_regra_de_calcular_multa(self):
+        atualizados = Emprestimo.objects.acumular_multas()
+
+        self.assertEqual(atualizados, 2)
+        self.assertEqual(self._multas(), {
+            "atrasado": (Decimal("10.00"), False),
+            "no_prazo": (Decimal("0.00"), True),
+            "devolvido_atrasado": (Decimal("12.00"), False),
+            "devolvido_no_prazo": (Decimal("0.00"), True),
+            "quitado": (Decimal("3.00"), True),
+        })
+        for emp in Emprestimo.objects.exclude(pk=self.quitado.pk):
+            with self.subTest(emp.pk):
+                esperado = emp.multa_valor
+                emp.calcular_multa()
+                self.assertEqual(Decimal(emp.multa_valor), esperado)
+
+    def test_parametros_e_idempotencia(self):
+        Emprestimo.objects.acumular_multas(valor_por_dia=1.5, carencia=2)
+        self.assertEqual(self._multas()["atrasado"], (Decimal("4.50"), False))
+        self.assertEqual(self._multas()["devolvido_atrasado"], (Decimal("6.00"), False))
+
+        antes = self._multas()
+        self.assertEqual(Emprestimo.objects.acumular_multas(valor_por_dia=1.5, carencia=2), 0)
+        self.assertEqual(self._multas(), antes)
+
+        # carência maior zera multas que não estão mais devidas
+        Emprestimo.objects.acumular_multas(valor_por_dia=1.5, carencia=10)
+        self.assertEqual(self._multas()["atrasado"], (Decimal("0.00"), True))
+
+    def test_perfil_atualizado(self):
+        Emprestimo.objects.acumular_multas()
+        perfil = PerfilCirculacao.objects.get(pk=self.leitor.pk)
+        self.assertEqual((perfil.multas_pendentes, perfil.multa_aberta_total), (2, Decimal("22.00")))
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command("acumular_multas", "--lote", "2", stdout=saida)
+        self.assertIn("2 empréstimo(s) com multa atualizada", saida.getvalue())
+
+        saida = StringIO()
+        call_command("acumular_multas", stdout=saida)
+        self.assertIn("0 empréstimo(s)", saida.getvalue())
+
+    def test_quitar_antes_de_devolver_cobra_so_a_diferenca(self):
+        outro = get_user_model().objects.create_user(username="outro", password="123")
+        emp = Emprestimo.objects.create(
+            livro=CadastroLivroModel.objects.create(nome="parcial", autor="Autor", status="emprestado"),
+            usuario=outro, data_saida=self.hoje - timedelta(days=10),
+            data_prevista_devolucao=self.hoje - timedelta(days=2),
+        )
+        Emprestimo.objects.acumular_multas(hoje=self.hoje)
+        emp.refresh_from_db()
+        self.assertEqual((emp.multa_valor, emp.multa_paga), (Decimal("4.00"), False))
+        emp.quitar_multa()
+
+        # ainda com o livro: os dias seguintes continuam somando
+        Emprestimo.objects.acumular_multas(hoje=self.hoje + timedelta(days=1))
+        emp.refresh_from_db()
+        self.assertEqual((emp.multa_valor, emp.multa_quitada, emp.multa_paga), (Decimal("6.00"), Decimal("4.00"), False))
+
+        # como na view: o empréstimo é carregado de novo na devolução
+        emp = Emprestimo.objects.get(pk=emp.pk)
+        emp.registrar_devolucao(self.hoje + timedelta(days=3))
+
+        emp.refresh_from_db()
+        self.assertEqual((emp.multa_valor, emp.multa_quitada, emp.multa_paga), (Decimal("10.00"), Decimal("4.00"), False))
+        self.assertEqual(emp.multa_em_aberto, Decimal("6.00"))
+        self.assertEqual(PerfilCirculacao.objects.get(pk=outro.pk).multa_aberta_total, Decimal("6.00"))
+        PerfilCirculacao.recalcular([outro.pk])
+        self.assertEqual(PerfilCirculacao.objects.get(pk=outro.pk).multa_aberta_total, Decimal("6.00"))
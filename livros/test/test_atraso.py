@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Emprestimo
+from livros.views import _obter_dados_circulacao
+
+
+class AtrasoNoBancoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="admin", password="123", is_staff=True, is_superuser=True)
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        hoje = date.today()
+        cls.hoje = hoje
+        casos = {
+            "atrasado": (hoje - timedelta(days=5), None),
+            "no_prazo": (hoje + timedelta(days=3), None),
+            "vence_hoje": (hoje, None),
+            "devolvido_atrasado": (hoje - timedelta(days=10), hoje - timedelta(days=4)),
+            "devolvido_antes": (hoje - timedelta(days=1), hoje - timedelta(days=3)),
+        }
+        cls.emprestimos = {}
+        for nome, (prevista, devolucao) in casos.items():
+            livro = CadastroLivroModel.objects.create(nome=nome, autor="Autor")
+            cls.emprestimos[nome] = Emprestimo.objects.create(
+                livro=livro, usuario=cls.leitor, data_saida=hoje - timedelta(days=20),
+                data_prevista_devolucao=prevista, data_devolucao=devolucao,
+            )
+
+    def test_anotacao_igual_a_property(self):
+        anotados = {e.livro.nome: e for e in Emprestimo.objects.com_atraso().select_related("livro")}
+        esperado = {"atrasado": 5, "no_prazo": 0, "vence_hoje": 0, "devolvido_atrasado": 6, "devolvido_antes": 0}
+        for nome, dias in esperado.items():
+            with self.subTest(nome):
+                self.assertEqual(anotados[nome].atraso_db, dias)
+                self.assertEqual(anotados[nome].dias_atraso, dias)
+                self.assertEqual(anotados[nome].em_atraso, dias > 0)
+                self.assertEqual(Emprestimo.objects.get(pk=anotados[nome].pk).dias_atraso, dias)
+
+    def test_filtra_e_ordena_no_banco(self):
+        qs = Emprestimo.objects.com_atraso().filter(em_atraso=True).order_by("-atraso_db")
+        self.assertEqual([e.livro.nome for e in qs.select_related("livro")], ["devolvido_atrasado", "atrasado"])
+        self.assertEqual(list(Emprestimo.objects.atrasados()), [self.emprestimos["atrasado"]])
+
+    def test_property_prefere_a_anotacao(self):
+        emp = Emprestimo.objects.com_atraso(self.hoje + timedelta(days=3)).get(pk=self.emprestimos["atrasado"].pk)
+        self.assertEqual(emp.dias_atraso, 8)
+
+    def test_anotacao_descartada_quando_as_datas_mudam(self):
+        emp = Emprestimo.objects.com_atraso().get(pk=self.emprestimos["atrasado"].pk)
+        emp.data_devolucao = emp.data_prevista_devolucao
+        self.assertEqual(emp.dias_atraso, 0)
+
+    def test_lista_sem_calculo_por_linha(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("livros:emprestimos_list"))
+        self.assertContains(resp, "5 dias")
+        self.assertContains(resp, "6 dias")
+
+    def test_relatorio_conta_atrasos_no_banco(self):
+        # empréstimos, devoluções+atrasos, reservas e top livros: sem iterar linhas
+        with self.assertNumQueries(4):
+            dados = _obter_dados_circulacao(self.hoje - timedelta(days=30), self.hoje)
+        self.assertEqual((dados["qtd_devolucoes"], dados["qtd_atrasos"]), (2, 1))
+
+    def test_admin_ordena_por_atraso(self):
+        self.client.force_login(self.staff)
+        url = reverse("admin:livros_emprestimo_changelist")
+        resp = self.client.get(url, {"o": "-7"})
+        self.assertEqual(resp.status_code, 200)
+        nomes = [e.livro.nome for e in resp.context["cl"].result_list]
+        self.assertEqual(nomes[:2], ["devolvido_atrasado", "atrasado"])
+        resp = self.client.get(url, {"em_atraso": "1"})
+        self.assertEqual(resp.context["cl"].result_count, 2)
@@ -0,0 +1,135 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from livros import autocompletar
+from livros.autocompletar import IndicePrefixos
+from livros.models import CadastroLivroModel
+
+
+class IndicePrefixosTest(SimpleTestCase):
+    """Estrutura do índice, sem banco."""
+
+    def setUp(self):
+        self.indice = IndicePrefixos()
+        self.indice.construir([
+            (1, "Dom Casmurro", "Machado de Assis"),
+            (2, "Memórias Póstumas de Brás Cubas", "Machado de Assis"),
+            (3, "Macunaíma", "Mário de Andrade"),
+        ])
+
+    def test_prefixo_sem_acento_e_caixa(self):
+        textos = [s["texto"] for s in self.indice.buscar("MA")]
+        self.assertEqual(textos, ["Machado de Assis", "Macunaíma", "Mário de Andrade"])
+        self.assertEqual(self.indice.buscar("memorias")[0]["texto"], "Memórias Póstumas de Brás Cubas")
+
+    def test_autor_repetido_aparece_uma_vez(self):
+        self.assertEqual(len(self.indice.buscar("machado")), 1)
+        self.indice.remover(1)
+        self.assertEqual(len(self.indice.buscar("machado")), 1)
+        self.indice.remover(2)
+        self.assertEqual(self.indice.buscar("machado"), [])
+
+    def test_atualizacao_incremental(self):
+        self.indice.atualizar(1, "Quincas Borba", "Machado de Assis")
+        self.assertEqual(self.indice.buscar("dom"), [])
+        self.assertEqual(self.indice.buscar("quin")[0], {"texto": "Quincas Borba", "tipo": "titulo"})
+
+    def test_limite(self):
+        self.assertEqual(len(self.indice.buscar("m", limite=2)), 2)
+
+    def test_busca_durante_atualizacoes(self):
+        parar = threading.Event()
+
+        def escrever():
+            # entradas antes de "machado" entram e saem, deslocando a lista
+            while not parar.is_set():
+                for i in range(50):
+                    self.indice.atualizar(100 + i, f"Ma{i:02d}", "Autor")
+                for i in range(50):
+                    self.indice.remover(100 + i)
+
+        escritor = threading.Thread(target=escrever)
+        escritor.start()
+        try:
+            for _ in range(2000):
+                textos = [s["texto"] for s in self.indice.buscar("mac", limite=5)]
+                self.assertEqual(textos, ["Machado de Assis", "Macunaíma"])
+        finally:
+            parar.set()
+            escritor.join()
+
+
+class AutocompletarViewTest(TestCase):
+
+    def setUp(self):
+        autocompletar.descartar()
+        self.livro = CadastroLivroModel.objects.create(nome="São Bernardo", autor="Graciliano Ramos")
+
+    def tearDown(self):
+        autocompletar.descartar()
+
+    def _sugestoes(self, q, **params):
+        response = self.client.get(reverse("livros:autocompletar"), {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [s["texto"] for s in response.json()["sugestoes"]]
+
+    def test_indice_construido_na_primeira_consulta(self):
+        self.assertFalse(autocompletar.indice_construido())
+        self.assertEqual(self._sugestoes("sao b"), ["São Bernardo"])
+        self.assertTrue(autocompletar.indice_construido())
+        with self.assertNumQueries(0):
+            self._sugestoes("grac")
+
+    def test_signals_mantem_indice(self):
+        self._sugestoes("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            CadastroLivroModel.objects.create(nome="Vidas Secas", autor="Graciliano Ramos")
+        self.assertEqual(self._sugestoes("vidas"), ["Vidas Secas"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.livro.nome = "Angústia"
+            self.livro.save()
+        self.assertEqual(self._sugestoes("sao"), [])
+        self.assertEqual(self._sugestoes("angu"), ["Angústia"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.livro.delete()
+        self.assertEqual(self._sugestoes("angu"), [])
+
+    def test_escrita_local_nao_reconstroi(self):
+        self._sugestoes("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            CadastroLivroModel.objects.create(nome="Vidas Secas", autor="Graciliano Ramos")
+        with self.assertNumQueries(0):
+            self.assertEqual(self._sugestoes("vidas"), ["Vidas Secas"])
+
+    def test_versao_avancada_por_outro_processo_reconstroi(self):
+        self._sugestoes("x")
+        # outro worker renomeou o livro e avançou a versão no cache compartilhado
+        CadastroLivroModel.objects.filter(pk=self.livro.pk).update(nome="Angústia")
+        cache.set(autocompletar.CHAVE_VERSAO, cache.get(autocompletar.CHAVE_VERSAO, 0) + 1, None)
+
+        self.assertEqual(self._sugestoes("angu"), ["Angústia"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self._sugestoes("sao"), [])
+
+    def test_cache_por_processo_confere_o_banco_periodicamente(self):
+        self._sugestoes("x")
+        # cadastro em outro worker, sem cache compartilhado: a versão daqui não muda
+        CadastroLivroModel.objects.bulk_create([CadastroLivroModel(nome="Vidas Secas", autor="Graciliano Ramos")])
+        self.assertEqual(self._sugestoes("vidas"), [])
+
+        depois = time.monotonic() + autocompletar.INTERVALO_VERIFICACAO + 1
+        with mock.patch("time.monotonic", return_value=depois):
+            self.assertEqual(self._sugestoes("vidas"), ["Vidas Secas"])
+
+    def test_limite_maximo(self):
+        for i in range(30):
+            CadastroLivroModel.objects.create(nome=f"Livro {i:02d}", autor="Autor")
+        self.assertEqual(len(self._sugestoes("livro", limite=500)), autocompletar.LIMITE_MAXIMO)
+        self.assertEqual(len(self._sugestoes("livro", limite="abc")), autocompletar.LIMITE_PADRAO)
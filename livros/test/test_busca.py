@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from livros import busca
+from livros.models import CadastroLivroModel
+
+
+class BuscaCatalogoTest(TestCase):
+    """Busca do catálogo via índice textual (FTS5 no SQLite)."""
+
+    def setUp(self):
+        self.dom = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis", isbn="9788535910663")
+        self.memorias = CadastroLivroModel.objects.create(nome="Memórias Póstumas", autor="Machado de Assis")
+        self.machado = CadastroLivroModel.objects.create(nome="Machado Machado", autor="Fulano")
+        self.orwell = CadastroLivroModel.objects.create(nome="1984", autor="George Orwell")
+
+    def _nomes(self, **params):
+        response = self.client.get(reverse("livros:catalogo"), params)
+        return [l.nome for l in response.context["livros"]]
+
+    def test_busca_por_prefixo(self):
+        self.assertEqual(self._nomes(q="casm"), ["Dom Casmurro"])
+
+    def test_busca_por_autor_e_isbn(self):
+        self.assertEqual(self._nomes(q="orw"), ["1984"])
+        self.assertEqual(self._nomes(q="9788535910663"), ["Dom Casmurro"])
+
+    def test_busca_ignora_acentos(self):
+        self.assertEqual(self._nomes(q="memorias postumas"), ["Memórias Póstumas"])
+
+    def test_ordenacao_por_relevancia(self):
+        nomes = self._nomes(q="machado")
+        self.assertEqual(nomes[0], "Machado Machado")
+        self.assertCountEqual(nomes, ["Machado Machado", "Dom Casmurro", "Memórias Póstumas"])
+
+    def test_indice_acompanha_edicao_e_remocao(self):
+        self.orwell.nome = "A Revolução dos Bichos"
+        self.orwell.save()
+        self.assertEqual(self._nomes(q="revolucao"), ["A Revolução dos Bichos"])
+        self.assertEqual(self._nomes(q="1984"), [])
+
+        self.orwell.delete()
+        self.assertEqual(self._nomes(q="orwell"), [])
+
+    def test_match_uma_vez_por_consulta(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("índice manual só existe no SQLite")
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self._nomes(q="machado")[0], "Machado Machado")
+
+        com_busca = [c["sql"] for c in consultas if busca.TABELA_FTS in c["sql"]]
+        self.assertTrue(com_busca)
+        for sql in com_busca:
+            self.assertEqual(sql.count("MATCH"), 1, sql)
+
+    def test_operadores_fts_sao_tratados_como_texto(self):
+        self.assertEqual(self._nomes(q='dom" OR NEAR(*'), [])
+
+    def test_comando_reindexar_busca(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("índice manual só existe no SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {busca.TABELA_FTS}")
+        self.assertEqual(self._nomes(q="casmurro"), [])
+
+        call_command("reindexar_busca", stdout=StringIO())
+        self.assertEqual(self._nomes(q="casmurro"), ["Dom Casmurro"])
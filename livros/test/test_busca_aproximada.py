@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from livros import trigramas
+from livros.models import CadastroLivroModel, TrigramaLivro
+
+
+class TrigramasTest(SimpleTestCase):
+
+    def test_trigramas_no_estilo_pg_trgm(self):
+        self.assertEqual(trigramas.trigramas("Gato"), {"  g", " ga", "gat", "ato", "to "})
+        self.assertEqual(trigramas.trigramas("GATO"), trigramas.trigramas("gáto"))
+
+    def test_similaridade(self):
+        a = trigramas.trigramas("machado de assis")
+        self.assertEqual(trigramas.similaridade(a, a), 1.0)
+        self.assertGreater(trigramas.similaridade(a, trigramas.trigramas("machado de asis")), 0.6)
+        self.assertEqual(trigramas.similaridade(a, set()), 0.0)
+
+
+class BuscaAproximadaTest(TestCase):
+
+    def setUp(self):
+        trigramas._frequencias.clear()
+        self.dom = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis")
+        self.grande = CadastroLivroModel.objects.create(nome="Grande Sertão: Veredas", autor="Guimarães Rosa")
+        self.hora = CadastroLivroModel.objects.create(nome="A Hora da Estrela", autor="Clarice Lispector")
+
+    def _nomes(self, q, **params):
+        response = self.client.get(reverse("livros:catalogo"), {"q": q, "modo": "aproximado", **params})
+        return [l.nome for l in response.context["livros"]]
+
+    def test_tolera_erro_de_digitacao(self):
+        self.assertEqual(self._nomes("Machado de Asis"), ["Dom Casmurro"])
+        self.assertEqual(self._nomes("grande certao"), ["Grande Sertão: Veredas"])
+        self.assertEqual(self._nomes("clarisse lispetor"), ["A Hora da Estrela"])
+
+    def test_busca_exata_nao_acha_com_erro(self):
+        response = self.client.get(reverse("livros:catalogo"), {"q": "Machado de Asis"})
+        self.assertEqual(list(response.context["livros"]), [])
+
+    def test_sem_parecidos(self):
+        self.assertEqual(self._nomes("xyzwq"), [])
+
+    def test_ordenado_por_similaridade(self):
+        CadastroLivroModel.objects.create(nome="Dom Quixote", autor="Cervantes")
+        nomes = self._nomes("dom casmuro")
+        self.assertEqual(nomes[0], "Dom Casmurro")
+
+    def test_respeita_filtro_de_disponiveis(self):
+        self.dom.status = "emprestado"
+        self.dom.save()
+        self.assertEqual(self._nomes("Machado de Asis", apenas_disponiveis="on"), [])
+
+    def test_indice_mantido_nas_escritas(self):
+        self.assertTrue(TrigramaLivro.objects.filter(livro=self.dom, trigrama="mur").exists())
+
+        self.dom.nome = "Quincas Borba"
+        self.dom.save()
+        self.assertFalse(TrigramaLivro.objects.filter(livro=self.dom, trigrama="mur").exists())
+        self.assertEqual(self._nomes("quincas borb"), ["Quincas Borba"])
+
+        # mudança só de status não reescreve os trigramas
+        with self.assertNumQueries(3):  # update + índice FTS (delete/insert)
+            self.dom.status = "emprestado"
+            self.dom.save(update_fields=["status"])
+
+        self.dom.delete()
+        self.assertFalse(TrigramaLivro.objects.filter(livro_id=self.dom.pk).exists())
+
+    def test_custo_de_consultas_constante(self):
+        for i in range(50):
+            CadastroLivroModel.objects.create(nome=f"Machado {i}", autor="Machado de Assis")
+        with self.assertNumQueries(3):  # frequências + candidatos agrupados + cálculo do score
+            trigramas.candidatos("machado de asis")
+        with self.assertNumQueries(2):  # frequências já guardadas
+            trigramas.candidatos("machado de asis")
+
+    def test_listas_longas_ficam_fora_da_contagem(self):
+        esperado = trigramas.candidatos("Machado de Asis")
+
+        # toda lista passa do limite: só a metade mais rara é lida
+        with mock.patch.object(trigramas, "LIMITE_LISTA", 0):
+            self.assertEqual(trigramas.candidatos("Machado de Asis"), esperado)
+        self.assertEqual(list(esperado), [self.dom.pk])
+
+    def test_filtro_de_tamanho(self):
+        longo = CadastroLivroModel.objects.create(
+            nome="Memórias póstumas de Brás Cubas, romance de Machado",
+            autor="Joaquim Maria Machado de Assis e colaboradores",
+        )
+        tamanho = TrigramaLivro.objects.filter(livro=longo).values_list("tamanho", flat=True).distinct()
+        self.assertEqual(list(tamanho), [len(trigramas.trigramas(longo.autor))])
+
+        # "machado" tem 8 trigramas: campos com mais de 8 / 0.3 não entram na contagem
+        self.assertEqual(list(trigramas.candidatos("machado")), [self.dom.pk])
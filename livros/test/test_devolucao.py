@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+
+from livros import painel
+from livros.models import CadastroLivroModel, Emprestimo, PerfilCirculacao, Reserva
+
+# SAVEPOINT + RELEASE do atomic dentro do TestCase
+TRANSACAO = 2
+# UPDATE empréstimo, UPDATE perfil, INSERT aviso de multa, UPDATE livro,
+# SELECT reservas vencidas, SELECT primeira da fila
+ORCAMENTO_DEVOLUCAO = 6
+# UPDATE da reserva promovida + INSERT do aviso
+ORCAMENTO_PROMOCAO = 2
+
+
+class DevolucaoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        cls.outro = User.objects.create_user(username="outro", password="123")
+
+    def setUp(self):
+        cache.clear()
+        self.hoje = date.today()
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado", status="emprestado")
+        self.emp = Emprestimo.objects.create(
+            livro=self.livro, usuario=self.leitor,
+            data_saida=self.hoje - timedelta(days=10), data_prevista_devolucao=self.hoje - timedelta(days=2),
+        )
+        self.emp = Emprestimo.objects.get(pk=self.emp.pk)
+
+    def test_orcamento_de_consultas(self):
+        with self.assertNumQueries(TRANSACAO + ORCAMENTO_DEVOLUCAO):
+            atraso = self.emp.registrar_devolucao(self.hoje)
+
+        self.assertEqual(atraso, 2)
+        self.emp.refresh_from_db()
+        self.assertEqual((self.emp.data_devolucao, self.emp.multa_valor, self.emp.multa_paga),
+                         (self.hoje, Decimal("4.00"), False))
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.status, "disponivel")
+        perfil = PerfilCirculacao.objects.get(pk=self.leitor.pk)
+        self.assertEqual((perfil.emprestimos_ativos, perfil.multas_pendentes), (0, 1))
+
+    def test_orcamento_com_fila_de_reserva(self):
+        primeira = Reserva.objects.create(livro=self.livro, usuario=self.outro)
+
+        with self.assertNumQueries(TRANSACAO + ORCAMENTO_DEVOLUCAO + ORCAMENTO_PROMOCAO):
+            self.emp.registrar_devolucao(self.hoje)
+
+        primeira.refresh_from_db()
+        self.assertEqual(primeira.status, "pronta")
+
+    def test_painel_ajustado_apos_commit(self):
+        painel.recalcular()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.emp.registrar_devolucao(self.hoje)
+        self.assertEqual(painel.contadores()["disponiveis"], 1)
+        self.assertEqual(painel.contadores()["emprestados"], 0)
+
+    def test_falha_no_meio_desfaz_tudo(self):
+        with mock.patch.object(Reserva, "promover_primeiras", side_effect=DatabaseError("queda")):
+            with self.assertRaises(DatabaseError):
+                self.emp.registrar_devolucao(self.hoje)
+
+        emp = Emprestimo.objects.get(pk=self.emp.pk)
+        self.assertIsNone(emp.data_devolucao)
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.status, "emprestado")
+        self.assertEqual(PerfilCirculacao.objects.get(pk=self.leitor.pk).emprestimos_ativos, 1)
+
+    def test_devolver_duas_vezes(self):
+        self.emp.registrar_devolucao(self.hoje)
+        copia = Emprestimo.objects.get(pk=self.emp.pk)
+        copia.data_devolucao = None  # cópia desatualizada em outro balcão
+        with self.assertRaises(ValueError):
+            copia.registrar_devolucao(self.hoje)
+
+        self.client.force_login(self.staff)
+        resp = self.client.post(
+            reverse("livros:registrar_devolucao", args=[self.emp.pk]), {"data_devolucao": self.hoje.isoformat()},
+            follow=True,
+        )
+        self.assertContains(resp, "O empréstimo já foi devolvido.")
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from livros import painel
+from livros.models import CadastroLivroModel, Emprestimo, Reserva
+
+
+class DevolucaoEmLoteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        cls.leitores = [User.objects.create_user(username=f"leitor{i}", password="123") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.hoje = date.today()
+
+    def _emprestar(self, n, prevista=None):
+        emprestimos = []
+        for i in range(n):
+            livro = CadastroLivroModel.objects.create(nome=f"Livro {i}", autor="Autor", status="emprestado")
+            emprestimos.append(Emprestimo.objects.create(
+                livro=livro, usuario=self.leitores[0],
+                data_saida=self.hoje - timedelta(days=10),
+                data_prevista_devolucao=prevista or self.hoje + timedelta(days=1),
+            ))
+        return emprestimos
+
+    def test_devolve_calcula_multas_e_libera_livros(self):
+        no_prazo, atrasado = self._emprestar(2)
+        atrasado.data_prevista_devolucao = self.hoje - timedelta(days=3)
+        atrasado.save(update_fields=["data_prevista_devolucao"])
+        painel.recalcular()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            devolvidos, falhas = Emprestimo.registrar_devolucoes_em_lote(
+                [no_prazo.pk, atrasado.pk, 999999], self.hoje
+            )
+
+        self.assertEqual(len(devolvidos), 2)
+        self.assertEqual(falhas, [{"emprestimo_id": 999999, "motivo": "Empréstimo inexistente ou já devolvido"}])
+        no_prazo.refresh_from_db()
+        atrasado.refresh_from_db()
+        self.assertEqual((no_prazo.data_devolucao, no_prazo.multa_valor, no_prazo.multa_paga), (self.hoje, 0, True))
+        self.assertEqual((atrasado.multa_valor, atrasado.multa_paga), (Decimal("6.00"), False))
+        self.assertEqual(
+            set(CadastroLivroModel.objects.values_list("status", flat=True)), {"disponivel"}
+        )
+        self.assertEqual(painel.contadores()["disponiveis"], 2)
+
+        # devolver de novo é recusado
+        devolvidos, falhas = Emprestimo.registrar_devolucoes_em_lote([no_prazo.pk], self.hoje)
+        self.assertEqual((devolvidos, len(falhas)), ([], 1))
+
+    def test_promove_primeira_da_fila_de_cada_livro(self):
+        com_fila, sem_fila, ja_pronta = self._emprestar(3)
+        primeira = Reserva.objects.create(livro=com_fila.livro, usuario=self.leitores[1])
+        segunda = Reserva.objects.create(livro=com_fila.livro, usuario=self.leitores[2])
+        pronta = Reserva.objects.create(livro=ja_pronta.livro, usuario=self.leitores[1], status="pronta")
+        espera = Reserva.objects.create(livro=ja_pronta.livro, usuario=self.leitores[2])
+        vencida = Reserva.objects.create(
+            livro=CadastroLivroModel.objects.create(nome="Outro", autor="Autor"),
+            usuario=self.leitores[1], status="pronta", expira_em=timezone.now() - timedelta(hours=1),
+        )
+
+        Emprestimo.registrar_devolucoes_em_lote([com_fila.pk, sem_fila.pk, ja_pronta.pk], self.hoje)
+
+        status = dict(Reserva.objects.values_list("pk", "status"))
+        self.assertEqual(status[primeira.pk], "pronta")
+        self.assertEqual(status[segunda.pk], "ativa")
+        self.assertEqual(status[pronta.pk], "pronta")
+        self.assertEqual(status[espera.pk], "ativa")
+        # livro fora do lote: fica para o processar_reservas
+        self.assertEqual(status[vencida.pk], "pronta")
+        vencida.refresh_from_db()
+        self.assertEqual(vencida.status_efetivo, "expirada")
+        primeira.refresh_from_db()
+        self.assertIsNotNone(primeira.expira_em)
+
+    def test_numero_de_consultas_nao_depende_do_lote(self):
+        def consultas(emprestimos):
+            for emp in emprestimos:
+                Reserva.objects.create(livro=emp.livro, usuario=self.leitores[1])
+            with CaptureQueriesContext(connection) as ctx:
+                devolvidos, _ = Emprestimo.registrar_devolucoes_em_lote([e.pk for e in emprestimos], self.hoje)
+            self.assertEqual(len(devolvidos), len(emprestimos))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(self._emprestar(2)), consultas(self._emprestar(30)))
+
+    def test_view(self):
+        emprestimos = self._emprestar(2)
+        self.client.force_login(self.staff)
+        url = reverse("livros:registrar_devolucoes_em_lote")
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'name="emprestimo_ids"', count=2)
+
+        resp = self.client.post(url, {
+            "emprestimo_ids": [e.pk for e in emprestimos],
+            "data_devolucao": self.hoje.isoformat(),
+        })
+        self.assertRedirects(resp, reverse("livros:emprestimos_list"))
+        self.assertFalse(Emprestimo.objects.filter(data_devolucao__isnull=True).exists())
+
+        resp = self.client.post(url, {"emprestimo_ids": [emprestimos[0].pk], "data_devolucao": "x"})
+        self.assertRedirects(resp, url)
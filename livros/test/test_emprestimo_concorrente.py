@@ -0,0 +1,89 @@
+import threading
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Emprestimo, EmprestimoRecusado, Reserva
+
+N_BALCOES = 8
+
+
+class EmprestimoConcorrenteTest(TransactionTestCase):
+    """Vários balcões tentando emprestar o mesmo livro ao mesmo tempo."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.usuarios = [User.objects.create(username=f"leitor{i}") for i in range(N_BALCOES)]
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis")
+        self.hoje = date.today()
+
+    def _disparar(self, alvo):
+        barreira = threading.Barrier(N_BALCOES)
+        resultados = [None] * N_BALCOES
+
+        def balcao(i):
+            try:
+                barreira.wait()
+                resultados[i] = alvo(i)
+            except Exception as exc:  # noqa: BLE001 - o teste classifica o resultado
+                resultados[i] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=balcao, args=(i,)) for i in range(N_BALCOES)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return resultados
+
+    def test_apenas_um_emprestimo_e_registrado(self):
+        resultados = self._disparar(lambda i: Emprestimo.registrar(
+            self.usuarios[i], self.livro.pk, self.hoje, self.hoje + timedelta(days=7)
+        ))
+
+        sucessos = [r for r in resultados if isinstance(r, Emprestimo)]
+        self.assertEqual(len(sucessos), 1, resultados)
+        self.assertTrue(all(isinstance(r, (Emprestimo, EmprestimoRecusado)) for r in resultados), resultados)
+        self.assertEqual(Emprestimo.objects.filter(livro=self.livro).count(), 1)
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.status, "emprestado")
+
+    def test_reserva_pronta_concluida_uma_vez(self):
+        reserva = Reserva.objects.create(livro=self.livro, usuario=self.usuarios[0], status="pronta")
+
+        resultados = self._disparar(lambda i: Emprestimo.registrar(
+            self.usuarios[0], self.livro.pk, self.hoje, self.hoje + timedelta(days=7)
+        ))
+
+        self.assertEqual(sum(isinstance(r, Emprestimo) for r in resultados), 1, resultados)
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.status, "concluida")
+
+
+class RegistrarEmprestimoViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create(username="balcao", is_staff=True)
+        cls.leitor = User.objects.create(username="leitor")
+
+    def setUp(self):
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis")
+        self.client.force_login(self.staff)
+
+    def _post(self, livro_id):
+        return self.client.post(reverse("livros:registrar_emprestimo"), {
+            "livro_id": livro_id, "usuario_id": self.leitor.pk,
+            "data_saida": "2025-01-10", "data_prevista_devolucao": "2025-01-17",
+        }, follow=True)
+
+    def test_segundo_emprestimo_do_mesmo_livro_e_recusado(self):
+        self.assertContains(self._post(self.livro.pk), "Empréstimo registrado com sucesso")
+        self.assertContains(self._post(self.livro.pk), "Livro indisponível para empréstimo")
+        self.assertContains(self._post("abc"), "Livro inválido")
+        self.assertEqual(Emprestimo.objects.count(), 1)
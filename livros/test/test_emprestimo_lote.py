@@ -0,0 +1,129 @@
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from livros import painel
+from livros.models import CadastroLivroModel, Emprestimo, PerfilCirculacao, Reserva
+
+
+class EmprestimoEmLoteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        cls.outro = User.objects.create_user(username="outro", password="123")
+
+    def setUp(self):
+        cache.clear()
+        self.saida = date.today()
+        self.prevista = self.saida + timedelta(days=7)
+
+    def _livros(self, n, **kwargs):
+        return [CadastroLivroModel.objects.create(nome=f"Livro {i}", autor="Autor", **kwargs) for i in range(n)]
+
+    def test_empresta_todos_e_conclui_reserva_do_usuario(self):
+        livros = self._livros(3)
+        reserva = Reserva.objects.create(livro=livros[1], usuario=self.leitor, status="pronta")
+        painel.recalcular()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            emprestimos, falhas = Emprestimo.registrar_em_lote(
+                self.leitor, [l.pk for l in livros], self.saida, self.prevista
+            )
+
+        self.assertEqual(falhas, [])
+        self.assertEqual(sorted(e.livro_id for e in emprestimos), sorted(l.pk for l in livros))
+        self.assertTrue(all(e.pk for e in emprestimos))
+        self.assertEqual(
+            set(CadastroLivroModel.objects.values_list("status", flat=True)), {"emprestado"}
+        )
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.status, "concluida")
+        self.assertIsNotNone(reserva.concluida_em)
+        self.assertEqual(painel.contadores()["emprestados"], 3)
+        self.assertEqual(painel.contadores()["disponiveis"], 0)
+
+    def test_falhas_por_item(self):
+        ok, emprestado, reservado = self._livros(3)
+        emprestado.status = "emprestado"
+        emprestado.save(update_fields=["status"])
+        Reserva.objects.create(livro=reservado, usuario=self.outro, status="pronta")
+
+        emprestimos, falhas = Emprestimo.registrar_em_lote(
+            self.leitor, [ok.pk, emprestado.pk, reservado.pk, 999999, "abc", ok.pk],
+            self.saida, self.prevista,
+        )
+
+        self.assertEqual([e.livro_id for e in emprestimos], [ok.pk])
+        self.assertEqual(falhas, [
+            {"livro_id": "abc", "motivo": "Livro inválido"},
+            {"livro_id": ok.pk, "motivo": "Livro repetido na lista"},
+            {"livro_id": emprestado.pk, "motivo": "Livro indisponível para empréstimo"},
+            {"livro_id": reservado.pk, "motivo": "Livro reservado para retirada"},
+            {"livro_id": 999999, "motivo": "Livro inválido"},
+        ])
+        reservado.refresh_from_db()
+        self.assertEqual(reservado.status, "disponivel")
+
+    def test_numero_de_consultas_nao_depende_do_lote(self):
+        PerfilCirculacao.recalcular([self.leitor.pk])
+
+        def consultas(livros):
+            Reserva.objects.create(livro=livros[0], usuario=self.leitor, status="pronta")
+            with CaptureQueriesContext(connection) as ctx:
+                emprestimos, _ = Emprestimo.registrar_em_lote(
+                    self.leitor, [l.pk for l in livros], self.saida, self.prevista
+                )
+            self.assertEqual(len(emprestimos), len(livros))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(consultas(self._livros(2)), consultas(self._livros(40)))
+
+    def test_api_json(self):
+        livros = self._livros(2)
+        self.client.force_login(self.staff)
+        resp = self.client.post(
+            reverse("livros:registrar_emprestimos_em_lote"),
+            data=json.dumps({
+                "usuario_id": self.leitor.pk,
+                "livro_ids": [livros[0].pk, livros[1].pk, 123456],
+                "data_prevista_devolucao": self.prevista.isoformat(),
+            }),
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+        dados = resp.json()
+        self.assertEqual(len(dados["emprestimos"]), 2)
+        self.assertEqual(dados["falhas"], [{"livro_id": 123456, "motivo": "Livro inválido"}])
+        self.assertEqual(Emprestimo.objects.filter(data_saida=date.today()).count(), 2)
+
+    def test_api_formulario_e_usuario_bloqueado(self):
+        livro, multado = self._livros(2)
+        self.client.force_login(self.staff)
+        url = reverse("livros:registrar_emprestimos_em_lote")
+        dados = {
+            "usuario_id": self.leitor.pk,
+            "livro_ids": [livro.pk],
+            "data_saida": "2025-01-10",
+            "data_prevista_devolucao": "2025-01-17",
+        }
+
+        self.assertEqual(self.client.post(url, dados).status_code, 200)
+
+        Emprestimo.objects.create(
+            livro=multado, usuario=self.leitor, data_prevista_devolucao=self.prevista,
+            data_devolucao=self.prevista, multa_valor=4, multa_paga=False,
+        )
+        resp = self.client.post(url, dados)
+        self.assertEqual(resp.status_code, 403)
+
+        self.assertEqual(self.client.post(url, {**dados, "data_prevista_devolucao": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
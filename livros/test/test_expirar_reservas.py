@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from livros.models import CadastroLivroModel, Reserva
+
+# atomic(savepoint=False) não soma consultas; SELECT vencidas, UPDATE, INSERT avisos,
+# SELECT + UPDATE + INSERT avisos da promoção
+ORCAMENTO_EXPIRACAO = 6
+
+
+class ExpirarVencidasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitores = [User.objects.create_user(username=f"leitor{i}", password="123") for i in range(4)]
+
+    def setUp(self):
+        self.agora = timezone.now()
+
+    def _livro(self, nome):
+        return CadastroLivroModel.objects.create(nome=nome, autor="Autor", status="disponivel")
+
+    def _pronta(self, livro, usuario, vencida=True):
+        expira = self.agora + timedelta(hours=-1 if vencida else 1)
+        return Reserva.objects.create(
+            livro=livro, usuario=usuario, status="pronta",
+            pronta_em=expira - timedelta(days=2), expira_em=expira,
+        )
+
+    def _fila(self, livro, *usuarios):
+        return [Reserva.objects.create(livro=livro, usuario=u) for u in usuarios]
+
+    def _status(self, *reservas):
+        status = dict(Reserva.objects.values_list("pk", "status"))
+        return [status[r.pk] for r in reservas]
+
+    def test_varios_livros_numa_passada(self):
+        a, b, c, d = (self._livro(n) for n in "ABCD")
+        # A: vencida + fila de 2 -> só a primeira sobe
+        venc_a = self._pronta(a, self.leitores[0])
+        fila_a = self._fila(a, self.leitores[1], self.leitores[2])
+        # B: vencida sem fila -> só expira
+        venc_b = self._pronta(b, self.leitores[0])
+        # C: vencida + fila de 1
+        venc_c = self._pronta(c, self.leitores[1])
+        fila_c = self._fila(c, self.leitores[3])
+        # D: pronta dentro do prazo -> fila não anda
+        pronta_d = self._pronta(d, self.leitores[2], vencida=False)
+        fila_d = self._fila(d, self.leitores[3])
+
+        expiradas = Reserva.expirar_vencidas()
+
+        self.assertEqual(expiradas, 3)
+        self.assertEqual(self._status(venc_a, venc_b, venc_c), ["expirada"] * 3)
+        self.assertEqual(self._status(*fila_a), ["pronta", "ativa"])
+        self.assertEqual(self._status(*fila_c), ["pronta"])
+        self.assertEqual(self._status(pronta_d, *fila_d), ["pronta", "ativa"])
+        promovida = Reserva.objects.get(pk=fila_a[0].pk)
+        self.assertGreater(promovida.expira_em, self.agora)
+        self.assertEqual(Reserva.objects.get(pk=venc_a.pk).expirada_em, Reserva.objects.get(pk=venc_c.pk).expirada_em)
+
+    def test_cascata_ao_longo_das_passadas(self):
+        livro = self._livro("Fila longa")
+        vencida = self._pronta(livro, self.leitores[0])
+        fila = self._fila(livro, *self.leitores[1:])
+
+        Reserva.expirar_vencidas()
+        self.assertEqual(self._status(vencida, *fila), ["expirada", "pronta", "ativa", "ativa"])
+
+        # prazo da promovida também acaba: a vez passa para a seguinte
+        Reserva.objects.filter(pk=fila[0].pk).update(expira_em=self.agora - timedelta(minutes=1))
+        Reserva.expirar_vencidas()
+        self.assertEqual(self._status(vencida, *fila), ["expirada", "expirada", "pronta", "ativa"])
+
+    def test_consultas_nao_dependem_do_numero_de_vencidas(self):
+        for i in range(6):
+            livro = self._livro(f"Livro {i}")
+            self._pronta(livro, self.leitores[0])
+            self._fila(livro, self.leitores[1], self.leitores[2])
+
+        with self.assertNumQueries(ORCAMENTO_EXPIRACAO):
+            self.assertEqual(Reserva.expirar_vencidas(), 6)
+
+        self.assertEqual(Reserva.objects.filter(status="pronta").count(), 6)
+
+    def test_sem_vencidas_faz_uma_consulta(self):
+        self._pronta(self._livro("No prazo"), self.leitores[0], vencida=False)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Reserva.expirar_vencidas(), 0)
+
+    def test_escopo_por_livro(self):
+        a, b = self._livro("A"), self._livro("B")
+        venc_a, venc_b = self._pronta(a, self.leitores[0]), self._pronta(b, self.leitores[0])
+
+        self.assertEqual(Reserva.expirar_vencidas([a.pk]), 1)
+
+        self.assertEqual(self._status(venc_a, venc_b), ["expirada", "pronta"])
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from livros import facetas
+from livros.models import CadastroLivroModel, Reserva
+
+
+class FacetasCatalogoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leitor = get_user_model().objects.create_user(username="leitor", password="123")
+
+    def setUp(self):
+        cache.clear()
+        livros = []
+        for i in range(6):
+            livros.append(CadastroLivroModel.objects.create(
+                nome=f"Romance {i}", autor="Machado de Assis",
+                status="emprestado" if i < 2 else "disponivel",
+            ))
+        for i in range(3):
+            CadastroLivroModel.objects.create(nome=f"Conto {i}", autor="Clarice Lispector")
+        CadastroLivroModel.objects.create(nome="Poesia", autor="Cecília Meireles", status="emprestado")
+        Reserva.objects.create(livro=livros[0], usuario=self.leitor, status="ativa")
+        Reserva.objects.create(livro=livros[1], usuario=self.leitor, status="cancelada")
+
+    def _facetas(self, **params):
+        return self.client.get(reverse("livros:catalogo"), params).context["facetas"]
+
+    def test_todas_as_facetas(self):
+        f = self._facetas()
+        self.assertEqual((f["total"], f["disponiveis"], f["emprestados"], f["com_fila"]), (10, 7, 3, 1))
+        self.assertEqual(f["autores"], [
+            {"autor": "Machado de Assis", "total": 6},
+            {"autor": "Clarice Lispector", "total": 3},
+            {"autor": "Cecília Meireles", "total": 1},
+        ])
+
+    def test_facetas_seguem_o_filtro(self):
+        f = self._facetas(q="romance")
+        self.assertEqual((f["total"], f["disponiveis"], f["emprestados"], f["com_fila"]), (6, 4, 2, 1))
+        self.assertEqual(f["autores"], [{"autor": "Machado de Assis", "total": 6}])
+
+        f = self._facetas(q="nada-parecido")
+        self.assertEqual((f["total"], f["autores"]), (0, []))
+
+    def test_uma_consulta_e_cache(self):
+        qs = CadastroLivroModel.objects.all()
+        with self.assertNumQueries(1):
+            facetas.calcular(qs)
+
+        self._facetas(q="Romance")
+        with CaptureQueriesContext(connection) as ctx:
+            f = self._facetas(q="  romance ")  # mesma chave normalizada
+        self.assertEqual(f["total"], 6)
+        self.assertFalse(any("OVER ()" in q["sql"] for q in ctx.captured_queries))
+
+    def test_facetas_podem_ser_desligadas(self):
+        self.assertIsNone(self._facetas(facetas="0"))
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Reserva
+
+
+class PosicaoNaFilaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.usuarios = [User.objects.create_user(username=f"leitor{i}", password="123") for i in range(4)]
+        cls.leitor = cls.usuarios[2]
+
+    def setUp(self):
+        cache.clear()
+        self.livro_a = CadastroLivroModel.objects.create(nome="Livro A", autor="Autor", status="emprestado")
+        self.livro_b = CadastroLivroModel.objects.create(nome="Livro B", autor="Autor", status="emprestado")
+        # livro A: leitor é o 3º de 4 (a primeira já foi cancelada, não conta)
+        Reserva.objects.create(livro=self.livro_a, usuario=self.usuarios[3], status="cancelada")
+        for usuario in self.usuarios:
+            Reserva.objects.create(livro=self.livro_a, usuario=usuario)
+        # livro B: leitor é o 1º de 2
+        Reserva.objects.create(livro=self.livro_b, usuario=self.leitor)
+        Reserva.objects.create(livro=self.livro_b, usuario=self.usuarios[0])
+
+    def test_posicao_e_tamanho_numa_consulta(self):
+        with self.assertNumQueries(1):
+            reservas = {r.livro_id: r for r in Reserva.objects.com_posicao_na_fila(self.leitor)}
+
+        self.assertEqual(set(reservas), {self.livro_a.pk, self.livro_b.pk})
+        self.assertEqual((reservas[self.livro_a.pk].posicao_fila, reservas[self.livro_a.pk].tamanho_fila), (3, 4))
+        self.assertEqual((reservas[self.livro_b.pk].posicao_fila, reservas[self.livro_b.pk].tamanho_fila), (1, 2))
+
+    def test_confere_com_contagem_por_reserva(self):
+        for r in Reserva.objects.com_posicao_na_fila(self.leitor):
+            fila = Reserva.objects.filter(livro=r.livro_id, status="ativa")
+            with self.subTest(livro=r.livro_id):
+                self.assertEqual(r.tamanho_fila, fila.count())
+                self.assertEqual(r.posicao_fila, fila.filter(criada_em__lte=r.criada_em).count())
+
+    def test_traz_so_reservas_do_usuario(self):
+        Reserva.objects.filter(livro=self.livro_b, usuario=self.leitor).update(status="concluida")
+
+        reservas = list(Reserva.objects.com_posicao_na_fila(self.leitor).order_by("-criada_em"))
+
+        self.assertEqual({r.usuario_id for r in reservas}, {self.leitor.pk})
+        self.assertEqual([r.status for r in reservas], ["concluida", "ativa"])
+        self.assertIsNone(reservas[0].posicao_fila)
+
+    def test_minhas_reservas_mostra_posicao(self):
+        self.client.login(username="leitor2", password="123")
+
+        resp = self.client.get(reverse("livros:minhas_reservas"))
+
+        self.assertContains(resp, "3º de 4")
+        self.assertContains(resp, "1º de 2")
+
+    def test_fila_do_livro_usa_indice(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plano verificado apenas no SQLite")
+        plano = Reserva.objects.filter(livro=self.livro_a, status="ativa").order_by("criada_em").explain()
+        self.assertIn("reserva_fila_idx", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
@@ -0,0 +1,66 @@
+from django.db import connection
+from django.test import TestCase
+
+from livros import painel
+from livros.models import CadastroLivroModel
+from livros.paginacao import _depois_de
+from livros.views import ordering_map
+
+
+class IndicesCatalogoTest(TestCase):
+    """EXPLAIN das consultas do catálogo: cada ordenação deve usar índice, sem ordenar em memória."""
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("planos verificados apenas no SQLite")
+        for i in range(30):
+            CadastroLivroModel.objects.create(
+                nome=f"Livro {i}", autor=f"Autor {i}",
+                status="disponivel" if i % 2 else "emprestado",
+            )
+
+    INDICES = {
+        "nome_normalizado": ("livro_status_nomenorm_idx", "livro_nomenorm_idx"),
+        "autor_normalizado": ("livro_status_autornorm_idx", "livro_autornorm_idx"),
+    }
+
+    def _ordenado(self, qs, ordem):
+        return qs.order_by(ordem, "-id" if ordem.startswith("-") else "id")
+
+    def assertUsaIndice(self, qs, indice):
+        plano = qs.explain()
+        self.assertIn(f"USING INDEX {indice}", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
+        return plano
+
+    def test_apenas_disponiveis_usa_indice_composto(self):
+        for ordenar, ordem in ordering_map.items():
+            campo = ordem.lstrip("-")
+            with self.subTest(ordenar=ordenar):
+                qs = CadastroLivroModel.objects.filter(status="disponivel")
+                plano = self.assertUsaIndice(self._ordenado(qs, ordem), self.INDICES[campo][0])
+                self.assertIn("status=?", plano)
+
+    def test_catalogo_completo_usa_indice_da_ordenacao(self):
+        for ordenar, ordem in ordering_map.items():
+            campo = ordem.lstrip("-")
+            with self.subTest(ordenar=ordenar):
+                self.assertUsaIndice(self._ordenado(CadastroLivroModel.objects.all(), ordem), self.INDICES[campo][1])
+
+    def test_pagina_por_cursor_busca_intervalo_no_indice(self):
+        for ordenar, ordem in ordering_map.items():
+            campo = ordem.lstrip("-")
+            desc = ordem.startswith("-")
+            with self.subTest(ordenar=ordenar):
+                qs = CadastroLivroModel.objects.filter(status="disponivel").filter(
+                    _depois_de(campo, desc, "livro 1", 3)
+                )
+                plano = self.assertUsaIndice(self._ordenado(qs, ordem), self.INDICES[campo][0])
+                self.assertIn(f"{campo}{'<' if desc else '>'}?", plano)
+
+    def test_ultimos_cadastrados_usa_indice_de_data(self):
+        self.assertUsaIndice(painel.consulta_recentes(), "livro_data_criacao_idx")
+
+    def test_status_e_comparado_exatamente(self):
+        sql = str(CadastroLivroModel.objects.filter(status="disponivel").query)
+        self.assertNotIn("LIKE", sql.upper())
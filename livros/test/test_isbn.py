@@ -0,0 +1,146 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from livros.isbn import normalizar_isbn
+from livros.models import CadastroLivroModel, Emprestimo, Reserva
+
+
+class NormalizarIsbnTest(SimpleTestCase):
+
+    def test_isbn13_com_hifens(self):
+        self.assertEqual(normalizar_isbn("978-85-359-1066-7"), "9788535910667")
+
+    def test_isbn10_vira_isbn13(self):
+        self.assertEqual(normalizar_isbn("0-306-40615-2"), "9780306406157")
+        self.assertEqual(normalizar_isbn("0-8044-2957-X"), "9780804429573")
+
+    def test_invalidos(self):
+        self.assertIsNone(normalizar_isbn("9788535910664"))  # dígito errado
+        self.assertIsNone(normalizar_isbn("333"))
+        self.assertIsNone(normalizar_isbn(""))
+        self.assertIsNone(normalizar_isbn(None))
+
+
+class IsbnLivroTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_superuser(username="balcao", email="b@b.com", password="123")
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+
+    def setUp(self):
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis", isbn="85-359-1066-X")
+
+    def test_coluna_normalizada_e_unica(self):
+        self.assertIsNone(self.livro.isbn_normalizado)  # dígito verificador errado
+        self.livro.isbn = "978-85-359-1066-7"
+        self.livro.save(update_fields=["isbn"])
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.isbn_normalizado, "9788535910667")
+
+        with self.assertRaises(IntegrityError):
+            CadastroLivroModel.objects.create(nome="Outro", autor="X", isbn="9788535910667")
+
+    def test_isbns_invalidos_podem_repetir(self):
+        CadastroLivroModel.objects.create(nome="A", autor="X", isbn="333")
+        CadastroLivroModel.objects.create(nome="B", autor="X", isbn="333")
+
+    def test_formulario_expoe_e_valida_isbn(self):
+        self.client.force_login(self.admin)
+        CadastroLivroModel.objects.create(nome="Existente", autor="X", isbn="9780306406157")
+        response = self.client.post(reverse("livros:cadastrar_livro"), {
+            "nome": "Novo", "autor": "Y", "isbn": "0-306-40615-2",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("isbn", response.context["form"].errors)
+
+        response = self.client.post(reverse("livros:cadastrar_livro"), {
+            "nome": "Novo", "autor": "Y", "isbn": "0-8044-2957-X",
+        })
+        self.assertRedirects(response, reverse("livros:home1"))
+        self.assertEqual(CadastroLivroModel.objects.get(nome="Novo").isbn_normalizado, "9780804429573")
+
+    def test_duplicado_antigo_pode_ser_salvo(self):
+        dono = CadastroLivroModel.objects.create(nome="A", autor="X", isbn="9780306406157")
+        # como a migração 0011 deixa o duplicado mais novo: isbn mantido, sem isbn_normalizado
+        duplicado = CadastroLivroModel.objects.create(nome="B", autor="X")
+        CadastroLivroModel.objects.filter(pk=duplicado.pk).update(isbn="0-306-40615-2")
+
+        duplicado = CadastroLivroModel.objects.get(pk=duplicado.pk)
+        duplicado.nome = "B revisado"
+        duplicado.save()
+        duplicado.refresh_from_db()
+        self.assertEqual((duplicado.nome, duplicado.isbn_normalizado), ("B revisado", None))
+
+        self.client.force_login(self.admin)
+        url = reverse("livros:editar_livro", args=[duplicado.pk])
+        response = self.client.post(url, {"nome": "B", "autor": "X", "isbn": "0-306-40615-2"})
+        self.assertEqual(response.status_code, 302)
+
+        # trocar por outro ISBN que já tem dono é recusado no formulário, não no banco
+        response = self.client.post(url, {"nome": "B", "autor": "X", "isbn": "978-0-306-40615-7"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("isbn", response.context["form"].errors)
+
+        response = self.client.post(url, {"nome": "B", "autor": "X", "isbn": "0-8044-2957-X"})
+        self.assertEqual(response.status_code, 302)
+        duplicado.refresh_from_db()
+        self.assertEqual(duplicado.isbn_normalizado, "9780804429573")
+        self.assertEqual(CadastroLivroModel.objects.get(pk=dono.pk).isbn_normalizado, "9780306406157")
+
+    def test_busca_por_codigo_lido_em_uma_consulta(self):
+        self.livro.isbn = "9788535910667"
+        self.livro.status = "emprestado"
+        self.livro.save()
+        hoje = timezone.now().date()
+        Emprestimo.objects.create(livro=self.livro, usuario=self.leitor, data_prevista_devolucao=hoje)
+        Reserva.objects.create(livro=self.livro, usuario=self.admin, status="ativa")
+
+        self.client.force_login(self.admin)
+        url = reverse("livros:livro_por_isbn", args=["8535910662"])  # ISBN-10 do mesmo livro
+        self.client.get(url)  # aquece sessão/usuário
+        with self.assertNumQueries(3):  # sessão + usuário + a consulta do livro
+            dados = self.client.get(url).json()
+
+        self.assertEqual(dados["livro"]["id"], self.livro.id)
+        self.assertEqual(dados["emprestimo"]["usuario"], "leitor")
+        self.assertEqual(dados["emprestimo"]["data_prevista_devolucao"], hoje.isoformat())
+        self.assertIsNone(dados["reserva_pronta"])
+        self.assertEqual(dados["reservas_na_fila"], 1)
+
+    def test_busca_por_codigo_invalido_ou_inexistente(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse("livros:livro_por_isbn", args=["123"])).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse("livros:livro_por_isbn", args=["9780306406157"])).status_code, 404
+        )
+
+    def test_busca_por_codigo_exige_staff(self):
+        self.client.force_login(self.leitor)
+        response = self.client.get(reverse("livros:livro_por_isbn", args=["9788535910667"]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_comando_normaliza_e_deduplica(self):
+        a = CadastroLivroModel.objects.create(nome="A", autor="X", isbn="x")
+        b = CadastroLivroModel.objects.create(nome="B", autor="X", isbn="y")
+        # cargas antigas gravavam direto no banco, sem normalizar
+        CadastroLivroModel.objects.filter(pk=a.pk).update(isbn="978-0-306-40615-7")
+        CadastroLivroModel.objects.filter(pk=b.pk).update(isbn="0306406152")
+
+        saida = StringIO()
+        call_command("normalizar_isbns", "--reescrever", stdout=saida)
+
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual(a.isbn_normalizado, "9780306406157")
+        self.assertEqual(a.isbn, "9780306406157")
+        self.assertIsNone(b.isbn_normalizado)
+        self.assertIn(f"livro {b.pk} (B) repete o do livro {a.pk} (A)", saida.getvalue())
+        self.assertIn("1 duplicado(s)", saida.getvalue())
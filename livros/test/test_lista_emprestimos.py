@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Emprestimo
+
+
+class ListaEmprestimosTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        cls.ana = User.objects.create_user(username="ana", password="123")
+        cls.bruno = User.objects.create_user(username="bruno", password="123")
+        hoje = date.today()
+        cls.hoje = hoje
+
+        def emprestar(nome, usuario, saida, prevista, devolucao=None, multa=0):
+            livro = CadastroLivroModel.objects.create(nome=nome, autor="Autor")
+            return Emprestimo.objects.create(
+                livro=livro, usuario=usuario, data_saida=saida, data_prevista_devolucao=prevista,
+                data_devolucao=devolucao, multa_valor=multa, multa_paga=not multa,
+            )
+
+        cls.ativo = emprestar("Ativo", cls.ana, hoje, hoje + timedelta(days=7))
+        cls.atrasado = emprestar("Atrasado", cls.bruno, hoje - timedelta(days=20), hoje - timedelta(days=2))
+        cls.devolvido = emprestar(
+            "Devolvido", cls.ana, hoje - timedelta(days=60), hoje - timedelta(days=50),
+            devolucao=hoje - timedelta(days=45), multa=10,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def _nomes(self, **params):
+        resp = self.client.get(reverse("livros:emprestimos_list"), params)
+        self.assertEqual(resp.status_code, 200)
+        return [e.livro.nome for e in resp.context["emprestimos"]]
+
+    def test_filtros(self):
+        self.assertEqual(self._nomes(), ["Devolvido", "Atrasado", "Ativo"])
+        self.assertEqual(self._nomes(situacao="ativos"), ["Atrasado", "Ativo"])
+        self.assertEqual(self._nomes(situacao="atrasados"), ["Atrasado"])
+        self.assertEqual(self._nomes(situacao="devolvidos"), ["Devolvido"])
+        self.assertEqual(self._nomes(multa="pendente"), ["Devolvido"])
+        self.assertEqual(self._nomes(usuario="an"), ["Devolvido", "Ativo"])
+        self.assertEqual(self._nomes(livro="atra"), ["Atrasado"])
+        self.assertEqual(self._nomes(de=(self.hoje - timedelta(days=30)).isoformat()), ["Atrasado", "Ativo"])
+        self.assertEqual(self._nomes(ate=(self.hoje - timedelta(days=30)).isoformat()), ["Devolvido"])
+        self.assertEqual(self._nomes(situacao="ativos", usuario="bruno"), ["Atrasado"])
+
+    def test_renovar_em_lote_so_com_um_usuario_no_filtro(self):
+        User = get_user_model()
+        User.objects.create_user(username="anabela", password="123")
+        url = reverse("livros:emprestimos_list")
+
+        # "an" casa com ana e anabela: sem botão
+        self.assertIsNone(self.client.get(url, {"usuario": "an"}).context["usuario_renovacao"])
+        self.assertIsNone(self.client.get(url, {"usuario": "ana"}).context["usuario_renovacao"])
+
+        resp = self.client.get(url, {"usuario": "br"})
+        self.assertEqual(resp.context["usuario_renovacao"], self.bruno)
+        self.assertContains(resp, f'name="usuario_id" value="{self.bruno.pk}"')
+
+    def test_paginacao_preserva_filtros(self):
+        for i in range(55):
+            Emprestimo.objects.create(
+                livro=CadastroLivroModel.objects.create(nome=f"Extra {i}", autor="Autor"),
+                usuario=self.ana, data_prevista_devolucao=self.hoje + timedelta(days=1),
+            )
+        resp = self.client.get(reverse("livros:emprestimos_list"), {"situacao": "ativos"})
+        self.assertEqual(len(resp.context["emprestimos"]), 50)
+        self.assertIn("?page=2&situacao=ativos", resp.content.decode())
+        resp = self.client.get(reverse("livros:emprestimos_list"), {"situacao": "ativos", "page": 2})
+        self.assertEqual(len(resp.context["emprestimos"]), 7)
+
+    def test_filtros_usam_indices(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("planos verificados apenas no SQLite")
+        plano = Emprestimo.objects.atrasados().order_by("data_prevista_devolucao").explain()
+        self.assertIn("emprestimo_devol_prev_idx", plano)
+        plano = Emprestimo.objects.filter(usuario=self.ana, multa_paga=False, multa_valor__gt=0).explain()
+        self.assertIn("emprestimo_multa_aberta_idx", plano)
@@ -0,0 +1,75 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from livros import busca
+from livros.models import CadastroLivroModel
+from livros.texto import normalizar
+
+
+class NormalizarTextoTest(SimpleTestCase):
+
+    def test_remove_acentos_caixa_e_espacos(self):
+        self.assertEqual(normalizar("  São   JOÃO "), "sao joao")
+        self.assertEqual(normalizar("Çäñé"), "cane")
+        self.assertEqual(normalizar("Straße"), "strasse")
+        self.assertEqual(normalizar(None), "")
+
+
+class ColunasNormalizadasTest(TestCase):
+    """Busca e ordenação do catálogo pelas colunas normalizadas."""
+
+    def setUp(self):
+        self.sao_joao = CadastroLivroModel.objects.create(nome="São João del-Rei", autor="Érico Veríssimo")
+        CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis")
+        CadastroLivroModel.objects.create(nome="Fogo Morto", autor="José Lins do Rego")
+
+    def _nomes(self, **params):
+        response = self.client.get(reverse("livros:catalogo"), params)
+        return [l.nome for l in response.context["livros"]]
+
+    def test_colunas_preenchidas_no_save(self):
+        self.assertEqual(self.sao_joao.nome_normalizado, "sao joao del-rei")
+        self.assertEqual(self.sao_joao.autor_normalizado, "erico verissimo")
+
+        self.sao_joao.nome = "ÁGUA VIVA"
+        self.sao_joao.save(update_fields=["nome"])
+        self.sao_joao.refresh_from_db()
+        self.assertEqual(self.sao_joao.nome_normalizado, "agua viva")
+
+    def test_busca_sem_acento_encontra_acentuado(self):
+        self.assertEqual(self._nomes(q="sao joao"), ["São João del-Rei"])
+        self.assertEqual(self._nomes(q="ERICO"), ["São João del-Rei"])
+
+    def test_busca_generica_usa_colunas_normalizadas(self):
+        with mock.patch.object(busca, "_vendor", return_value="outro"):
+            qs = busca.filtrar(CadastroLivroModel.objects.all(), "SÃO joão")
+            self.assertEqual([l.nome for l in qs], ["São João del-Rei"])
+            sql = str(qs.query).upper()
+        self.assertIn("NOME_NORMALIZADO", sql)
+        self.assertNotIn("UPPER(", sql)
+        self.assertNotIn("LOWER(", sql)
+
+    def test_ordenacao_ignora_acentos(self):
+        self.assertEqual(
+            self._nomes(ordenar="autor_az"),
+            ["São João del-Rei", "Fogo Morto", "Dom Casmurro"],  # Érico, José, Machado
+        )
+
+    def test_comando_preenche_registros_antigos(self):
+        # update() não passa pelo save()
+        CadastroLivroModel.objects.filter(pk=self.sao_joao.pk).update(
+            nome="Vidas Secas", nome_normalizado="", autor_normalizado=""
+        )
+        saida = StringIO()
+        call_command("normalizar_livros", stdout=saida)
+        self.assertIn("1 livro(s)", saida.getvalue())
+
+        self.sao_joao.refresh_from_db()
+        self.assertEqual(self.sao_joao.nome_normalizado, "vidas secas")
+        self.assertEqual(self._nomes(q="vidas"), ["Vidas Secas"])
+        self.assertEqual(self._nomes(q="vidas seca", modo="aproximado"), ["Vidas Secas"])
+        self.assertEqual(self._nomes(q="sao joao del rei", modo="aproximado"), [])
@@ -0,0 +1,174 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from livros import notificacoes
+from livros.models import CadastroLivroModel, Emprestimo, Notificacao, Reserva
+
+
+class CaixaDeSaidaTest(TestCase):
+    """As notificações são gravadas na mesma transação da mudança de estado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitor = User.objects.create_user(username="leitor", password="123", email="leitor@exemplo.com")
+        cls.proximo = User.objects.create_user(username="proximo", password="123", email="proximo@exemplo.com")
+
+    def setUp(self):
+        cache.clear()
+        self.hoje = date.today()
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado", status="emprestado")
+
+    def _emprestimo(self, prevista):
+        return Emprestimo.objects.create(
+            livro=self.livro, usuario=self.leitor,
+            data_saida=self.hoje - timedelta(days=10), data_prevista_devolucao=prevista,
+        )
+
+    def _tipos(self):
+        return sorted(Notificacao.objects.values_list("tipo", "usuario__username"))
+
+    def test_devolucao_com_multa_e_fila(self):
+        emp = self._emprestimo(self.hoje - timedelta(days=2))
+        reserva = Reserva.objects.create(livro=self.livro, usuario=self.proximo)
+
+        emp.registrar_devolucao(self.hoje)
+
+        self.assertEqual(self._tipos(), [("multa_aplicada", "leitor"), ("reserva_pronta", "proximo")])
+        multa = Notificacao.objects.get(tipo="multa_aplicada")
+        self.assertEqual((multa.emprestimo_id, multa.dados), (emp.pk, {"valor": "4.00"}))
+        self.assertEqual(Notificacao.objects.get(tipo="reserva_pronta").reserva_id, reserva.pk)
+
+    def test_devolucao_desfeita_nao_deixa_aviso(self):
+        emp = self._emprestimo(self.hoje - timedelta(days=2))
+        Reserva.objects.create(livro=self.livro, usuario=self.proximo)
+
+        with mock.patch.object(Reserva, "expirar_vencidas", side_effect=DatabaseError("queda")):
+            with self.assertRaises(DatabaseError):
+                emp.registrar_devolucao(self.hoje)
+
+        self.assertFalse(Notificacao.objects.exists())
+
+    def test_expiracao_avisa_e_promove(self):
+        vencida = Reserva.objects.create(
+            livro=self.livro, usuario=self.leitor, status="pronta",
+            expira_em=timezone.now() - timedelta(hours=1),
+        )
+        Reserva.objects.create(livro=self.livro, usuario=self.proximo)
+
+        Reserva.expirar_vencidas()
+        Reserva.expirar_vencidas()
+
+        self.assertEqual(self._tipos(), [("reserva_expirada", "leitor"), ("reserva_pronta", "proximo")])
+        self.assertEqual(Notificacao.objects.get(tipo="reserva_expirada").reserva_id, vencida.pk)
+
+    def test_acumular_multas_avisa_so_na_primeira_vez(self):
+        emp = self._emprestimo(self.hoje - timedelta(days=3))
+
+        Emprestimo.objects.acumular_multas(hoje=self.hoje)
+        Emprestimo.objects.acumular_multas(hoje=self.hoje + timedelta(days=1))
+
+        self.assertEqual(self._tipos(), [("multa_aplicada", "leitor")])
+        self.assertEqual(Notificacao.objects.get().dados, {"valor": "6.00"})
+        emp.refresh_from_db()
+        self.assertEqual(emp.multa_valor, Decimal("8.00"))
+
+    def test_aviso_de_vencimento_e_idempotente(self):
+        vence = self._emprestimo(self.hoje + timedelta(days=1))
+        longe = CadastroLivroModel.objects.create(nome="Outro", autor="Autor", status="emprestado")
+        Emprestimo.objects.create(livro=longe, usuario=self.leitor, data_prevista_devolucao=self.hoje + timedelta(days=9))
+
+        self.assertEqual(Notificacao.avisar_vencimentos(dias=2), 1)
+        Notificacao.avisar_vencimentos(dias=2)
+
+        aviso = Notificacao.objects.get()
+        self.assertEqual((aviso.tipo, aviso.emprestimo_id), ("emprestimo_vencendo", vence.pk))
+
+        # renovou: a nova data gera outro aviso
+        Emprestimo.objects.filter(pk=vence.pk).update(data_prevista_devolucao=self.hoje + timedelta(days=2))
+        Notificacao.avisar_vencimentos(dias=2)
+        self.assertEqual(Notificacao.objects.count(), 2)
+
+
+class DespachanteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitor = User.objects.create_user(username="leitor", password="123", email="leitor@exemplo.com")
+        cls.sem_email = User.objects.create_user(username="sem_email", password="123")
+
+    def setUp(self):
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado")
+        self.reservas = [
+            Reserva.objects.create(livro=self.livro, usuario=self.leitor, status="concluida") for _ in range(5)
+        ]
+        expira = timezone.now() + timedelta(days=2)
+        Notificacao.enfileirar(Notificacao.reserva_pronta(r.pk, self.leitor.pk, expira) for r in self.reservas)
+
+    def test_envia_em_lotes_e_marca_enviadas(self):
+        with self.assertNumQueries(3 * 2 + 1):  # por lote: SELECT + UPDATE; último SELECT vazio
+            enviadas, falhas = notificacoes.enviar_pendentes(lote=2)
+
+        self.assertEqual((enviadas, falhas), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ["leitor@exemplo.com"])
+        self.assertIn('"Dom Casmurro"', mail.outbox[0].body)
+        self.assertFalse(Notificacao.objects.filter(enviada_em__isnull=True).exists())
+
+        # nada pendente: nenhuma reentrega
+        notificacoes.enviar_pendentes()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_falha_conta_tentativa_e_reenvia_depois(self):
+        original = mail.EmailMessage.send
+        chamadas = []
+
+        def falha_na_segunda(msg, *args, **kwargs):
+            chamadas.append(msg)
+            if len(chamadas) == 2:
+                raise OSError("SMTP fora do ar")
+            return original(msg, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMessage, "send", falha_na_segunda):
+            self.assertEqual(notificacoes.enviar_pendentes(), (4, 1))
+
+        pendente = Notificacao.objects.get(enviada_em__isnull=True)
+        self.assertEqual((pendente.tentativas, pendente.ultimo_erro), (1, "SMTP fora do ar"))
+
+        # pelo menos uma vez: a que falhou sai na próxima execução
+        self.assertEqual(notificacoes.enviar_pendentes(), (1, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_desiste_depois_do_maximo_de_tentativas(self):
+        Notificacao.objects.update(tentativas=notificacoes.MAX_TENTATIVAS)
+
+        self.assertEqual(notificacoes.enviar_pendentes(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_usuario_sem_email_sai_da_fila(self):
+        Notificacao.objects.update(usuario=self.sem_email)
+
+        self.assertEqual(notificacoes.enviar_pendentes(), (0, 0))
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(set(Notificacao.objects.values_list("ultimo_erro", flat=True)), {"usuário sem e-mail"})
+        self.assertFalse(Notificacao.objects.filter(enviada_em__isnull=True).exists())
+
+    def test_comando(self):
+        saida = StringIO()
+
+        call_command("enviar_notificacoes", "--lote", "3", stdout=saida)
+
+        self.assertIn("5 notificação(ões) enviada(s), 0 falha(s)", saida.getvalue())
+        self.assertEqual(len(mail.outbox), 5)
@@ -0,0 +1,105 @@
+import base64
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel
+from livros.paginacao import decodificar_cursor
+
+
+class PaginacaoCursorCatalogoTest(TestCase):
+    """Paginação por cursor (keyset) do catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        # nomes repetidos de propósito: o desempate por id precisa manter a ordem estável
+        for i in range(45):
+            CadastroLivroModel.objects.create(
+                nome=f"Livro {i % 15:02d}",
+                autor=f"Autor {44 - i:02d}",
+                status="disponivel" if i % 3 else "emprestado",
+            )
+
+    def _get(self, **params):
+        return self.client.get(reverse("livros:catalogo"), {"paginacao": "cursor", **params})
+
+    def _percorrer(self, **params):
+        vistos = []
+        response = self._get(**params)
+        while True:
+            page = response.context["page_obj"]
+            vistos.extend(l.pk for l in page)
+            if not page.has_next():
+                return vistos, response
+            response = self._get(cursor=page.cursor_proximo, **params)
+
+    def test_percorre_todas_as_ordenacoes_sem_repetir(self):
+        esperados = {
+            "nome_az": CadastroLivroModel.objects.order_by("nome_normalizado", "id"),
+            "nome_za": CadastroLivroModel.objects.order_by("-nome_normalizado", "-id"),
+            "autor_az": CadastroLivroModel.objects.order_by("autor_normalizado", "id"),
+            "autor_za": CadastroLivroModel.objects.order_by("-autor_normalizado", "-id"),
+        }
+        for ordenar, qs in esperados.items():
+            with self.subTest(ordenar=ordenar):
+                vistos, _ = self._percorrer(ordenar=ordenar)
+                self.assertEqual(vistos, list(qs.values_list("pk", flat=True)))
+
+    def test_link_anterior_volta_para_a_mesma_pagina(self):
+        pagina1 = self._get(ordenar="nome_az").context["page_obj"]
+        self.assertFalse(pagina1.has_previous())
+
+        pagina2 = self._get(ordenar="nome_az", cursor=pagina1.cursor_proximo).context["page_obj"]
+        self.assertTrue(pagina2.has_previous())
+
+        de_volta = self._get(ordenar="nome_az", cursor=pagina2.cursor_anterior).context["page_obj"]
+        self.assertEqual([l.pk for l in de_volta], [l.pk for l in pagina1])
+        self.assertTrue(de_volta.has_next())
+        self.assertFalse(de_volta.has_previous())
+
+    def test_filtros_sao_preservados_nos_links(self):
+        vistos, response = self._percorrer(ordenar="autor_az", apenas_disponiveis="on")
+        self.assertEqual(len(vistos), CadastroLivroModel.objects.filter(status="disponivel").count())
+        self.assertIn("apenas_disponiveis=on", response.context["querystring"])
+        self.assertNotIn("cursor=", response.context["querystring"])
+
+    def test_total_aproximado_nao_refaz_count(self):
+        primeira = self._get()
+        self.assertEqual(primeira.context["page_obj"].total_aproximado, 45)
+
+        cursor = primeira.context["page_obj"].cursor_proximo
+        with CaptureQueriesContext(connection) as ctx:
+            segunda = self._get(cursor=cursor)
+        self.assertEqual(segunda.context["page_obj"].total_aproximado, 45)
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+        self.assertFalse(any("OFFSET" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_cursor_invalido_volta_para_primeira_pagina(self):
+        self.assertIsNone(decodificar_cursor("nao-e-um-cursor"))
+        response = self._get(cursor="nao-e-um-cursor")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["page_obj"]), 20)
+
+    def test_cursor_adulterado_volta_para_primeira_pagina(self):
+        adulterados = [
+            '["x", 1e400, "prox"]',
+            '["x", 99999999999999999999, "prox"]',
+            '["x", true, "prox"]',
+            '["x", "1", "prox"]',
+            '[1e400, 1, "prox"]',
+            '[99999999999999999999, 1, "prox"]',
+            '[null, 1, "prox"]',
+            '[["x"], 1, "prox"]',
+            '[{"a": 1}, 1, "ant"]',
+            '["x", 1]',
+        ]
+        for bruto in adulterados:
+            cursor = base64.urlsafe_b64encode(bruto.encode()).decode()
+            with self.subTest(cursor=bruto):
+                self.assertIsNone(decodificar_cursor(cursor))
+                response = self._get(cursor=cursor)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context["page_obj"]), 20)
@@ -0,0 +1,117 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from livros import painel
+from livros.models import CadastroLivroModel, Emprestimo
+
+
+class PainelHomepageTest(TestCase):
+    """Contadores do dashboard: um aggregate, cache e ajuste incremental."""
+
+    def setUp(self):
+        cache.clear()
+        self.livro1 = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado de Assis")
+        self.livro2 = CadastroLivroModel.objects.create(nome="1984", autor="George Orwell", status="emprestado")
+
+    def _numeros(self):
+        ctx = self.client.get(reverse("homepage")).context
+        return ctx["total"], ctx["disponiveis"], ctx["emprestados"]
+
+    def test_contadores_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(painel.recalcular()[painel.CHAVE_TOTAL], 2)
+
+    def test_homepage_sem_consultas_entre_mudancas(self):
+        self.assertEqual(self._numeros(), (2, 1, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(self._numeros(), (2, 1, 1))
+
+    def test_cadastro_edicao_e_remocao_ajustam_contadores(self):
+        self._numeros()
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = CadastroLivroModel.objects.create(nome="Novo", autor="Autor")
+        self.assertEqual(self._numeros(), (3, 2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo.status = "emprestado"
+            novo.save()
+        self.assertEqual(self._numeros(), (3, 1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo.delete()
+        self.assertEqual(self._numeros(), (2, 1, 1))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._numeros(), (2, 1, 1))
+
+    def test_status_adiado_nao_consulta_e_invalida(self):
+        self._numeros()
+        with self.assertNumQueries(1):  # só o SELECT; o post_init não busca o status adiado
+            livro = CadastroLivroModel.objects.only("id", "nome").get(pk=self.livro1.pk)
+        self.assertIsNone(livro._status_original)
+
+        # sem o status de origem não dá para saber qual contador ajustar: recalcula
+        with self.captureOnCommitCallbacks(execute=True):
+            livro.status = "emprestado"
+            livro.save()
+        self.assertEqual(self._numeros(), (2, 0, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CadastroLivroModel.objects.only("id").get(pk=self.livro2.pk).delete()
+        self.assertEqual(self._numeros(), (1, 0, 1))
+
+    def test_emprestimo_e_devolucao_ajustam_contadores(self):
+        User = get_user_model()
+        admin = User.objects.create_superuser(username="admin", email="a@a.com", password="123")
+        self.client.force_login(admin)
+        self._numeros()
+
+        hoje = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("livros:registrar_emprestimo"), {
+                "livro_id": self.livro1.id, "usuario_id": admin.id,
+                "data_saida": hoje.isoformat(), "data_prevista_devolucao": hoje.isoformat(),
+            })
+        self.assertEqual(self._numeros(), (2, 0, 2))
+
+        emp = Emprestimo.objects.get(livro=self.livro1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("livros:registrar_devolucao", args=[emp.pk]),
+                             {"data_devolucao": hoje.isoformat()})
+        self.assertEqual(self._numeros(), (2, 1, 1))
+
+    def test_recentes_em_cache(self):
+        self.client.get(reverse("homepage"))
+        with self.assertNumQueries(0):
+            recentes = self.client.get(reverse("homepage")).context["recentes"]
+        self.assertEqual([l.nome for l in recentes], ["1984", "Dom Casmurro"])
+
+    def test_reconciliacao_corrige_deriva(self):
+        self._numeros()
+        # escrita que não passa pelos signals
+        CadastroLivroModel.objects.filter(pk=self.livro1.pk).update(status="emprestado")
+        self.assertEqual(self._numeros(), (2, 1, 1))
+
+        call_command("recalcular_painel", stdout=StringIO())
+        self.assertEqual(self._numeros(), (2, 0, 2))
+
+    def test_numeros_de_outro_processo_expiram(self):
+        self._numeros()
+        # mudança feita por outro worker: os signals dele não ajustam este cache
+        CadastroLivroModel.objects.filter(pk=self.livro1.pk).update(status="emprestado")
+        CadastroLivroModel.objects.create(nome="Novo", autor="Autor")
+        self.assertEqual(self._numeros(), (2, 1, 1))
+
+        depois = time.time() + painel.TTL_PAINEL + 1
+        with mock.patch("time.time", return_value=depois):
+            self.assertEqual(self._numeros(), (3, 1, 2))
+            recentes = self.client.get(reverse("homepage")).context["recentes"]
+        self.assertEqual(recentes[0].nome, "Novo")
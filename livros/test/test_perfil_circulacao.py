@@ -0,0 +1,96 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Emprestimo, PerfilCirculacao
+from livros.views import usuario_bloqueado
+
+
+class PerfilCirculacaoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        cls.outro = User.objects.create_user(username="outro", password="123")
+
+    def setUp(self):
+        self.hoje = date.today()
+
+    def _livro(self, nome="Livro"):
+        return CadastroLivroModel.objects.create(nome=nome, autor="Autor")
+
+    def _perfil(self, usuario=None):
+        p = PerfilCirculacao.objects.get(pk=(usuario or self.leitor).pk)
+        return p.emprestimos_ativos, p.multas_pendentes, p.multa_aberta_total
+
+    def test_ciclo_emprestimo_devolucao_quitacao(self):
+        emp = Emprestimo.registrar(self.leitor, self._livro().pk, self.hoje - timedelta(days=10),
+                                   self.hoje - timedelta(days=3))
+        self.assertEqual(self._perfil(), (1, 0, Decimal("0")))
+
+        emp.registrar_devolucao(self.hoje)
+        self.assertEqual(self._perfil(), (0, 1, Decimal("6.00")))
+        with self.assertNumQueries(1):
+            self.assertTrue(usuario_bloqueado(self.leitor))
+
+        emp.quitar_multa()
+        self.assertEqual(self._perfil(), (0, 0, Decimal("0")))
+        self.assertFalse(usuario_bloqueado(self.leitor))
+
+    def test_operacoes_em_lote(self):
+        livros = [self._livro(f"L{i}") for i in range(3)]
+        emprestimos, _ = Emprestimo.registrar_em_lote(
+            self.leitor, [l.pk for l in livros], self.hoje - timedelta(days=10), self.hoje - timedelta(days=2)
+        )
+        self.assertEqual(self._perfil(), (3, 0, Decimal("0")))
+
+        Emprestimo.registrar_devolucoes_em_lote([e.pk for e in emprestimos[:2]], self.hoje)
+        self.assertEqual(self._perfil(), (1, 2, Decimal("8.00")))
+
+    def test_saves_diretos_e_remocao(self):
+        # ex.: admin ou scripts criando/alterando empréstimos sem passar pelas operações do balcão
+        emp = Emprestimo.objects.create(
+            livro=self._livro(), usuario=self.outro, data_prevista_devolucao=self.hoje,
+            data_devolucao=self.hoje, multa_valor=5, multa_paga=False,
+        )
+        self.assertEqual(self._perfil(self.outro), (0, 1, Decimal("5.00")))
+
+        emp.usuario = self.leitor
+        emp.save()
+        self.assertEqual(self._perfil(self.outro), (0, 0, Decimal("0")))
+        self.assertEqual(self._perfil(), (0, 1, Decimal("5.00")))
+
+        Emprestimo.objects.get(pk=emp.pk).delete()
+        self.assertEqual(self._perfil(), (0, 0, Decimal("0")))
+
+    def test_comando_de_reconciliacao(self):
+        Emprestimo.objects.create(
+            livro=self._livro(), usuario=self.leitor, data_prevista_devolucao=self.hoje,
+        )
+        PerfilCirculacao.objects.filter(pk=self.leitor.pk).update(emprestimos_ativos=42, multas_pendentes=7)
+
+        saida = StringIO()
+        call_command("reconciliar_perfis", stdout=saida)
+
+        self.assertEqual(self._perfil(), (1, 0, Decimal("0")))
+        self.assertEqual(self._perfil(self.outro), (0, 0, Decimal("0")))
+        self.assertIn("2 perfil(is) reconciliado(s)", saida.getvalue())
+
+    def test_saldo_no_topo_das_paginas(self):
+        Emprestimo.objects.create(
+            livro=self._livro(), usuario=self.leitor, data_prevista_devolucao=self.hoje,
+            data_devolucao=self.hoje, multa_valor=4, multa_paga=False,
+        )
+        self.client.force_login(self.leitor)
+        resp = self.client.get(reverse("livros:minhas_reservas"))
+        self.assertContains(resp, "Multas: R$ 4,00")
+
+        self.client.logout()
+        resp = self.client.get(reverse("livros:catalogo"))
+        self.assertNotIn("perfil_circulacao", resp.context)
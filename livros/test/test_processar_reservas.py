@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from livros.models import CadastroLivroModel, Emprestimo, Reserva
+
+
+class ProcessarReservasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        cls.proximo = User.objects.create_user(username="proximo", password="123")
+        cls.outro = User.objects.create_user(username="outro", password="123")
+
+    def setUp(self):
+        cache.clear()
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado", status="disponivel")
+        ontem = timezone.now() - timedelta(days=1)
+        self.vencida = Reserva.objects.create(
+            livro=self.livro, usuario=self.leitor, status="pronta",
+            pronta_em=ontem - timedelta(days=2), expira_em=ontem,
+        )
+
+    def test_pagina_de_reservas_nao_grava(self):
+        self.client.login(username="leitor", password="123")
+
+        with CaptureQueriesContext(connection) as consultas:
+            resp = self.client.get(reverse("livros:minhas_reservas"))
+
+        escritas = [q["sql"] for q in consultas if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))]
+        self.assertFalse([sql for sql in escritas if "livros_reserva" in sql])
+        self.assertContains(resp, "Expirada")
+        self.assertNotContains(resp, "Pronta p/ retirada")
+        self.vencida.refresh_from_db()
+        self.assertEqual(self.vencida.status, "pronta")
+        self.assertEqual(self.vencida.status_efetivo, "expirada")
+
+    def test_comando_expira_e_promove(self):
+        na_fila = Reserva.objects.create(livro=self.livro, usuario=self.proximo)
+        saida = StringIO()
+
+        call_command("processar_reservas", "--uma-vez", stdout=saida)
+
+        self.vencida.refresh_from_db()
+        na_fila.refresh_from_db()
+        self.assertEqual(self.vencida.status, "expirada")
+        self.assertEqual(na_fila.status, "pronta")
+        self.assertIn("1 reserva(s) expirada(s)", saida.getvalue())
+
+    def test_emprestimo_ignora_pronta_vencida(self):
+        emp = Emprestimo.registrar(self.outro, self.livro.pk, date.today(), date.today() + timedelta(days=7))
+
+        self.assertEqual(emp.usuario, self.outro)
+        self.vencida.refresh_from_db()
+        self.assertEqual(self.vencida.status, "expirada")
+
+    def test_emprestimo_respeita_a_proxima_da_fila(self):
+        Reserva.objects.create(livro=self.livro, usuario=self.proximo)
+
+        with self.assertRaisesMessage(Exception, "Livro reservado para retirada"):
+            Emprestimo.registrar(self.outro, self.livro.pk, date.today(), date.today() + timedelta(days=7))
+
+    def test_nova_reserva_apos_pronta_vencida(self):
+        CadastroLivroModel.objects.filter(pk=self.livro.pk).update(status="emprestado")
+        self.client.login(username="leitor", password="123")
+
+        self.client.post(reverse("livros:criar_reserva", args=[self.livro.pk]))
+
+        self.assertTrue(Reserva.objects.filter(livro=self.livro, usuario=self.leitor, status="ativa").exists())
+        self.vencida.refresh_from_db()
+        self.assertEqual(self.vencida.status, "expirada")
@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from livros.models import CadastroLivroModel, Emprestimo
+
+
+class RenovacaoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        cls.leitor = User.objects.create_user(username="leitor", password="123")
+        cls.outro = User.objects.create_user(username="outro", password="123")
+
+    def setUp(self):
+        cache.clear()
+        self.hoje = date.today()
+
+    def _emprestimo(self, usuario, prevista, renovacoes=0, devolvido=False):
+        livro = CadastroLivroModel.objects.create(nome=f"Livro {prevista}-{renovacoes}", autor="Autor", status="emprestado")
+        return Emprestimo.objects.create(
+            livro=livro, usuario=usuario, data_saida=self.hoje - timedelta(days=10),
+            data_prevista_devolucao=prevista, renovacao_count=renovacoes,
+            data_devolucao=self.hoje if devolvido else None,
+        )
+
+    def _cenario(self):
+        """Um elegível, um vencendo hoje (elegível), um atrasado, um no limite e um devolvido."""
+        return {
+            "elegivel": self._emprestimo(self.leitor, self.hoje + timedelta(days=3)),
+            "vence_hoje": self._emprestimo(self.leitor, self.hoje),
+            "atrasado": self._emprestimo(self.leitor, self.hoje - timedelta(days=1)),
+            "no_limite": self._emprestimo(self.leitor, self.hoje + timedelta(days=5), renovacoes=1),
+            "devolvido": self._emprestimo(self.leitor, self.hoje + timedelta(days=2), devolvido=True),
+        }
+
+    def test_renovaveis_segue_pode_renovar(self):
+        emprestimos = self._cenario()
+        self._emprestimo(self.outro, self.hoje + timedelta(days=3))
+
+        ids = set(Emprestimo.objects.filter(usuario=self.leitor).renovaveis().values_list("id", flat=True))
+
+        esperado = {e.pk for e in emprestimos.values() if e.pode_renovar()[0]}
+        self.assertEqual(ids, esperado)
+        self.assertEqual(ids, {emprestimos["elegivel"].pk, emprestimos["vence_hoje"].pk})
+
+    def test_renovar_todos_uma_consulta_e_um_update(self):
+        emprestimos = self._cenario()
+
+        with self.assertNumQueries(2):
+            renovados, recusados = Emprestimo.renovar_todos(self.leitor)
+
+        self.assertEqual(renovados, 2)
+        self.assertEqual({e.pk for e, _ in recusados}, {emprestimos["atrasado"].pk, emprestimos["no_limite"].pk})
+        for chave in ("elegivel", "vence_hoje"):
+            antes = emprestimos[chave]
+            depois = Emprestimo.objects.get(pk=antes.pk)
+            self.assertEqual(depois.data_prevista_devolucao, antes.data_prevista_devolucao + timedelta(days=7))
+            self.assertEqual(depois.renovacao_count, 1)
+        atrasado = Emprestimo.objects.get(pk=emprestimos["atrasado"].pk)
+        self.assertEqual(atrasado.renovacao_count, 0)
+
+    def test_renovar_de_novo_nao_passa_do_limite(self):
+        self._cenario()
+        Emprestimo.renovar_todos(self.leitor)
+
+        renovados, _ = Emprestimo.renovar_todos(self.leitor)
+
+        self.assertEqual(renovados, 0)
+        self.assertFalse(Emprestimo.objects.filter(renovacao_count__gt=1).exists())
+
+    def test_update_confere_regras_de_novo(self):
+        """Objeto desatualizado (outra requisição já renovou) não renova duas vezes."""
+        emp = self._emprestimo(self.leitor, self.hoje + timedelta(days=3))
+        obsoleto = Emprestimo.objects.get(pk=emp.pk)
+        Emprestimo.objects.get(pk=emp.pk).aplicar_renovacao()
+
+        with self.assertRaisesMessage(Exception, "alterado por outra operação"):
+            obsoleto.aplicar_renovacao()
+
+        emp.refresh_from_db()
+        self.assertEqual(emp.renovacao_count, 1)
+        self.assertEqual(emp.data_prevista_devolucao, self.hoje + timedelta(days=10))
+
+    def test_solicitar_renovacao_grava_so_as_colunas_da_renovacao(self):
+        emp = self._emprestimo(self.leitor, self.hoje + timedelta(days=3))
+        self.client.login(username="leitor", password="123")
+
+        resp = self.client.post(reverse("livros:solicitar_renovacao", args=[emp.pk]))
+
+        self.assertEqual(resp.status_code, 302)
+        emp.refresh_from_db()
+        self.assertEqual((emp.renovacao_count, emp.data_prevista_devolucao), (1, self.hoje + timedelta(days=10)))
+
+    def test_solicitar_renovacao_usa_motivo_de_pode_renovar(self):
+        emp = self._emprestimo(self.leitor, self.hoje - timedelta(days=1))
+        self.client.login(username="leitor", password="123")
+
+        resp = self.client.post(reverse("livros:solicitar_renovacao", args=[emp.pk]), follow=True)
+
+        self.assertContains(resp, "O empréstimo está atrasado e não pode ser renovado.")
+        emp.refresh_from_db()
+        self.assertEqual(emp.renovacao_count, 0)
+
+    def test_view_renovar_todos_do_proprio_usuario(self):
+        emprestimos = self._cenario()
+        do_outro = self._emprestimo(self.outro, self.hoje + timedelta(days=3))
+        self.client.login(username="leitor", password="123")
+
+        resp = self.client.post(reverse("livros:renovar_todos_emprestimos"), follow=True)
+
+        self.assertRedirects(resp, reverse("livros:minha_area_de_emprestimos"))
+        self.assertContains(resp, "2 empréstimo(s) renovado(s).")
+        self.assertEqual(Emprestimo.objects.get(pk=emprestimos["elegivel"].pk).renovacao_count, 1)
+        self.assertEqual(Emprestimo.objects.get(pk=do_outro.pk).renovacao_count, 0)
+
+    def test_view_staff_renova_por_usuario(self):
+        emp = self._emprestimo(self.leitor, self.hoje + timedelta(days=3))
+        self.client.login(username="balcao", password="123")
+
+        resp = self.client.post(reverse("livros:renovar_todos_do_usuario"), {"usuario_id": self.leitor.pk})
+
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("usuario=leitor", resp["Location"])
+        emp.refresh_from_db()
+        self.assertEqual(emp.renovacao_count, 1)
+
+    def test_view_staff_exige_staff(self):
+        emp = self._emprestimo(self.leitor, self.hoje + timedelta(days=3))
+        self.client.login(username="outro", password="123")
+
+        self.client.post(reverse("livros:renovar_todos_do_usuario"), {"usuario_id": self.leitor.pk})
+
+        emp.refresh_from_db()
+        self.assertEqual(emp.renovacao_count, 0)
@@ -0,0 +1,128 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from livros.models import CadastroLivroModel, Reserva
+
+N_LIVROS = 12
+N_FILA = 4
+N_THREADS = 9
+
+
+def _com_retentativa(operacao):
+    # SQLite em memória (cache compartilhado) recusa escrita concorrente com
+    # "table is locked"; o atomic já desfez tudo, então basta tentar de novo,
+    # como o processar_reservas faz na passada seguinte
+    for tentativa in range(50):
+        try:
+            return operacao()
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            time.sleep(0.005 * (tentativa + 1))
+    return operacao()
+
+
+class PromocaoConcorrenteTest(TransactionTestCase):
+    """Devoluções, cancelamentos e o processar_reservas mexendo nas mesmas filas ao mesmo tempo."""
+
+    def setUp(self):
+        User = get_user_model()
+        usuarios = [User.objects.create(username=f"leitor{i}") for i in range(N_FILA + 1)]
+        self.livro_ids = []
+        vencida = timezone.now() - timedelta(hours=1)
+        for i in range(N_LIVROS):
+            livro = CadastroLivroModel.objects.create(nome=f"Livro {i}", autor="Autor")
+            self.livro_ids.append(livro.pk)
+            Reserva.objects.create(livro=livro, usuario=usuarios[0], status="pronta", expira_em=vencida)
+            for usuario in usuarios[1:]:
+                Reserva.objects.create(livro=livro, usuario=usuario)
+
+    def _devolucao(self):
+        for livro_id in self.livro_ids:
+            _com_retentativa(lambda: Reserva.promover_primeiras([livro_id]))
+
+    def _processar_reservas(self):
+        for _ in range(3):
+            _com_retentativa(Reserva.expirar_vencidas)
+
+    def _cancelamento(self):
+        def cancelar_pronta(livro_id):
+            pronta = Reserva.objects.filter(livro_id=livro_id, status="pronta").first()
+            return pronta.cancelar() if pronta else False
+
+        for livro_id in self.livro_ids:
+            _com_retentativa(lambda: cancelar_pronta(livro_id))
+
+    def test_no_maximo_uma_pronta_e_fila_respeitada(self):
+        papeis = [self._devolucao, self._processar_reservas, self._cancelamento] * (N_THREADS // 3)
+        barreira = threading.Barrier(len(papeis))
+        erros = []
+
+        def executar(papel):
+            try:
+                barreira.wait()
+                papel()
+            except Exception as exc:  # noqa: BLE001 - qualquer erro reprova o teste
+                erros.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=executar, args=(p,)) for p in papeis]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(erros, [])
+        for livro_id in self.livro_ids:
+            fila = list(Reserva.objects.filter(livro_id=livro_id).order_by("criada_em", "id"))
+            prontas = [r for r in fila if r.status == "pronta"]
+            ativas = [r for r in fila if r.status == "ativa"]
+            with self.subTest(livro=livro_id):
+                self.assertLessEqual(len(prontas), 1)
+                if ativas:
+                    # ninguém fica esperando sem pronta e ninguém passou na frente
+                    self.assertEqual(len(prontas), 1)
+                    self.assertLess(fila.index(prontas[0]), fila.index(ativas[0]))
+
+
+class UmaProntaPorLivroTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.leitores = [User.objects.create(username=f"leitor{i}") for i in range(3)]
+
+    def setUp(self):
+        self.livro = CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado")
+
+    def test_constraint_recusa_segunda_pronta(self):
+        Reserva.objects.create(livro=self.livro, usuario=self.leitores[0], status="pronta")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reserva.objects.create(livro=self.livro, usuario=self.leitores[1], status="pronta")
+
+    def test_promover_de_novo_nao_cria_segunda_pronta(self):
+        primeira, segunda = (Reserva.objects.create(livro=self.livro, usuario=u) for u in self.leitores[:2])
+
+        self.assertEqual(Reserva.promover_primeiras([self.livro.pk]), [primeira.pk])
+        self.assertEqual(Reserva.promover_primeiras([self.livro.pk]), [])
+
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.status, "ativa")
+
+    def test_cancelar_pronta_passa_a_vez(self):
+        pronta = Reserva.objects.create(livro=self.livro, usuario=self.leitores[0], status="pronta")
+        proxima = Reserva.objects.create(livro=self.livro, usuario=self.leitores[1])
+
+        self.assertTrue(pronta.cancelar())
+        self.assertFalse(Reserva.objects.get(pk=pronta.pk).cancelar())
+
+        proxima.refresh_from_db()
+        self.assertEqual(proxima.status, "pronta")
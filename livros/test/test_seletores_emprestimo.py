@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from livros import busca
+from livros.models import CadastroLivroModel
+from livros.views import SELETOR_MAXIMO, SELETOR_POR_PAGINA
+
+
+class SeletoresEmprestimoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username="balcao", password="123", is_staff=True)
+        User.objects.create_user(username="maria", password="123")
+        User.objects.create_user(username="mariana", password="123")
+        User.objects.create_user(username="marcos", password="123", is_active=False)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def _livros(self, n, prefixo="Livro"):
+        for i in range(n):
+            CadastroLivroModel.objects.create(nome=f"{prefixo} {i:03d}", autor="Autor")
+
+    def test_formulario_nao_cresce_com_o_acervo(self):
+        def consultas():
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(reverse("livros:registrar_emprestimo"))
+            self.assertLessEqual(resp.content.decode().count('<option value="'), 2 * SELETOR_POR_PAGINA + 2)
+            return len(ctx.captured_queries)
+
+        self._livros(3)
+        poucos = consultas()
+        self._livros(80, prefixo="Outro")
+        self.assertEqual(consultas(), poucos)
+
+    def test_busca_de_livros_por_prefixo(self):
+        self._livros(3)
+        CadastroLivroModel.objects.create(nome="Ópera dos Mortos", autor="Autran Dourado")
+        CadastroLivroModel.objects.create(nome="Operação", autor="X", status="emprestado")
+        CadastroLivroModel.objects.create(nome="Dom Casmurro", autor="Machado", isbn="978-85-359-1066-7")
+        url = reverse("livros:buscar_livros_disponiveis")
+
+        dados = self.client.get(url, {"q": "oper"}).json()
+        self.assertEqual([r["texto"] for r in dados["resultados"]], ["Ópera dos Mortos — Autran Dourado"])
+
+        dados = self.client.get(url, {"q": "9788535910667"}).json()
+        self.assertEqual([r["texto"] for r in dados["resultados"]], ["Dom Casmurro — Machado"])
+
+    def test_livros_paginados_por_cursor(self):
+        self._livros(SELETOR_MAXIMO + 5)
+        url = reverse("livros:buscar_livros_disponiveis")
+
+        dados = self.client.get(url, {"q": "livro", "limite": 1000}).json()
+        self.assertEqual(len(dados["resultados"]), SELETOR_MAXIMO)
+
+        vistos, cursor = [], None
+        while True:
+            params = {"q": "livro", "limite": 20}
+            if cursor:
+                params["cursor"] = cursor
+            dados = self.client.get(url, params).json()
+            vistos += [r["id"] for r in dados["resultados"]]
+            cursor = dados["proximo"]
+            if not cursor:
+                break
+        self.assertEqual(len(vistos), SELETOR_MAXIMO + 5)
+        self.assertEqual(len(set(vistos)), len(vistos))
+
+    def test_busca_de_usuarios_ativos(self):
+        dados = self.client.get(reverse("livros:buscar_usuarios_ativos"), {"q": "mar"}).json()
+        self.assertEqual([r["texto"] for r in dados["resultados"]], ["maria", "mariana"])
+
+    def test_apenas_staff(self):
+        self.client.logout()
+        resp = self.client.get(reverse("livros:buscar_usuarios_ativos"), {"q": "mar"})
+        self.assertEqual(resp.status_code, 302)
+
+    def test_prefixo_usa_indice(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plano verificado apenas no SQLite")
+        qs = busca.filtrar_prefixo(CadastroLivroModel.objects.filter(status="disponivel"), "nome_normalizado", "dom")
+        self.assertIn("USING INDEX livro_status_nomenorm_idx (status=? AND nome_normalizado>? AND nome_normalizado<?)",
+                      qs.order_by("nome_normalizado", "id").explain())
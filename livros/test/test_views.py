@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # Verifique se o caminho de importação (livros.models) está correto
@@ -35,4 +37,56 @@ class HomeViewTest(TestCase):
         registros = response.context["registros"]
         
         self.assertIn(self.livro1, registros)
-        self.assertIn(self.livro2, registros)
\ No newline at end of file
+        self.assertIn(self.livro2, registros)
+
+
+class HomePaginadaTest(TestCase):
+    """Listagem do CRUD paginada, com busca/ordenação do catálogo e modo streaming."""
+
+    def setUp(self):
+        for i in range(120):
+            CadastroLivroModel.objects.create(
+                nome=f"Livro {i:03d}", autor="Autor Par" if i % 2 == 0 else "Autor Impar",
+                status="disponivel" if i % 3 else "emprestado",
+            )
+
+    def test_pagina_limitada(self):
+        response = self.client.get(reverse("livros:home1"))
+        page = response.context["registros"]
+        self.assertEqual(len(page), 50)
+        self.assertEqual(page.paginator.count, 120)
+        self.assertEqual(page[0].nome, "Livro 000")
+
+    def test_busca_e_ordenacao_compartilhadas_com_catalogo(self):
+        response = self.client.get(reverse("livros:home1"), {
+            "q": "impar", "apenas_disponiveis": "on", "ordenar": "nome_za",
+        })
+        nomes = [l.nome for l in response.context["registros"]]
+        esperados = [
+            f"Livro {i:03d}" for i in reversed(range(120)) if i % 2 and i % 3
+        ][:50]
+        self.assertEqual(nomes, esperados)
+        self.assertIn("q=impar", response.context["querystring"])
+
+    def test_inventario_streaming(self):
+        response = self.client.get(reverse("livros:home1"), {"formato": "stream"})
+        self.assertTrue(response.streaming)
+        conteudo = b"".join(response.streaming_content).decode()
+        self.assertEqual(conteudo.count("<tr><td>"), 120)
+        self.assertLess(conteudo.index("Livro 000"), conteudo.index("Livro 119"))
+        self.assertIn("</html>", conteudo)
+
+    def test_busca_do_crud_e_do_inventario_roda_match_uma_vez(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("índice manual só existe no SQLite")
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("livros:home1"), {"q": "impar"})
+            self.assertEqual(response.context["registros"].paginator.count, 60)
+            response = self.client.get(reverse("livros:home1"), {"q": "impar", "formato": "stream"})
+            conteudo = b"".join(response.streaming_content).decode()
+            self.assertEqual(conteudo.count("<tr><td>"), 60)
+
+        com_busca = [c["sql"] for c in consultas if "MATCH" in c["sql"]]
+        self.assertEqual(len(com_busca), 3)  # COUNT e página do CRUD, inventário
+        for sql in com_busca:
+            self.assertEqual(sql.count("MATCH"), 1, sql)
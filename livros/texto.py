@@ -0,0 +1,14 @@
+import unicodedata
+
+
+def normalizar(texto):
+    """
+    Forma canônica para busca: sem acentos, casefold e espaços colapsados.
+    "  São  JOÃO " -> "sao joao"
+    """
+    if not texto:
+        return ""
+    if not texto.isascii():
+        decomposto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
@@ -0,0 +1,170 @@
+"""
+Busca aproximada (tolerante a erros de digitação) por trigramas.
+
+Cada livro é decomposto em trigramas no estilo do pg_trgm (cada palavra
+com dois espaços antes e um depois) e gravado em ``TrigramaLivro``, junto
+com o número de trigramas do seu campo mais curto. Na busca, os trigramas
+do texto digitado viram um único ``GROUP BY`` indexado que traz os
+candidatos com mais trigramas em comum; a similaridade final (Jaccard
+contra o título e contra o autor) é calculada só para esses candidatos.
+
+O custo do ``GROUP BY`` segue o tamanho das listas de trigramas lidas, e
+poucos trigramas muito comuns ("  a", "a  "...) respondem pela maior parte
+delas. Por isso só a metade mais rara dos trigramas da consulta é lida
+com certeza; os demais entram apenas se a lista tiver até ``LIMITE_LISTA``
+livros, e o mínimo em comum cai na mesma medida. É uma aproximação: um
+livro parecido só pelos trigramas comuns pode ficar de fora, mas esses são
+os de menor similaridade. Livros cujos campos são compridos demais para
+chegar ao limiar são descartados pelo índice antes de contar.
+"""
+import math
+import re
+import time
+
+from django.db import connection
+from django.db.models import Count, FloatField, Min, Value
+from django.db.models.expressions import RawSQL
+
+from .models import CadastroLivroModel, TrigramaLivro
+from .texto import normalizar
+
+LIMIAR_SIMILARIDADE = 0.3   # mesmo padrão do pg_trgm
+MAX_CANDIDATOS = 200
+LIMITE_LISTA = 5_000        # listas maiores ficam fora da contagem (ver acima)
+
+# Frequência de cada trigrama (tamanho da sua lista), guardada no processo:
+# só decide quais listas ler, então um valor desatualizado não muda o
+# resultado e não vale a ida a um cache compartilhado.
+TEMPO_FREQUENCIA = 60 * 60
+_frequencias = {}   # trigrama -> (livros, expira_em)
+
+
+def trigramas(texto):
+    resultado = set()
+    for palavra in re.findall(r"\w+", normalizar(texto)):
+        p = f"  {palavra} "
+        resultado.update(p[i:i + 3] for i in range(len(p) - 2))
+    return resultado
+
+
+def similaridade(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def linhas_do_livro(livro):
+    """Linhas de ``TrigramaLivro`` de ``livro``, com o tamanho do campo mais curto."""
+    campos = [t for t in (trigramas(livro.nome_normalizado), trigramas(livro.autor_normalizado)) if t]
+    if not campos:
+        return []
+    tamanho = min(len(t) for t in campos)
+    return [TrigramaLivro(trigrama=t, livro_id=livro.pk, tamanho=tamanho) for t in set().union(*campos)]
+
+
+def indexar_livro(livro):
+    TrigramaLivro.objects.filter(livro_id=livro.pk).delete()
+    TrigramaLivro.objects.bulk_create(linhas_do_livro(livro))
+
+
+def reindexar_livros(livros):
+    """Refaz as linhas de ``livros`` (já carregados) em um DELETE e um INSERT em lote."""
+    TrigramaLivro.objects.filter(livro_id__in=[l.pk for l in livros]).delete()
+    TrigramaLivro.objects.bulk_create([t for l in livros for t in linhas_do_livro(l)], batch_size=5000)
+    _frequencias.clear()
+
+
+def reconstruir_indice(livros, tamanho_lote=1000):
+    """Recria o índice inteiro a partir de ``livros`` (queryset). Retorna o total indexado."""
+    TrigramaLivro.objects.all().delete()
+    _frequencias.clear()
+    total = 0
+    lote = []
+    for livro in livros.only("id", "nome_normalizado", "autor_normalizado").iterator(chunk_size=tamanho_lote):
+        lote.extend(linhas_do_livro(livro))
+        total += 1
+        if len(lote) >= tamanho_lote * 20:
+            TrigramaLivro.objects.bulk_create(lote, batch_size=5000)
+            lote = []
+    if lote:
+        TrigramaLivro.objects.bulk_create(lote, batch_size=5000)
+    return total
+
+
+def frequencias(alvo):
+    """``{trigrama: livros que o contêm}``; o que não está guardado sai de uma única consulta."""
+    agora = time.monotonic()
+    freq, faltando = {}, []
+    for t in alvo:
+        n, expira_em = _frequencias.get(t, (0, 0))
+        if expira_em > agora:
+            freq[t] = n
+        else:
+            faltando.append(t)
+    if faltando:
+        contagem = dict(
+            TrigramaLivro.objects.filter(trigrama__in=faltando)
+            .values("trigrama").annotate(n=Count("id")).values_list("trigrama", "n")
+        )
+        for t in faltando:
+            freq[t] = contagem.get(t, 0)
+            _frequencias[t] = (freq[t], agora + TEMPO_FREQUENCIA)
+    return freq
+
+
+def candidatos(q, limiar=LIMIAR_SIMILARIDADE):
+    """
+    Livros com trigramas suficientes em comum com ``q``, com a similaridade
+    de cada um: ``{livro_id: score}``.
+    """
+    alvo = trigramas(q)
+    if not alvo:
+        return {}
+
+    # Jaccard >= limiar exige pelo menos limiar * |alvo| trigramas em comum
+    # contra um campo de no máximo |alvo| / limiar trigramas
+    minimo = max(1, math.ceil(limiar * len(alvo)))
+    maior_campo = math.floor(len(alvo) / limiar)
+
+    # as listas mais longas saem da contagem, mas a metade mais rara fica
+    freq = frequencias(alvo)
+    lidos = sorted(alvo, key=lambda t: (freq[t], t))
+    while len(lidos) > math.ceil(len(alvo) / 2) and freq[lidos[-1]] > LIMITE_LISTA:
+        lidos.pop()
+    pulados = len(alvo) - len(lidos)
+
+    ids = list(
+        TrigramaLivro.objects
+        .filter(trigrama__in=lidos, tamanho__lte=maior_campo)
+        .values("livro_id")
+        .annotate(comuns=Count("id"), menor_campo=Min("tamanho"))
+        .filter(comuns__gte=max(1, minimo - pulados))
+        # com o mesmo número em comum, o campo mais curto tem Jaccard maior
+        .order_by("-comuns", "menor_campo", "livro_id")
+        .values_list("livro_id", flat=True)[:MAX_CANDIDATOS]
+    )
+    if not ids:
+        return {}
+
+    scores = {}
+    textos = CadastroLivroModel.objects.filter(id__in=ids).values_list("id", "nome_normalizado", "autor_normalizado")
+    for pk, nome, autor in textos:
+        score = max(similaridade(alvo, trigramas(nome)), similaridade(alvo, trigramas(autor)))
+        if score >= limiar:
+            scores[pk] = score
+    return scores
+
+
+def filtrar(qs, q, limiar=LIMIAR_SIMILARIDADE):
+    """Filtra ``qs`` pelos livros similares a ``q`` e anota ``relevancia`` (0..1)."""
+    scores = candidatos(q, limiar)
+    if not scores:
+        return qs.none().annotate(relevancia=Value(0.0, output_field=FloatField()))
+    # um CASE só, com parâmetros: montar centenas de When custa mais que a busca
+    coluna = f"{connection.ops.quote_name(qs.model._meta.db_table)}.{connection.ops.quote_name('id')}"
+    relevancia = RawSQL(
+        f"CASE {coluna} {' '.join(['WHEN %s THEN %s'] * len(scores))} ELSE 0.0 END",
+        [v for item in scores.items() for v in item],
+        output_field=FloatField(),
+    )
+    return qs.filter(id__in=list(scores)).annotate(relevancia=relevancia)
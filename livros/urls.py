@@ -7,19 +7,27 @@ urlpatterns = [
     # Catálogo
     path("", views.catalogo, name="catalogo"),
     path("home/", views.home, name="home1"),
+    path("autocompletar/", views.autocompletar_livros, name="autocompletar"),
 
     # CRUD de livros
     path("cadastrar/", views.cadastrar_livro, name="cadastrar_livro"),
     path("editar/<int:id>/", views.editar_livro, name="editar_livro"),
     path("remover/<int:id>/", views.remover_livro, name="remover_livro"),
+    path("isbn/<str:codigo>/", views.livro_por_isbn, name="livro_por_isbn"),
 
     # Empréstimos
     path("emprestimos/", views.emprestimos_list, name="emprestimos_list"),
     path("emprestimos/novo/", views.registrar_emprestimo, name="registrar_emprestimo"),
+    path("emprestimos/lote/", views.registrar_emprestimos_em_lote, name="registrar_emprestimos_em_lote"),
+    path("emprestimos/busca/livros/", views.buscar_livros_disponiveis, name="buscar_livros_disponiveis"),
+    path("emprestimos/busca/usuarios/", views.buscar_usuarios_ativos, name="buscar_usuarios_ativos"),
     path("emprestimos/devolver/<int:pk>/", views.registrar_devolucao, name="registrar_devolucao"),
+    path("emprestimos/devolver/lote/", views.registrar_devolucoes_em_lote, name="registrar_devolucoes_em_lote"),
     path("emprestimos/quitar/<int:pk>/", views.quitar_multa, name="quitar_multa"),  # 🔥 NOVA ROTA DA HISTÓRIA 6
     path('emprestimos/meus/', views.minha_area_de_emprestimos, name='minha_area_de_emprestimos'),
     path('emprestimos/<int:emprestimo_id>/renovar/', views.solicitar_renovacao, name='solicitar_renovacao'),
+    path('emprestimos/renovar/todos/', views.renovar_todos_emprestimos, name='renovar_todos_emprestimos'),
+    path('emprestimos/renovar/usuario/', views.renovar_todos_do_usuario, name='renovar_todos_do_usuario'),
 
     # Reservas
     path("reservas/", views.minhas_reservas, name="minhas_reservas"),
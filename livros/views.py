@@ -1,102 +1,199 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils import timezone
-from django.db import IntegrityError
 from django.contrib.auth import get_user_model
 from django import forms
-from django.db.models import Q, Count
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.core.paginator import Paginator
+from django.urls import reverse
 
-from .models import CadastroLivroModel, Emprestimo, Reserva
+from .models import CadastroLivroModel, Emprestimo, EmprestimoRecusado, PerfilCirculacao, Reserva
+from . import autocompletar, busca, facetas, paginacao, painel, trigramas
+from .isbn import normalizar_isbn
+from .texto import normalizar
 
 from datetime import timedelta, datetime
 import csv
+import json
+from urllib.parse import urlencode
 
 
 # --------- Form para cadastrar/editar livros ---------
 class LivroForm(forms.ModelForm):
     class Meta:
         model = CadastroLivroModel
-        fields = ["nome", "autor", "completo"]
+        fields = ["nome", "autor", "isbn", "completo"]
         labels = {
             "nome": "Nome do livro",
             "autor": "Autor(a)",
+            "isbn": "ISBN",
             "completo": "Edição integral (obra completa)",
         }
+        widgets = {"isbn": forms.TextInput()}
+
+    def clean_isbn(self):
+        # ISBN repetido é recusado em CadastroLivroModel.clean()
+        return (self.cleaned_data.get("isbn") or "").strip() or None
 
 
 # --------- Catálogo com busca/filtro/ordenação/paginação ---------
-def catalogo(request):
-    # 1) Coletar parâmetros
+# ordena pelas colunas normalizadas: "Érico" fica junto de "Erico", não depois do "Z"
+ordering_map = {
+    "nome_az": "nome_normalizado",
+    "nome_za": "-nome_normalizado",
+    "autor_az": "autor_normalizado",
+    "autor_za": "-autor_normalizado",
+}
+
+
+def _filtros_livros(request):
+    """
+    Lê busca/filtro/ordenação da querystring e monta o queryset de livros.
+    Compartilhado pelo catálogo e pela listagem do CRUD.
+    """
     q = (request.GET.get("q") or "").strip()
     apenas_disponiveis = (request.GET.get("apenas_disponiveis") in ("1", "true", "on"))
-    ordenar = request.GET.get("ordenar", "nome_az")  # nome_az|nome_za|autor_az|autor_za
-    page = request.GET.get("page")
+    # relevancia|nome_az|nome_za|autor_az|autor_za (relevância é o padrão quando há busca)
+    ordenar = request.GET.get("ordenar") or ("relevancia" if q else "nome_az")
 
-    # 2) Montar queryset
     qs = CadastroLivroModel.objects.all()
 
+    # modo=aproximado -> tolera erros de digitação (índice de trigramas)
+    aproximado = request.GET.get("modo") == "aproximado"
     if q:
-        qs = qs.filter(Q(nome__icontains=q) | Q(autor__icontains=q))
+        qs = trigramas.filtrar(qs, q) if aproximado else busca.filtrar(qs, q)
 
     if apenas_disponiveis:
-        qs = qs.filter(status__iexact="disponivel")
+        qs = qs.filter(status="disponivel")
+
+    # Preservar filtros na paginação
+    params = request.GET.copy()
+    params.pop("page", None)
+    params.pop("cursor", None)
 
-    ordering_map = {
-        "nome_az": "nome",
-        "nome_za": "-nome",
-        "autor_az": "autor",
-        "autor_za": "-autor",
+    return qs, {
+        "q": q,
+        "ordenar": ordenar,
+        "apenas_disponiveis": apenas_disponiveis,
+        "aproximado": aproximado,
+        "querystring": params.urlencode(),
     }
-    qs = qs.order_by(ordering_map.get(ordenar, "nome"))
 
-    # 3) Paginação
-    paginator = Paginator(qs, 20)  # 20 por página
-    page_obj = paginator.get_page(page)
 
-    # 4) Preservar filtros na paginação
-    params = request.GET.copy()
-    params.pop("page", None)
-    querystring = params.urlencode()
+def _ordenar_livros(qs, ordenar):
+    if ordenar == "relevancia" and "relevancia" in qs.query.annotations:
+        return qs.order_by("-relevancia", "nome_normalizado", "id")
+    ordem = ordering_map.get(ordenar, "nome_normalizado")
+    return qs.order_by(ordem, ("-id" if ordem.startswith("-") else "id"))
+
+
+def catalogo(request):
+    # 1) Parâmetros + queryset filtrado
+    qs, filtros = _filtros_livros(request)
+    ordenar = filtros["ordenar"]
+    page = request.GET.get("page")
+    # paginacao=cursor -> paginação por chave (sem COUNT/OFFSET); não vale para relevância
+    por_cursor = request.GET.get("paginacao") == "cursor" and ordenar != "relevancia"
+
+    # 2) Ordenação + paginação
+    if por_cursor:
+        page_obj = paginacao.paginar_por_cursor(
+            qs, ordering_map.get(ordenar, "nome_normalizado"), request.GET.get("cursor"), por_pagina=20
+        )
+        if request.GET.get("total") != "0":
+            page_obj.total_aproximado = paginacao.total_aproximado(qs, filtros["querystring"])
+    else:
+        paginator = Paginator(_ordenar_livros(qs, ordenar), 20)  # 20 por página
+        page_obj = paginator.get_page(page)
+
+    # 3) Facetas (uma consulta agrupada, em cache por alguns segundos; facetas=0 desliga)
+    facetas_ctx = None
+    if request.GET.get("facetas") != "0":
+        facetas_ctx = facetas.calcular(
+            qs, facetas.chave_cache(filtros["q"], filtros["apenas_disponiveis"], filtros["aproximado"])
+        )
 
     ctx = {
         "livros": page_obj,                # iterável no template
         "page_obj": page_obj,              # controle de paginação
-        "q": q,
-        "ordenar": ordenar,
-        "apenas_disponiveis": apenas_disponiveis,
-        "querystring": querystring,
+        "por_cursor": por_cursor,
+        "facetas": facetas_ctx,
+        **filtros,
     }
     return render(request, "livros/lista.html", ctx)
 
 
+def autocompletar_livros(request):
+    """Sugestões de título/autor para o campo de busca (JSON)."""
+    q = (request.GET.get("q") or "").strip()
+    try:
+        limite = int(request.GET.get("limite", autocompletar.LIMITE_PADRAO))
+    except ValueError:
+        limite = autocompletar.LIMITE_PADRAO
+    limite = max(1, min(limite, autocompletar.LIMITE_MAXIMO))
+    return JsonResponse({"q": q, "sugestoes": autocompletar.sugerir(q, limite)})
+
+
 # --------- Home / Dashboard ---------
 def homepage(request):
-    # números rápidos
-    total = CadastroLivroModel.objects.count()
-    disponiveis = CadastroLivroModel.objects.filter(status__iexact="disponivel").count()
-    emprestados = CadastroLivroModel.objects.filter(status__iexact="emprestado").count()
+    # números rápidos (cache mantido pelos signals; ver livros/painel.py)
+    ctx = painel.contadores()
 
     # últimos livros cadastrados (5)
-    recentes = CadastroLivroModel.objects.order_by("-id")[:5]
+    ctx["recentes"] = painel.recentes()
 
-    ctx = {
-        "total": total,
-        "disponiveis": disponiveis,
-        "emprestados": emprestados,
-        "recentes": recentes,
-    }
     return render(request, "home.html", ctx)
 
 
 # ------------------ CRUD de Livros -------------------
 def home(request):
-    ctx = {"registros": CadastroLivroModel.objects.all()}
+    qs, filtros = _filtros_livros(request)
+    qs = _ordenar_livros(qs, filtros["ordenar"])
+
+    # formato=stream -> inventário completo renderizado em blocos
+    if request.GET.get("formato") == "stream":
+        return _inventario_streaming(qs)
+
+    page_obj = Paginator(qs, 50).get_page(request.GET.get("page"))
+    ctx = {
+        "registros": page_obj,
+        "page_obj": page_obj,
+        **filtros,
+    }
     return render(request, "crud/inicial.html", ctx)
 
 
+MARCADOR_LINHAS = "<!--linhas-->"
+
+
+def _inventario_streaming(qs, tamanho_bloco=500):
+    """
+    Inventário completo sem materializar o queryset: o banco é lido com
+    iterator() e cada bloco de linhas é renderizado e enviado em seguida.
+    """
+    pagina = render_to_string("crud/inventario.html", {"marcador": mark_safe(MARCADOR_LINHAS)})
+    inicio, fim = pagina.split(MARCADOR_LINHAS)
+    template_linhas = get_template("crud/_inventario_linhas.html")
+
+    def gerar():
+        yield inicio
+        bloco = []
+        for livro in qs.iterator(chunk_size=tamanho_bloco):
+            bloco.append(livro)
+            if len(bloco) == tamanho_bloco:
+                yield template_linhas.render({"registros": bloco})
+                bloco = []
+        if bloco:
+            yield template_linhas.render({"registros": bloco})
+        yield fim
+
+    return StreamingHttpResponse(gerar(), content_type="text/html; charset=utf-8")
+
+
 def cadastrar_livro(request):
     if request.method == "POST":
         form = LivroForm(request.POST)
@@ -131,32 +228,215 @@ def is_admin(user):
     return user.is_staff or user.is_superuser
 
 
+@login_required
+@user_passes_test(is_admin)
+def livro_por_isbn(request, codigo):
+    """
+    Resolve o código lido no balcão (ISBN-10/13 ou EAN) para o livro e a sua
+    situação de circulação — empréstimo ativo e fila de reservas — em uma consulta.
+    """
+    isbn = normalizar_isbn(codigo)
+    if not isbn:
+        return JsonResponse({"erro": "ISBN inválido"}, status=400)
+
+    emprestimo_ativo = Emprestimo.objects.filter(livro=OuterRef("pk"), data_devolucao__isnull=True)
+    reserva_pronta = (
+        Reserva.objects.filter(livro=OuterRef("pk"), status="pronta", expira_em__gte=timezone.now())
+        .order_by("criada_em")
+    )
+    fila = (
+        Reserva.objects.filter(livro=OuterRef("pk"), status="ativa")
+        .order_by().values("livro").annotate(n=Count("id")).values("n")
+    )
+    livro = (
+        CadastroLivroModel.objects.filter(isbn_normalizado=isbn)
+        .annotate(
+            emprestimo_id=Subquery(emprestimo_ativo.values("id")[:1]),
+            emprestimo_usuario=Subquery(emprestimo_ativo.values("usuario__username")[:1]),
+            emprestimo_prevista=Subquery(emprestimo_ativo.values("data_prevista_devolucao")[:1]),
+            reserva_pronta_id=Subquery(reserva_pronta.values("id")[:1]),
+            reserva_pronta_usuario=Subquery(reserva_pronta.values("usuario__username")[:1]),
+            reservas_na_fila=Subquery(fila),
+        )
+        .values(
+            "id", "nome", "autor", "isbn", "isbn_normalizado", "status",
+            "emprestimo_id", "emprestimo_usuario", "emprestimo_prevista",
+            "reserva_pronta_id", "reserva_pronta_usuario", "reservas_na_fila",
+        )
+        .first()
+    )
+    if livro is None:
+        return JsonResponse({"erro": "Livro não encontrado", "isbn": isbn}, status=404)
+
+    return JsonResponse({
+        "livro": {k: livro[k] for k in ("id", "nome", "autor", "isbn", "status")},
+        "isbn": livro["isbn_normalizado"],
+        "emprestimo": {
+            "id": livro["emprestimo_id"],
+            "usuario": livro["emprestimo_usuario"],
+            "data_prevista_devolucao": livro["emprestimo_prevista"],
+        } if livro["emprestimo_id"] else None,
+        "reserva_pronta": {
+            "id": livro["reserva_pronta_id"],
+            "usuario": livro["reserva_pronta_usuario"],
+        } if livro["reserva_pronta_id"] else None,
+        "reservas_na_fila": livro["reservas_na_fila"] or 0,
+    })
+
+
 def usuario_bloqueado(usuario):
     """
     Retorna True se o usuário tiver alguma multa em aberto.
-    Critério: existe empréstimo com multa > 0 e multa não paga.
+    Critério: empréstimo com multa > 0 e multa não paga, contado no
+    PerfilCirculacao do usuário (leitura pela chave primária).
     """
-    return Emprestimo.objects.filter(
-        usuario=usuario,
-        multa_valor__gt=0,
-        multa_paga=False
-    ).exists()
+    return PerfilCirculacao.objects.filter(pk=usuario.pk, multas_pendentes__gt=0).exists()
+
+
+SITUACOES_EMPRESTIMO = (
+    ("", "Todos"),
+    ("ativos", "Ativos"),
+    ("atrasados", "Atrasados"),
+    ("devolvidos", "Devolvidos"),
+)
+
+
+def _filtros_emprestimos(request):
+    """
+    Lê os filtros da lista de empréstimos (situação, multa pendente, usuário,
+    livro e período de saída) e monta o queryset. Cada filtro tem índice:
+    emprestimo_devol_prev_idx, emprestimo_multa_aberta_idx (parcial, só multas
+    em aberto) e emprestimo_data_saida_idx.
+    """
+    situacao = request.GET.get("situacao") or ""
+    multa_pendente = request.GET.get("multa") == "pendente"
+    usuario = (request.GET.get("usuario") or "").strip()
+    livro = (request.GET.get("livro") or "").strip()
+    de = _parse_data(request.GET.get("de") or "")
+    ate = _parse_data(request.GET.get("ate") or "")
+
+    qs = Emprestimo.objects.com_atraso()
+    if situacao == "ativos":
+        qs = qs.filter(data_devolucao__isnull=True)
+    elif situacao == "atrasados":
+        qs = qs.atrasados()
+    elif situacao == "devolvidos":
+        qs = qs.filter(data_devolucao__isnull=False)
+    if multa_pendente:
+        qs = qs.filter(multa_paga=False, multa_valor__gt=0)
+    if usuario:
+        qs = busca.filtrar_prefixo(qs, "usuario__username", usuario)
+    if livro:
+        qs = busca.filtrar_prefixo(qs, "livro__nome_normalizado", normalizar(livro))
+    if de:
+        qs = qs.filter(data_saida__gte=de)
+    if ate:
+        qs = qs.filter(data_saida__lte=ate)
+
+    params = request.GET.copy()
+    params.pop("page", None)
+
+    return qs, {
+        "situacao": situacao,
+        "situacoes": SITUACOES_EMPRESTIMO,
+        "multa_pendente": multa_pendente,
+        "usuario": usuario,
+        "livro": livro,
+        "de": de,
+        "ate": ate,
+        "querystring": params.urlencode(),
+    }
 
 
 @login_required
 @user_passes_test(is_admin)
 def emprestimos_list(request):
-    qs = Emprestimo.objects.select_related("livro", "usuario").order_by("-id")
-    return render(request, "emprestimos/list.html", {"emprestimos": qs})
+    qs, filtros = _filtros_emprestimos(request)
+    # ativos/atrasados na ordem do vencimento (índice); histórico do mais recente
+    if filtros["situacao"] in ("ativos", "atrasados"):
+        qs = qs.order_by("data_prevista_devolucao", "id")
+    else:
+        qs = qs.order_by("-id")
+    qs = qs.select_related("livro", "usuario")
+
+    # o filtro é por prefixo: renovar em lote só quando ele aponta um único usuário
+    usuario_renovacao = None
+    if filtros["usuario"]:
+        usuarios = get_user_model().objects.only("id", "username")
+        encontrados = list(busca.filtrar_prefixo(usuarios, "username", filtros["usuario"])[:2])
+        if len(encontrados) == 1:
+            usuario_renovacao = encontrados[0]
+
+    page_obj = Paginator(qs, 50).get_page(request.GET.get("page"))
+    return render(request, "emprestimos/list.html", {
+        "emprestimos": page_obj,
+        "page_obj": page_obj,
+        "usuario_renovacao": usuario_renovacao,
+        **filtros,
+    })
+
+
+# --------- Seletores do balcão (livro/usuário) ---------
+SELETOR_POR_PAGINA = 20
+SELETOR_MAXIMO = 50
+
+
+def _livros_para_emprestimo(q="", cursor=None, por_pagina=SELETOR_POR_PAGINA):
+    """Livros disponíveis cujo título começa com ``q`` (ou com o ISBN ``q``), paginados por cursor."""
+    qs = CadastroLivroModel.objects.filter(status="disponivel").only("id", "nome", "autor", "nome_normalizado")
+    isbn = normalizar_isbn(q)
+    if isbn:
+        qs = qs.filter(isbn_normalizado=isbn)
+    else:
+        qs = busca.filtrar_prefixo(qs, "nome_normalizado", normalizar(q))
+    return paginacao.paginar_por_cursor(qs, "nome_normalizado", cursor, por_pagina)
+
+
+def _usuarios_para_emprestimo(q="", cursor=None, por_pagina=SELETOR_POR_PAGINA):
+    """Usuários ativos cujo username começa com ``q``, paginados por cursor."""
+    qs = get_user_model().objects.filter(is_active=True).only("id", "username")
+    qs = busca.filtrar_prefixo(qs, "username", q)
+    return paginacao.paginar_por_cursor(qs, "username", cursor, por_pagina)
+
+
+def _resposta_seletor(request, buscar, texto):
+    q = (request.GET.get("q") or "").strip()
+    try:
+        por_pagina = int(request.GET.get("limite", SELETOR_POR_PAGINA))
+    except ValueError:
+        por_pagina = SELETOR_POR_PAGINA
+    por_pagina = max(1, min(por_pagina, SELETOR_MAXIMO))
+    pagina = buscar(q, request.GET.get("cursor"), por_pagina)
+    return JsonResponse({
+        "q": q,
+        "resultados": [{"id": obj.pk, "texto": texto(obj)} for obj in pagina],
+        "proximo": pagina.cursor_proximo,
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def buscar_livros_disponiveis(request):
+    """JSON para o seletor de livro do empréstimo: prefixo do título ou ISBN."""
+    return _resposta_seletor(request, _livros_para_emprestimo, lambda l: f"{l.nome} — {l.autor}")
+
+
+@login_required
+@user_passes_test(is_admin)
+def buscar_usuarios_ativos(request):
+    """JSON para o seletor de usuário do empréstimo: prefixo do username."""
+    return _resposta_seletor(request, _usuarios_para_emprestimo, lambda u: u.username)
 
 
 @login_required
 @user_passes_test(is_admin)
 def registrar_emprestimo(request):
     if request.method == "GET":
-        livros = CadastroLivroModel.objects.all().order_by("nome")
-        usuarios = get_user_model().objects.filter(is_active=True).order_by("username")
-        return render(request, "emprestimos/novo.html", {"livros": livros, "usuarios": usuarios})
+        # só a primeira página de cada seletor; o resto vem da busca (JSON)
+        return render(request, "emprestimos/novo.html", {
+            "livros": _livros_para_emprestimo(),
+            "usuarios": _usuarios_para_emprestimo(),
+        })
 
     livro_id = request.POST.get("livro_id", "").strip()
     usuario_id = request.POST.get("usuario_id", "").strip()
@@ -175,21 +455,6 @@ def registrar_emprestimo(request):
         messages.error(request, "Empréstimo bloqueado: pendência de multa.")
         return redirect("livros:registrar_emprestimo")
 
-    try:
-        livro = CadastroLivroModel.objects.get(pk=livro_id)
-    except (CadastroLivroModel.DoesNotExist, ValueError):
-        messages.error(request, "Livro inválido")
-        return redirect("livros:registrar_emprestimo")
-
-    res_pronta = Reserva.objects.filter(livro=livro, status='pronta').order_by('criada_em').first()
-    if res_pronta and res_pronta.usuario_id != usuario.id:
-        messages.error(request, "Livro reservado para retirada")
-        return redirect("livros:registrar_emprestimo")
-
-    if getattr(livro, "status", "disponivel") != "disponivel":
-        messages.error(request, "Livro indisponível para empréstimo")
-        return redirect("livros:registrar_emprestimo")
-
     try:
         y1, m1, d1 = [int(x) for x in data_saida.split("-")]
         y2, m2, d2 = [int(x) for x in data_prevista.split("-")]
@@ -200,25 +465,77 @@ def registrar_emprestimo(request):
         return redirect("livros:registrar_emprestimo")
 
     try:
-        Emprestimo.objects.create(
-            livro=livro, usuario=usuario,
-            data_saida=data_saida_dt, data_prevista_devolucao=data_prevista_dt
-        )
-    except IntegrityError:
-        messages.error(request, "Livro indisponível para empréstimo")
+        livro_pk = int(livro_id)
+    except ValueError:
+        messages.error(request, "Livro inválido")
         return redirect("livros:registrar_emprestimo")
 
-    if hasattr(livro, "status"):
-        livro.status = "emprestado"
-        livro.save(update_fields=["status"])
-
-    if res_pronta and res_pronta.usuario_id == usuario.id:
-        res_pronta.concluir()
+    try:
+        Emprestimo.registrar(usuario, livro_pk, data_saida_dt, data_prevista_dt)
+    except EmprestimoRecusado as exc:
+        messages.error(request, str(exc))
+        return redirect("livros:registrar_emprestimo")
 
     messages.success(request, "Empréstimo registrado com sucesso")
     return redirect("livros:emprestimos_list")
 
 
+LIMITE_LOTE_EMPRESTIMO = 200
+
+
+@login_required
+@user_passes_test(is_admin)
+def registrar_emprestimos_em_lote(request):
+    """
+    API de empréstimo em lote para o balcão (POST, JSON ou formulário):
+    ``usuario_id``, ``livro_ids`` (lista), ``data_prevista_devolucao`` e,
+    opcionalmente, ``data_saida`` (padrão: hoje). Responde com os empréstimos
+    criados e, por item, os livros recusados e o motivo.
+    """
+    if request.method != "POST":
+        return JsonResponse({"erro": "Use POST"}, status=405)
+
+    if request.content_type == "application/json":
+        try:
+            dados = json.loads(request.body or b"{}")
+        except ValueError:
+            dados = None
+        if not isinstance(dados, dict) or not isinstance(dados.get("livro_ids", []), list):
+            return JsonResponse({"erro": "JSON inválido"}, status=400)
+        livro_ids = dados.get("livro_ids", [])
+    else:
+        dados = request.POST
+        livro_ids = request.POST.getlist("livro_ids")
+
+    if not livro_ids:
+        return JsonResponse({"erro": "Informe ao menos um livro"}, status=400)
+    if len(livro_ids) > LIMITE_LOTE_EMPRESTIMO:
+        return JsonResponse({"erro": f"No máximo {LIMITE_LOTE_EMPRESTIMO} livros por lote"}, status=400)
+
+    data_saida = str(dados.get("data_saida") or "").strip()
+    data_saida_dt = _parse_data(data_saida) if data_saida else timezone.localdate()
+    data_prevista_dt = _parse_data(str(dados.get("data_prevista_devolucao") or "").strip())
+    if not data_saida_dt or not data_prevista_dt:
+        return JsonResponse({"erro": "Datas inválidas. Use YYYY-MM-DD."}, status=400)
+
+    usuario = None
+    try:
+        usuario = get_user_model().objects.filter(pk=int(dados.get("usuario_id")), is_active=True).first()
+    except (TypeError, ValueError):
+        pass
+    if usuario is None:
+        return JsonResponse({"erro": "Usuário inexistente"}, status=400)
+
+    if usuario_bloqueado(usuario):
+        return JsonResponse({"erro": "Empréstimo bloqueado: pendência de multa."}, status=403)
+
+    emprestimos, falhas = Emprestimo.registrar_em_lote(usuario, livro_ids, data_saida_dt, data_prevista_dt)
+    return JsonResponse({
+        "emprestimos": [{"id": e.pk, "livro_id": e.livro_id} for e in emprestimos],
+        "falhas": falhas,
+    })
+
+
 @login_required
 @user_passes_test(is_admin)
 def registrar_devolucao(request, pk: int):
@@ -234,13 +551,18 @@ def registrar_devolucao(request, pk: int):
         messages.error(request, "Data inválida. Use YYYY-MM-DD.")
         return redirect("livros:registrar_devolucao", pk=emp.pk)
 
-    atraso = emp.registrar_devolucao(data_dev_dt)
+    try:
+        atraso = emp.registrar_devolucao(data_dev_dt)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect("livros:emprestimos_list")
 
     # Lógica da multa (História 6)
     if emp.multa_valor > 0:
         messages.warning(
             request,
             f"Multa aplicada por atraso: R$ {emp.multa_valor:.2f}"
+            + (f" (R$ {emp.multa_quitada:.2f} já pago)" if emp.multa_quitada else "")
         )
     elif atraso > 0:
         messages.warning(request, "Devolução em atraso registrada, sem multa por carência.")
@@ -250,6 +572,49 @@ def registrar_devolucao(request, pk: int):
     return redirect("livros:emprestimos_list")
 
 
+@login_required
+@user_passes_test(is_admin)
+def registrar_devolucoes_em_lote(request):
+    """
+    Devolução em lote (caixa de devolução): marca os empréstimos escolhidos e
+    registra todos com a mesma data em uma só operação.
+    """
+    if request.method == "GET":
+        ativos = (
+            Emprestimo.objects.filter(data_devolucao__isnull=True)
+            .select_related("livro", "usuario")
+            .order_by("data_prevista_devolucao", "id")
+        )
+        page_obj = Paginator(ativos, 100).get_page(request.GET.get("page"))
+        return render(request, "emprestimos/devolver_lote.html", {
+            "emprestimos": page_obj,
+            "page_obj": page_obj,
+            "hoje": timezone.localdate(),
+        })
+
+    ids = request.POST.getlist("emprestimo_ids")
+    data_dev_dt = _parse_data(request.POST.get("data_devolucao", "").strip())
+    if data_dev_dt is None:
+        messages.error(request, "Data inválida. Use YYYY-MM-DD.")
+        return redirect("livros:registrar_devolucoes_em_lote")
+    if not ids:
+        messages.error(request, "Selecione ao menos um empréstimo.")
+        return redirect("livros:registrar_devolucoes_em_lote")
+
+    devolvidos, falhas = Emprestimo.registrar_devolucoes_em_lote(ids, data_dev_dt)
+
+    if devolvidos:
+        multados = [e for e in devolvidos if e.multa_valor > 0]
+        messages.success(request, f"{len(devolvidos)} devolução(ões) registrada(s).")
+        if multados:
+            total = sum(e.multa_valor for e in multados)
+            messages.warning(request, f"Multa aplicada em {len(multados)} empréstimo(s): R$ {total:.2f}")
+    for falha in falhas:
+        messages.error(request, f"Empréstimo {falha['emprestimo_id']}: {falha['motivo']}")
+
+    return redirect("livros:emprestimos_list")
+
+
 @login_required
 @user_passes_test(is_admin)
 def quitar_multa(request, pk: int):
@@ -291,10 +656,13 @@ def _obter_dados_circulacao(data_inicio, data_fim):
         data_devolucao__range=(data_inicio, data_fim),
     ).select_related("livro", "usuario")
 
-    qtd_devolucoes = devolucoes_qs.count()
-
-    # Atrasos no período (entre as devoluções do período)
-    qtd_atrasos = sum(1 for e in devolucoes_qs if e.dias_atraso > 0)
+    # Devoluções e atrasos entre elas, contados no banco em uma consulta
+    totais_devolucoes = devolucoes_qs.com_atraso().aggregate(
+        qtd_devolucoes=Count("id"),
+        qtd_atrasos=Count("id", filter=Q(em_atraso=True)),
+    )
+    qtd_devolucoes = totais_devolucoes["qtd_devolucoes"]
+    qtd_atrasos = totais_devolucoes["qtd_atrasos"]
 
     # Reservas criadas no período
     reservas_qs = Reserva.objects.filter(
@@ -499,8 +867,9 @@ def exportar_relatorio_pdf(request):
 # ------------------------ Reservas -------------------
 @login_required
 def minhas_reservas(request):
-    Reserva.expirar_vencidas()
-    qs = Reserva.objects.filter(usuario=request.user).select_related('livro').order_by('-criada_em')
+    # só leitura: prontas vencidas aparecem como expiradas (status_efetivo)
+    # até o processar_reservas gravar
+    qs = Reserva.objects.com_posicao_na_fila(request.user).select_related('livro').order_by('-criada_em')
     return render(request, "reservas/minhas.html", {"reservas": qs})
 
 
@@ -510,14 +879,15 @@ def criar_reserva(request, livro_id: int):
         messages.error(request, "Operação inválida")
         return redirect("livros:minhas_reservas")
 
-    Reserva.expirar_vencidas()
-
     try:
         livro = CadastroLivroModel.objects.get(pk=livro_id)
     except CadastroLivroModel.DoesNotExist:
         messages.error(request, "Livro inválido")
         return redirect("livros:minhas_reservas")
 
+    # uma pronta vencida do próprio usuário não pode impedir a nova reserva
+    Reserva.expirar_vencidas([livro.pk])
+
     if getattr(livro, "status", "disponivel") == "disponivel":
         messages.error(request, "Livro disponível para empréstimo imediato")
         return redirect("livros:minhas_reservas")
@@ -540,20 +910,18 @@ def cancelar_reserva(request, pk: int):
         messages.error(request, "Operação inválida")
         return redirect("livros:minhas_reservas")
 
-    Reserva.expirar_vencidas()
     res = get_object_or_404(Reserva, pk=pk)
+    if res.vencida:
+        Reserva.expirar_vencidas([res.livro_id])
+        res.refresh_from_db()
 
     if (res.usuario_id != request.user.id) and (not request.user.is_staff and not request.user.is_superuser):
         messages.error(request, "Você não pode cancelar esta reserva")
         return redirect("livros:minhas_reservas")
 
-    era_pronta = (res.status == "pronta")
-    res.status = "cancelada"
-    res.cancelada_em = timezone.now()
-    res.save(update_fields=["status", "cancelada_em"])
-
-    if era_pronta:
-        Reserva.promover_primeira(res.livro)
+    if not res.cancelar():
+        messages.error(request, "Reserva não pode mais ser cancelada")
+        return redirect("livros:minhas_reservas")
 
     messages.success(request, "Reserva cancelada")
     return redirect("livros:minhas_reservas")
@@ -562,7 +930,7 @@ def cancelar_reserva(request, pk: int):
 # ------------------------ Área do usuário (empréstimos) -------------------
 @login_required
 def minha_area_de_emprestimos(request):
-    emprestimos = Emprestimo.objects.filter(
+    emprestimos = Emprestimo.objects.com_atraso().filter(
         usuario=request.user,
         data_devolucao__isnull=True
     ).select_related('livro').order_by('data_prevista_devolucao')
@@ -577,11 +945,8 @@ def minha_area_de_emprestimos(request):
 def solicitar_renovacao(request, emprestimo_id):
     """
     Tela de confirmação + gravação da renovação de um empréstimo.
-    Regras:
-    - Somente staff ou o próprio usuário podem renovar.
-    - Não pode renovar se já devolvido.
-    - Não pode renovar se estiver em atraso.
-    - Limite de 1 renovação.
+    Somente staff ou o próprio usuário podem renovar; as regras (devolvido,
+    em atraso, limite de renovações) são as de ``Emprestimo.pode_renovar``.
     """
 
     emprestimo = get_object_or_404(Emprestimo, id=emprestimo_id)
@@ -591,19 +956,9 @@ def solicitar_renovacao(request, emprestimo_id):
         messages.error(request, "Você não tem permissão para renovar este empréstimo.")
         return redirect("livros:emprestimos_list")
 
-    # --- Já devolvido ---
-    if emprestimo.data_devolucao:
-        messages.error(request, "Não é possível renovar um empréstimo já devolvido.")
-        return redirect("livros:emprestimos_list")
-
-    # --- Em atraso ---
-    if emprestimo.dias_atraso > 0:
-        messages.error(request, "Não é possível renovar empréstimo em atraso.")
-        return redirect("livros:emprestimos_list")
-
-    # --- Limite de renovações ---
-    if (emprestimo.renovacao_count or 0) >= 1:
-        messages.error(request, "Limite de 1 renovação já foi utilizado.")
+    pode, motivo = emprestimo.pode_renovar()
+    if not pode:
+        messages.error(request, motivo)
         return redirect("livros:emprestimos_list")
 
     # Nova data sugerida (ex.: +7 dias)
@@ -611,11 +966,12 @@ def solicitar_renovacao(request, emprestimo_id):
 
     # --- Salvar renovação ---
     if request.method == "POST":
-        emprestimo.data_prevista_devolucao = nova_data_prevista
-        emprestimo.renovacao_count = (emprestimo.renovacao_count or 0) + 1
-        emprestimo.save()
-
-        messages.success(request, "Renovação aplicada com sucesso!")
+        try:
+            emprestimo.aplicar_renovacao()
+        except Exception as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Renovação aplicada com sucesso!")
         return redirect("livros:emprestimos_list")
 
     # --- Renderizar tela de confirmação ---
@@ -628,3 +984,43 @@ def solicitar_renovacao(request, emprestimo_id):
         }
     )
 
+
+def _mensagens_renovacao_em_lote(request, renovados, recusados):
+    if renovados:
+        messages.success(request, f"{renovados} empréstimo(s) renovado(s).")
+    else:
+        messages.info(request, "Nenhum empréstimo pôde ser renovado.")
+    for emprestimo, motivo in recusados:
+        messages.warning(request, f"{emprestimo.livro.nome}: {motivo}")
+
+
+@login_required
+def renovar_todos_emprestimos(request):
+    """Renova de uma vez todos os empréstimos elegíveis do próprio usuário."""
+    if request.method != "POST":
+        return redirect("livros:minha_area_de_emprestimos")
+
+    renovados, recusados = Emprestimo.renovar_todos(request.user)
+    _mensagens_renovacao_em_lote(request, renovados, recusados)
+    return redirect("livros:minha_area_de_emprestimos")
+
+
+@login_required
+@user_passes_test(is_admin)
+def renovar_todos_do_usuario(request):
+    """Balcão: renova todos os empréstimos elegíveis do usuário informado (``usuario_id``)."""
+    if request.method != "POST":
+        return redirect("livros:emprestimos_list")
+
+    try:
+        usuario = get_user_model().objects.filter(pk=int(request.POST.get("usuario_id", ""))).first()
+    except ValueError:
+        usuario = None
+    if usuario is None:
+        messages.error(request, "Usuário não encontrado.")
+        return redirect("livros:emprestimos_list")
+
+    renovados, recusados = Emprestimo.renovar_todos(usuario)
+    _mensagens_renovacao_em_lote(request, renovados, recusados)
+    filtros = urlencode({"situacao": "ativos", "usuario": usuario.username})
+    return redirect(f"{reverse('livros:emprestimos_list')}?{filtros}")
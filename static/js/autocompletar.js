@@ -0,0 +1,28 @@
+// Sugestões de título/autor enquanto o bibliotecário digita.
+// Uso: <input data-autocompletar="/livros/autocompletar/" list="id-do-datalist">
+document.querySelectorAll("input[data-autocompletar]").forEach(function (campo) {
+  var lista = document.getElementById(campo.getAttribute("list"));
+  var ultimo = "";
+  var timer = null;
+
+  campo.addEventListener("input", function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var q = campo.value.trim();
+      if (!q || q === ultimo) return;
+      ultimo = q;
+      fetch(campo.dataset.autocompletar + "?q=" + encodeURIComponent(q))
+        .then(function (r) { return r.json(); })
+        .then(function (dados) {
+          if (dados.q !== campo.value.trim()) return;  // resposta atrasada
+          lista.innerHTML = "";
+          dados.sugestoes.forEach(function (s) {
+            var opcao = document.createElement("option");
+            opcao.value = s.texto;
+            opcao.label = s.tipo === "autor" ? "Autor" : "Título";
+            lista.appendChild(opcao);
+          });
+        });
+    }, 120);
+  });
+});
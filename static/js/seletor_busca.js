@@ -0,0 +1,45 @@
+// Seletor de livro/usuário alimentado por busca (JSON paginado por cursor).
+// Uso: <input data-seletor-busca="/url/" data-alvo="id-do-select">
+// O select começa só com a primeira página; digitar troca as opções e
+// "Mais resultados" acrescenta a próxima página.
+document.querySelectorAll("input[data-seletor-busca]").forEach(function (campo) {
+  var select = document.getElementById(campo.dataset.alvo);
+  var mais = document.querySelector('[data-mais="' + campo.dataset.alvo + '"]');
+  var proximo = select.dataset.proximo || "";
+  var timer = null;
+
+  function mostrarMais() {
+    if (mais) mais.hidden = !proximo;
+  }
+
+  function carregar(q, cursor) {
+    var url = campo.dataset.seletorBusca + "?q=" + encodeURIComponent(q);
+    if (cursor) url += "&cursor=" + encodeURIComponent(cursor);
+    fetch(url)
+      .then(function (r) { return r.json(); })
+      .then(function (dados) {
+        if (dados.q !== campo.value.trim()) return;  // resposta atrasada
+        if (!cursor) {
+          while (select.options.length > 1) select.remove(1);  // mantém o placeholder
+        }
+        dados.resultados.forEach(function (item) {
+          select.add(new Option(item.texto, item.id));
+        });
+        if (!cursor && dados.resultados.length === 1) select.value = String(dados.resultados[0].id);
+        proximo = dados.proximo || "";
+        mostrarMais();
+      });
+  }
+
+  campo.addEventListener("input", function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () { carregar(campo.value.trim(), null); }, 150);
+  });
+  if (mais) {
+    mais.addEventListener("click", function (ev) {
+      ev.preventDefault();
+      if (proximo) carregar(campo.value.trim(), proximo);
+    });
+  }
+  mostrarMais();
+});